@@ -4,103 +4,144 @@
 # In[ ]:
 
 """ =======================================================================================================
-        SCHEMA GUIDED ETL WORKFLOW: Load CSV INPUTS to ArcGIS Geodatabase Using a Feature Class Schema  
+        SCHEMA GUIDED ETL WORKFLOW: Load CSV INPUTS to ArcGIS Geodatabase Using a Feature Class Schema
     =======================================================================================================
 
     This script enables use of a pre-defined feature class schema to align, clean, and load csv file inputs into a file geodatabase.
-    Assumes there is an existing feature class with a defined schema. Displays a GUI for required user inputs: paths and field names.
-    
+    Assumes there is an existing feature class with a defined schema.
+    Runs headless from the command line (or as imported functions), or with a GUI for the user inputs: paths and field names.
+
 
     REQUIRED USER INPUTS:
-    
-    The user will be prompted with a new window for 4 inputs:
+
         - Geodatabase folder path
         - Input csv file path
-        - Feature class name with a known schema 
+        - Feature class name with a known schema
         - Input table field names to be mapped to the schema
 
+    COMMAND LINE (headless, e.g., for scheduled runs):
+
+        python ETL_arcrpy_v2.py --gdb C:/data/staging.gdb --csv C:/feeds/addresses.csv --template *Address* --mapping mapping.json
+
+        The field mapping file is JSON (or YAML when PyYAML is installed), either a flat {schema field: input column}
+        dictionary, or {"fields": {schema field: input column}, "defaults": {input column: default value}} where the
+        defaults fill mapped columns that do not exist in the input table.
+
+    GUI:
+
+        python ETL_arcrpy_v2.py --gui   (or no arguments)
+
+        The user will be prompted with a new window for each of the 4 inputs.
         Note: User will be prompted to add a field when that field exists in the Schema but not in the input table
+
+    AS FUNCTIONS:
+
+        import ETL_arcrpy_v2 as etl
+        etl.run_etl(gdb_path, input_table, "*Address*", field_mapping_dict)
+
+    STREAMING MODE:
+
+    Set --chunksize (or chunksize in run_etl) to a number of rows (e.g., 100000) to clean and validate large CSV inputs in chunks
+    with constant memory (see etl_streaming.py). Cleaned rows are inserted into CleanedData chunk by chunk and validation
+    issues are written to CSV, the full input table is never held in memory.
+
+    INCREMENTAL MODE:
+
+    Set --incremental (or incremental=True in run_etl) to only insert, update and delete the rows that changed since the
+    last run, instead of reloading the tables (see etl_incremental.py). --key-fields names the fields identifying a record.
+
+    LOADING:
+
+    Tables are created from the template schema and filled with batched inserts (arcpy.da.InsertCursor) instead of a
+    CSV round trip through TableToTable, see etl_loaders.py. Pass loader=etl_loaders.SQLiteTableLoader("out.gpkg") to
+    run_etl to write a GeoPackage instead.
 """
 import arcpy
 import pandas as pd
-import usaddress
+import argparse
+import json
 import logging
-import os 
+import os
 import sys
-import tempfile
-import easygui
+import time
+import etl_streaming # chunked clean and align for large inputs
+import etl_loaders # batched inserts into the output tables
+import address_standardizer # memoized usaddress standardization
+import etl_incremental # delta loads keyed by row hash
 
-# Logging configuration all log messages at INFO level and above (including WARNING, ERROR, and CRITICAL) are written to etl_process.log.
-logging.basicConfig(filename="etl_process.log", 
-                    filemode="w", # w=overwrite the logfile, "a" = append to the log
-                    level=logging.INFO, 
-                    format="%(asctime)s - %(levelname)s - %(message)s"
-)
-print("Logging to:", os.path.abspath("etl_process.log"))
+# system fields of the template feature class that are not part of the loaded schema
+SYSTEM_FIELDS = ["OBJECTID", "Shape", "created_user","created_date","last_edited_user","last_edited_date"]
+# standardized addresses kept between runs, in the geodatabase folder
+ADDRESS_CACHE_NAME = "address_cache.sqlite"
 
-# In[ ]:
 
+def configure_logging(log_path="etl_process.log"):
+    """Write all log messages at INFO level and above (including WARNING, ERROR, and CRITICAL) to log_path.
 
-##================================================================
-## =============================== Main ETL Workflow : User Inputs
-##================================================================
-
-## =============================== Set Paths to inputs and outputs
-# prompt for geodatabase
-gdb_path = easygui.diropenbox(msg= "Select the geodatabase folder (.gdb)", default= os.getcwd())
-if not gdb_path or not gdb_path.lower().endswith(".gdb"):
-    print("No geodatabase selected or the selected file is not a geodatabase (.gdb). Exiting")
-    sys.exit()
-
-# promot for input csv
-input_table = easygui.fileopenbox(msg="Select the input CSV file", default= os.getcwd() +"/*.csv")
-if not input_table:    
-    print("No input table selected. Exiting")
-    sys.exit()
+    Args:
+        log_path (str, optional): Path of the log file, overwritten on each run. Defaults to "etl_process.log".
 
+    Returns:
+        None
+    """
+    logging.basicConfig(filename=log_path,
+                        filemode="w", # w=overwrite the logfile, "a" = append to the log
+                        level=logging.INFO,
+                        format="%(asctime)s - %(levelname)s - %(message)s"
+    )
+    print("Logging to:", os.path.abspath(log_path))
 
-if not os.path.exists(gdb_path) or not os.path.exists(input_table):
-    print("Geodatabase or input table was not found. Ensure correct path was input")
-    logging.error("File not found Error gdb_path=%s, input_table=%s", gdb_path, input_table)
-    raise FileNotFoundError (f"Missing {gdb_path if not os.path.exists(gdb_path) else ''} {input_table if not os.path.exists(input_table) else ''}")
+# In[ ]:
 
-validation_issues_path = os.path.join(gdb_path,"ValidationIssues.csv")
 
-try:
-    arcpy.env.workspace = gdb_path
-    arcpy.env.overwriteOutput = True
-    print(f"\nSetting workspace to: {gdb_path} and searching for Feature Classes...\n")
-    logging.info("Setting workspace to %s", gdb_path)
-    for fc in arcpy.ListFeatureClasses():
-        print(f"Feature classes found:{fc}")
-        logging.info("Feature classes found %s", fc)
-except arcpy.ExecuteError:
-    print(arcpy.GetMessages())
-    logging.error("Arcpy Error occured %s", arcpy.GetMessages())
+##================================================================
+## =============================== Workspace, Schema and Field Mapping
+##================================================================
 
+def set_workspace(gdb_path):
+    """Set the arcpy workspace to the geodatabase and list its feature classes.
 
+    Args:
+        gdb_path (str): Path to the file geodatabase (.gdb).
 
-## ===============================  Select a feature class to use as a template Schema 
+    Returns:
+        list: Names of the feature classes found in the geodatabase.
+    """
+    feature_classes = []
+    try:
+        arcpy.env.workspace = gdb_path
+        arcpy.env.overwriteOutput = True
+        print(f"\nSetting workspace to: {gdb_path} and searching for Feature Classes...\n")
+        logging.info("Setting workspace to %s", gdb_path)
+        feature_classes = arcpy.ListFeatureClasses()
+        for fc in feature_classes:
+            print(f"Feature classes found:{fc}")
+            logging.info("Feature classes found %s", fc)
+    except arcpy.ExecuteError:
+        print(arcpy.GetMessages())
+        logging.error("Arcpy Error occured %s", arcpy.GetMessages())
+    return feature_classes
+
+def find_template_fc(featureClass_name):
+    """Find the template feature class in the current workspace.
 
-# prompt for feature class
-featureClass_name= easygui.enterbox(msg="Enter Feature Class name or pattern (e.g., *Address*)", default= "*Address*") # specify feature class name, * use wildcard partial matching or full name
+    Args:
+        featureClass_name (str): Feature class name or wildcard pattern (e.g., *Address*).
 
-if not featureClass_name:
-    print("No Feature class name entered. Exiting")
-    sys.exit()
+    Returns:
+        str: Name of the first matching feature class.
 
-# Check fc exists
-try:
-    
-    template_fc = arcpy.ListFeatureClasses(featureClass_name)[0] # existing feature class
+    Raises:
+        ValueError: If no feature class matches.
+    """
+    matches = arcpy.ListFeatureClasses(featureClass_name) or []
+    if not matches or not arcpy.Exists(matches[0]):
+        logging.error("Feature class not found %s", featureClass_name)
+        raise ValueError(f"Feature class not found: {featureClass_name}")
+    template_fc = matches[0] # existing feature class
     logging.info("Feature class loaded %s", template_fc)
     print("Feature class loaded", template_fc)
-    if not arcpy.Exists(template_fc):
-        print("Feature class not found")
-
-except arcpy.ExecuteError():
-    print(arcpy.GetMessages())
-    logging.error("Arcpy Error occured %s", arcpy.GetMessages())
+    return template_fc
 
 ## =============================== Define the field mappings to use:
 # Extract schema dynamically
@@ -117,56 +158,51 @@ def get_schema(feature_class):
     print("Extracting schema from geodatabase...")
     fields = arcpy.ListFields(feature_class)
     # extract dictionary of field names and data type for select fields to build a schema from template feature class
-    schema = {field.name: field.type for field in fields if field.name not in ["OBJECTID", "Shape", "created_user","created_date","last_edited_user","last_edited_date"]}
+    schema = {field.name: field.type for field in fields if field.name not in SYSTEM_FIELDS}
     return schema
 
-# Get feature class schema
-schema = get_schema(template_fc)
-schema_fields = list(schema.keys())
-
-# Read input table columns for default mapping suggestions
-df = pd.read_csv(input_table) # need to load to reconcile potential field additions
-input_df = pd.read_csv(input_table, nrows=1)
-input_columns = list(input_df.columns)
-default_values = [col if col in input_columns else '' for col in schema_fields] # extract the exact matches
-
-# prompt for user input with default values displayed
-user_values = easygui.multenterbox(
-    msg="Map each schema field to an input column name (Defaults Displayed):",
-    title="Field Mapping",
-    fields=schema_fields,
-    values=default_values
-)
-if user_values:
-    field_mapping_dict = dict(zip(schema_fields, user_values))
+def load_field_mapping(mapping_path):
+    """Read a field mapping file (JSON, or YAML when PyYAML is installed).
 
-# Ensure all mapped columns exist in the DataFrame, add missing
+    Args:
+        mapping_path (str): Path to the mapping file. Either a flat {schema field: input column} dictionary,
+            or {"fields": {schema field: input column}, "defaults": {input column: default value}}.
 
-for schema_field, input_col in field_mapping_dict.items():
-    if input_col and input_col not in input_columns:
-        # prompt user for a default value for the new column
-        default_val = easygui.enterbox(msg=f"Input column '{input_col}' for schema field '{schema_field}' \n" 
-                                       f"does not exist in the input CSV file\n"
-                                       f" Enter a default value for the new column (leave blank for an empty string): ", 
-                                       title="Add Missing Column")
-        if default_val is None:
-            default_val = ""
+    Returns:
+        tuple: (field_mapping_dict, missing_defaults) dictionaries.
+    """
+    with open(mapping_path, "r", encoding="utf-8") as f:
+        if mapping_path.lower().endswith((".yaml", ".yml")):
+            import yaml # optional, only needed for YAML mapping files
+            mapping = yaml.safe_load(f)
+        else:
+            mapping = json.load(f)
+    if "fields" in mapping and isinstance(mapping["fields"], dict):
+        return dict(mapping["fields"]), dict(mapping.get("defaults") or {})
+    return dict(mapping), {}
+
+def default_field_mapping(schema_fields, input_columns):
+    """Suggest a mapping of schema fields to input columns with the same name, blank when there is no exact match"""
+    return {field: (field if field in input_columns else '') for field in schema_fields}
+
+def print_mapping_summary(field_mapping_dict):
+    """Print a Summary of user mappings"""
+    print("\nField Mapping Summary:\n")
+    print("{:<20} | {:<20}".format("Schema Field","Input Column"))
+    print("*"*43)
 
-        # add missing columns (i.e., only present in the feature class schema) to the input table
-        df[input_col]= default_val
-        # Update input table for missing columns
-        df.to_csv(input_table,index=False)
-        print(f"Added missing column {input_col} with default value {default_val} to input table")
-        logging.info(f"Added missing column {input_col} with default value {default_val} to input table")
+    for schema_field, input_col in field_mapping_dict.items():
+
+        print("{:<20} | {:<20}".format(schema_field,input_col))
 
 
 ##============================================================
-## =============================== End of User Inputs
+## =============================== Clean, Map and Load
 ##============================================================
 
-
 # Validate and clean data
-def clean_and_align_data(df, schema, field_mapping_dict, standardize_address=False):
+def clean_and_align_data(df, schema, field_mapping_dict, standardize_address=False, validation_issues_path="ValidationIssues.csv",
+                         duplicates_path=None, standardizer=None):
     """Validate, clean, and align a DataFrame to match a target ArcGIS schema.
 
     This function renames columns, coerces data types, checks for missing values and duplicates, optionally standardizes addresses,
@@ -177,28 +213,24 @@ def clean_and_align_data(df, schema, field_mapping_dict, standardize_address=Fal
         schema (dict): Dictionary mapping schema field names to ArcGIS field types.
         field_mapping_dict (dict): Mapping from schema field names to input column names.
         standardize_address (bool, optional): Whether to standardize addresses using usaddress. Defaults to False.
+        validation_issues_path (str, optional): Output CSV for rows with missing values. Defaults to "ValidationIssues.csv".
+        duplicates_path (str, optional): Output CSV for removed duplicate rows. Defaults to None (not written).
+        standardizer (address_standardizer.AddressStandardizer, optional): Standardizer whose cache is reused, e.g., across
+            several inputs. Defaults to a new one.
 
     Returns:
-        pd.DataFrame: The cleaned and aligned DataFrame.
+        pd.DataFrame: The cleaned and aligned DataFrame. Its attrs["etl_summary"] holds the row counts of the run.
     """
     logging.info("Starting data validation and cleaning...")
     print("Starting data validation and cleaning...")
     validation_issues = []
+    rows_read = len(df)
 
     # Rename columns to match schema
     #  df.rename(columns={old:new}), in rename normally keys (k) are old names while value (v) is new, flipped to rename here {input_col: schema_field}
-    df = df.rename(columns={v: k for k, v in field_mapping_dict.items()})
-    for field, dtype in schema.items():
-        if field in df.columns:
-            # Handle ArcGIS types
-            if dtype in ["Short", "Long", "Integer"]:
-                df[field] = pd.to_numeric(df[field], errors="coerce").astype("Int64")
-            elif dtype in ["Float", "Double"]:
-                df[field] = pd.to_numeric(df[field], errors="coerce")
-            elif dtype in ["Text", "String"]:
-                df[field] = df[field].astype(str)
-            elif dtype == "Date":
-                df[field] = pd.to_datetime(df[field], errors="coerce")
+    df = df.rename(columns={v: k for k, v in field_mapping_dict.items() if v})
+    # Handle ArcGIS types
+    df = etl_streaming.coerce_to_schema(df, schema)
 
 
     # Check for missing values
@@ -214,7 +246,8 @@ def clean_and_align_data(df, schema, field_mapping_dict, standardize_address=Fal
     if num_duplicates > 0 :
         logging.warning(f"{num_duplicates} duplicate rows found and removed")
         print(f"{num_duplicates} duplicate rows found and removed")
-        df[df.duplicated(Keep=True)].to_csv("duplicates_found.csv", index=False)
+        if duplicates_path:
+            df[df.duplicated()].to_csv(duplicates_path, index=False)
 
     else:
         logging.info("No duplicate rows found")
@@ -227,14 +260,10 @@ def clean_and_align_data(df, schema, field_mapping_dict, standardize_address=Fal
     if standardize_address:
         logging.info("Standardizing addresses using usaddress library...")
         print("Standardizing addresses using usaddress library...")
-        def parse_address(addr):
-            try:
-                parsed = usaddress.tag(addr)[0]
-                return f"{parsed.get('AddressNumber', '')} {parsed.get('StreetName', '')} {parsed.get('StreetNamePostType', '')}"
-            except:
-                return addr  # Keep original if parsing fails
-
-        df["address"] = df["address"].apply(parse_address)
+        # each distinct address is parsed once, common forms skip usaddress (see address_standardizer.py)
+        standardizer = standardizer or address_standardizer.AddressStandardizer()
+        df["address"] = standardizer.standardize(df["address"])
+        standardizer.print_stats()
 
     # Save validation issues
     if validation_issues:
@@ -243,133 +272,297 @@ def clean_and_align_data(df, schema, field_mapping_dict, standardize_address=Fal
         logging.info("Validation issues saved to CSV.")
         print("Validation issues saved to CSV.")
 
+    df.attrs["etl_summary"] = {"rows_read": rows_read, "rows_written": len(df),
+                               "missing_value_rows": len(missing_values), "duplicate_rows": int(num_duplicates)}
     return df
 
 ### Load data into geodatabase
-# Use tempfile for temp CSV
-def load_to_gdb(df, table_name, field_mappings=None):
-    """Load a DataFrame into a geodatabase table using arcpy.TableToTable, with optional field mappings.
+# Typed columns go straight into the table with batched inserts, no temporary CSV
+def load_to_gdb(df, gdb_path, table_name, fields=None, loader=None):
+    """Load a DataFrame into a geodatabase table with batched inserts (see etl_loaders.py).
 
     Args:
-        df (pd.DataFrame): The DataFrame to load.
+        df (pd.DataFrame): The DataFrame to load, already coerced to the field types.
+        gdb_path (str): Path to the output geodatabase.
         table_name (str): The name of the output table in the geodatabase.
-        field_mappings (arcpy.FieldMappings, optional): FieldMappings object for schema alignment. Defaults to None.
+        fields (list, optional): etl_loaders.OutputField list for schema alignment (see get_output_fields).
+            Defaults to None (all columns, types inferred from the DataFrame).
+        loader (etl_loaders.TableLoader, optional): Loader backend. Defaults to an arcpy InsertCursor loader on gdb_path.
 
     Returns:
-        None
+        int: Number of rows loaded.
     """
-    with tempfile.NamedTemporaryFile(suffix=".csv", delete=False) as tmp:
-        temp_csv = tmp.name
-        df.to_csv(temp_csv, index=False)
-        logging.info(f"Loading {table_name} into geodatabase...")
-        print(f"Loading {table_name} into geodatabase...")
-        arcpy.conversion.TableToTable(temp_csv, gdb_path, table_name, field_mapping=field_mappings)
-        logging.info(f"{table_name} successfully loaded into geodatabase.")
-        print(f"{table_name} successfully loaded into geodatabase.")
-    # Optionally, remove temp file after use
-    os.remove(temp_csv)
-
-### Map input table fields to the schema of an existing feature class
-def map_fields(input_table, template_fc, field_mapping_dict):
-    """Build arcpy.FieldMappings for mapping input table fields to a template feature class schema.
+    logging.info(f"Loading {table_name} into geodatabase...")
+    print(f"Loading {table_name} into geodatabase...")
+    rows = (loader or etl_loaders.ArcpyTableLoader(gdb_path)).load(df, table_name, fields)
+    logging.info(f"{table_name} successfully loaded into geodatabase ({rows} rows).")
+    print(f"{table_name} successfully loaded into geodatabase.")
+    return rows
+
+def get_output_fields(template_fc, field_mapping_dict, df=None):
+    """Output fields (name, type, length, alias) for the loaders, each schema field takes the properties of the template field.
 
     Args:
-        input_table (str): Path to the input table (CSV or table).
         template_fc (str): Path to the template feature class.
-        field_mapping_dict (dict): Mapping from schema field names to input column names.
+        field_mapping_dict (dict): Mapping from schema field names to input column names, blank columns are not loaded.
+        df (pd.DataFrame, optional): Cleaned data, types of fields missing from the template are inferred from it.
 
     Returns:
-        arcpy.FieldMappings: Configured FieldMappings object for use in TableToTable.
+        list: etl_loaders.OutputField for each loaded schema field.
     """
-    field_mappings = arcpy.FieldMappings()
-    ### iterate through each pair of pre-defined mappings and Create a FieldMap() for each field
-    for schema_field, input_col in field_mapping_dict.items():
-        # Create a FieldMap for each field
-        fm= arcpy.FieldMap()
-        # add the input field from csv
-        fm.addInputField(input_table,input_col)
-        # Set the output field name to match the schema
-        out_field = fm.outputField
-        out_field.name = schema_field 
-
-        ### set the type  / length/ alias from the template feature class
-        # loop uses the current schema field to access the feature classes field properties
-        for f in arcpy.ListFields(template_fc):
-            if f.name == schema_field: ### if name matches current schema field
-                out_field.type = f.type # set outfield properties to match current field
-                out_field.length = f.length
-                out_field.aliasName= f.aliasName
-                break # exit f loop after match is found and set
-        fm.outputField = out_field # finalize field settings
-        # Add the FieldMap to the FieldMappings
-        field_mappings.addFieldMap(fm)
-    return field_mappings
-
-### Extract working directory from notebook or script path
-try: 
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    print("python script located here", script_dir)
-    logging.info("python script located here %s", script_dir)
-    wkdir=script_dir
-except NameError:
-    notebook_dir= os.getcwd() # Assumes you only launched Jupyter Notebook when you opened the current notebook file  
-    print("notebook located here", notebook_dir)
-    logging.error("notebook located here %s", notebook_dir)
-    wkdir= notebook_dir
-
-
-# Print a Summary of user mappings
-print("\nField Mapping Summary:\n")
-print("{:<20} | {:<20}".format("Schema Field","Input Column"))
-print("*"*43)
-
-for schema_field, input_col in field_mapping_dict.items():
-
-    print("{:<20} | {:<20}".format(schema_field,input_col))
-
-logging.info("ETL process started...")
-print("\nETL process started\n")
-
-try:
-    arcpy.env.workspace = gdb_path
-    arcpy.env.overwriteOutput = True
-    print(f"Setting workspace to: {gdb_path}")
-    logging.info("Setting workspace to %s", gdb_path)
-    for fc in arcpy.ListFeatureClasses():
-        print(f"Feature classes found:{fc}")
-        logging.info("Feature classes found %s", fc)
-except arcpy.ExecuteError:
-    print(arcpy.GetMessages())
-    logging.error("Arcpy Error occured %s", arcpy.GetMessages())
-
-# Check fc exists
-try:
-    
-    template_fc = arcpy.ListFeatureClasses(featureClass_name)[0] # existing feature class
-    logging.info("Feature class loaded %s", template_fc)
-    print("Feature class loaded", template_fc)
-    if not arcpy.Exists(template_fc):
-        print("Feature class not found")
+    template_fields = [(f.name, f.type, f.length, f.aliasName) for f in arcpy.ListFields(template_fc)]
+    return etl_loaders.output_fields(template_fields, field_mapping_dict, df)
 
-except arcpy.ExecuteError():
-    print(arcpy.GetMessages())
-    logging.error("Arcpy Error occured %s", arcpy.GetMessages())
 
+##================================================================
+## =============================== Main ETL Workflow
+##================================================================
 
+def run_etl(gdb_path, input_table, featureClass_name, field_mapping_dict, missing_defaults=None, chunksize=None,
+            standardize_address=False, loader=None, address_cache_path=None, incremental=False, key_fields=None):
+    """Run the full ETL for one input CSV: clean and align to the template schema, then load into the geodatabase.
 
-# Load the input table
+    Loads three tables into the geodatabase: CleanedData (mapped to the template schema), ValidationIssues
+    (rows with missing values, only when there are any) and InputAddressData (the input as read).
+    The input CSV is never modified, mapped columns missing from it are added in memory with their default value.
+    Cleaned rows are inserted directly with their coerced types, in streaming mode chunk by chunk as they are cleaned.
+
+    Args:
+        gdb_path (str): Path to the file geodatabase (.gdb).
+        input_table (str): Path to the input CSV.
+        featureClass_name (str): Template feature class name or wildcard pattern (e.g., *Address*).
+        field_mapping_dict (dict): Mapping from schema field names to input column names, blank columns are not loaded.
+        missing_defaults (dict, optional): {input column: default value} for mapped columns absent from the CSV.
+            Defaults to None (blank string).
+        chunksize (int, optional): Rows per chunk for streaming mode, None reads the whole CSV. Defaults to None.
+        standardize_address (bool, optional): Standardize the address field with usaddress. Defaults to False.
+        loader (etl_loaders.TableLoader, optional): Loader backend for the output tables, e.g., etl_loaders.SQLiteTableLoader
+            for a GeoPackage. Defaults to an arcpy InsertCursor loader on gdb_path.
+        address_cache_path (str, optional): SQLite file caching standardized addresses between runs.
+            Defaults to address_cache.sqlite in the geodatabase folder.
+        incremental (bool, optional): Only insert, update and delete the rows of CleanedData and InputAddressData that
+            changed since the last run, using the hash index in the geodatabase folder. Defaults to False (replace the tables).
+        key_fields (list, optional): Schema fields identifying a record in incremental mode, changed records are
+            updated in place. Defaults to None (a changed row is deleted and inserted again).
+
+    Returns:
+        dict: Run summary (input_table, rows_read, rows_written, missing_value_rows, duplicate_rows, seconds), and the
+            inserted/updated/deleted counts per table under "incremental" in incremental mode.
+
+    Raises:
+        FileNotFoundError: If the geodatabase or the input table does not exist.
+    """
+    start = time.perf_counter()
+    if not os.path.exists(gdb_path) or not os.path.exists(input_table):
+        print("Geodatabase or input table was not found. Ensure correct path was input")
+        logging.error("File not found Error gdb_path=%s, input_table=%s", gdb_path, input_table)
+        raise FileNotFoundError (f"Missing {gdb_path if not os.path.exists(gdb_path) else ''} {input_table if not os.path.exists(input_table) else ''}")
+
+    validation_issues_path = os.path.join(gdb_path,"ValidationIssues.csv")
+    duplicates_path = os.path.join(gdb_path, "duplicates_found.csv")
+    for path in (validation_issues_path, duplicates_path):
+        if os.path.exists(path):
+            os.remove(path) # do not load or report issues left over from a previous run
+
+    set_workspace(gdb_path)
+    template_fc = find_template_fc(featureClass_name)
+    schema = get_schema(template_fc)
+
+    # Ensure all mapped columns exist in the input, add missing
+    input_columns = list(pd.read_csv(input_table, nrows=1).columns)
+    missing_columns = {}
+    for schema_field, input_col in field_mapping_dict.items():
+        if input_col and input_col not in input_columns:
+            missing_columns[input_col] = (missing_defaults or {}).get(input_col, "")
+            print(f"Added missing column {input_col} with default value {missing_columns[input_col]} to input table")
+            logging.info(f"Added missing column {input_col} with default value {missing_columns[input_col]} to input table")
+
+    print_mapping_summary(field_mapping_dict)
+    logging.info("ETL process started...")
+    print("\nETL process started\n")
+
+    loader = loader or etl_loaders.ArcpyTableLoader(gdb_path)
+    # addresses standardized by earlier runs are reused from the cache in the gdb folder, only new ones are parsed
+    address_cache = None
+    standardizer = None
+    if standardize_address:
+        address_cache = address_standardizer.AddressCacheStore(address_cache_path or os.path.join(gdb_path, ADDRESS_CACHE_NAME))
+        standardizer = address_standardizer.AddressStandardizer(store=address_cache)
+    # incremental mode: only the rows that changed since the last run are written (see etl_incremental.py)
+    index = etl_incremental.HashIndex(os.path.join(gdb_path, etl_incremental.DEFAULT_INDEX_NAME)) if incremental else None
+    delta = {}
+    try:
+        if chunksize:
+            ### The cleaned table already uses the schema field names, take their properties from the feature class schema
+            fields = get_output_fields(template_fc, field_mapping_dict)
+            if index is None:
+                cleaned_table = loader.open_table("CleanedData", fields)
+            else:
+                cleaned_table = etl_incremental.IncrementalTable(loader, index, "CleanedData", fields, key_fields, source=input_table)
+            # Clean and align input data chunk by chunk, each cleaned chunk is inserted as soon as it is processed
+            logging.info("Loading CleanedData into geodatabase...")
+            print("Loading CleanedData into geodatabase...")
+            with cleaned_table:
+                summary = etl_streaming.stream_clean_and_align(input_table, schema, field_mapping_dict, None, validation_issues_path,
+                                                               duplicates_path=duplicates_path, chunksize=chunksize,
+                                                               missing_columns=missing_columns, cleaned_sink=cleaned_table.append,
+                                                               standardizer=standardizer)
+            if index is not None:
+                delta["CleanedData"] = cleaned_table.summary
+            print("CleanedData successfully loaded into geodatabase.")
+            input_df = None
+        else:
+            input_df = pd.read_csv(input_table)
+            for input_col, default_val in missing_columns.items():
+                input_df[input_col] = default_val
+            # Clean and align input data to schema names and data format
+            cleaned_df = clean_and_align_data(input_df, schema, field_mapping_dict, standardize_address=standardize_address,
+                                              validation_issues_path=validation_issues_path, duplicates_path=duplicates_path,
+                                              standardizer=standardizer)
+            summary = cleaned_df.attrs["etl_summary"]
+            fields = get_output_fields(template_fc, field_mapping_dict, cleaned_df)
+            if index is None:
+                load_to_gdb(cleaned_df, gdb_path, "CleanedData", fields, loader)
+            else:
+                delta["CleanedData"] = etl_incremental.load_incremental(loader, cleaned_df, "CleanedData", index, fields,
+                                                                        key_fields, source=input_table)
+        if address_cache is not None:
+            address_cache.close()
+            address_cache = None
+
+        # Load validation issues (always replaced, they describe this run) and the input table into geodatabase
+        if os.path.exists(validation_issues_path):
+            loader.load_csv(validation_issues_path, "ValidationIssues")
+        if index is not None and input_df is None:
+            delta["InputAddressData"] = etl_incremental.load_csv_incremental(loader, input_table, "InputAddressData", index,
+                                                                             chunksize=chunksize)
+        elif index is not None:
+            delta["InputAddressData"] = etl_incremental.load_incremental(loader, input_df, "InputAddressData", index,
+                                                                         source=input_table)
+        elif input_df is None:
+            loader.load_csv(input_table, "InputAddressData", chunksize=chunksize)
+        else:
+            load_to_gdb(input_df, gdb_path, "InputAddressData", loader=loader)
+    finally:
+        if address_cache is not None:
+            address_cache.close()
+        if index is not None:
+            index.close()
+    if delta:
+        summary = dict(summary, incremental=delta)
+
+    summary = dict(summary, input_table=input_table, seconds=round(time.perf_counter() - start, 3))
+    logging.info("ETL process completed successfully. %s", summary)
+    print("ETL process completed successfully.")
+    return summary
 
-# Clean and align input data to schema names and data format
-cleaned_df = clean_and_align_data(df, schema, field_mapping_dict, standardize_address=False)
 
-### Map the fields in the input table to the feature class schema 
-field_mappings = map_fields(input_table, template_fc, field_mapping_dict)
+##================================================================
+## =============================== Optional GUI front-end : User Inputs
+##================================================================
 
-# Load cleaned data and validation issues into geodatabase
-load_to_gdb(cleaned_df, "CleanedData", field_mappings)
-load_to_gdb(pd.read_csv(validation_issues_path), "ValidationIssues")
-load_to_gdb(df, "InputAddressData")
+def prompt_for_inputs():
+    """Prompt for the ETL inputs with easygui windows.
+
+    Returns:
+        tuple: (gdb_path, input_table, featureClass_name, field_mapping_dict, missing_defaults), or None if the user cancels.
+    """
+    import easygui # only needed for the GUI
+
+    ## =============================== Set Paths to inputs and outputs
+    # prompt for geodatabase
+    gdb_path = easygui.diropenbox(msg= "Select the geodatabase folder (.gdb)", default= os.getcwd())
+    if not gdb_path or not gdb_path.lower().endswith(".gdb"):
+        print("No geodatabase selected or the selected file is not a geodatabase (.gdb). Exiting")
+        return None
+
+    # promot for input csv
+    input_table = easygui.fileopenbox(msg="Select the input CSV file", default= os.getcwd() +"/*.csv")
+    if not input_table:
+        print("No input table selected. Exiting")
+        return None
+
+    set_workspace(gdb_path)
+
+    ## ===============================  Select a feature class to use as a template Schema
+    # prompt for feature class
+    featureClass_name= easygui.enterbox(msg="Enter Feature Class name or pattern (e.g., *Address*)", default= "*Address*") # specify feature class name, * use wildcard partial matching or full name
+    if not featureClass_name:
+        print("No Feature class name entered. Exiting")
+        return None
+
+    # Get feature class schema
+    schema_fields = list(get_schema(find_template_fc(featureClass_name)).keys())
+
+    # Read input table columns for default mapping suggestions
+    input_columns = list(pd.read_csv(input_table, nrows=1).columns)
+    default_values = list(default_field_mapping(schema_fields, input_columns).values()) # extract the exact matches
+
+    # prompt for user input with default values displayed
+    user_values = easygui.multenterbox(
+        msg="Map each schema field to an input column name (Defaults Displayed):",
+        title="Field Mapping",
+        fields=schema_fields,
+        values=default_values
+    )
+    if not user_values:
+        print("No field mapping entered. Exiting")
+        return None
+    field_mapping_dict = dict(zip(schema_fields, user_values))
 
-logging.info("ETL process completed successfully.")
-print("ETL process completed successfully.")
-logging.shutdown()
+    # prompt user for a default value for mapped columns missing from the input table
+    missing_defaults = {}
+    for schema_field, input_col in field_mapping_dict.items():
+        if input_col and input_col not in input_columns:
+            default_val = easygui.enterbox(msg=f"Input column '{input_col}' for schema field '{schema_field}' \n"
+                                           f"does not exist in the input CSV file\n"
+                                           f" Enter a default value for the new column (leave blank for an empty string): ",
+                                           title="Add Missing Column")
+            missing_defaults[input_col] = default_val if default_val is not None else ""
+
+    return gdb_path, input_table, featureClass_name, field_mapping_dict, missing_defaults
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Clean, align and load a CSV into a file geodatabase using a feature class schema.")
+    parser.add_argument("--gdb", help="Path to the file geodatabase (.gdb)")
+    parser.add_argument("--csv", help="Path to the input CSV file")
+    parser.add_argument("--template", help="Template feature class name or wildcard pattern (e.g., *Address*)")
+    parser.add_argument("--mapping", help="Field mapping file (JSON or YAML), defaults to matching column names")
+    parser.add_argument("--chunksize", type=int, default=None, help="Rows per chunk for streaming mode (default: read the whole CSV)")
+    parser.add_argument("--standardize-address", action="store_true", help="Standardize the address field with usaddress")
+    parser.add_argument("--address-cache", help=f"Address cache file kept between runs (default: {ADDRESS_CACHE_NAME} in the gdb folder)")
+    parser.add_argument("--incremental", action="store_true", help="Only load the rows that changed since the last run")
+    parser.add_argument("--key-fields", help="Comma separated schema fields identifying a record, for --incremental")
+    parser.add_argument("--log", default="etl_process.log", help="Log file path (default: etl_process.log)")
+    parser.add_argument("--gui", action="store_true", help="Prompt for the inputs with easygui windows")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    configure_logging(args.log)
+
+    if args.gui or not (args.gdb and args.csv and args.template):
+        inputs = prompt_for_inputs()
+        if inputs is None:
+            sys.exit()
+        gdb_path, input_table, featureClass_name, field_mapping_dict, missing_defaults = inputs
+    else:
+        gdb_path, input_table, featureClass_name = args.gdb, args.csv, args.template
+        if args.mapping:
+            field_mapping_dict, missing_defaults = load_field_mapping(args.mapping)
+        else:
+            set_workspace(gdb_path)
+            schema_fields = list(get_schema(find_template_fc(featureClass_name)).keys())
+            field_mapping_dict = default_field_mapping(schema_fields, list(pd.read_csv(input_table, nrows=1).columns))
+            missing_defaults = {}
+
+    run_etl(gdb_path, input_table, featureClass_name, field_mapping_dict, missing_defaults,
+            chunksize=args.chunksize, standardize_address=args.standardize_address, address_cache_path=args.address_cache,
+            incremental=args.incremental, key_fields=args.key_fields.split(",") if args.key_fields else None)
+    logging.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,329 @@
+""" =======================================================================================================
+        ADDRESS STANDARDIZER: Memoized usaddress standardization for the schema guided ETL
+    =======================================================================================================
+
+    Standardizes addresses to "AddressNumber StreetName StreetNamePostType", the same output as the per row
+    usaddress.tag call it replaces in clean_and_align_data (ETL_arcrpy_v2.py), with less parsing:
+
+        - Each distinct address is parsed once: values are grouped by a key with collapsed whitespace and ignored case
+        - A bounded LRU cache keeps the parses across calls (chunks in streaming mode, feeds in a batch)
+        - A regex fast path handles the common "number street suffix" forms without the usaddress CRF parser
+        - The remaining unique addresses are parsed in a process pool when there are many of them
+
+        - An optional SQLite store (AddressCacheStore) keeps the parses between runs, so a nightly feed only parses
+          the addresses it has not seen before
+
+    The cache stores which words of the address make each component, not the text, so every row keeps its own
+    spelling and case, exactly as usaddress would have returned it. Values that can not be parsed are left unchanged.
+
+    The store is tagged with CACHE_VERSION (the parsing rules of this module and the usaddress version) and is cleared
+    when that changes. It keeps at most max_entries addresses, the ones unused for the most runs are evicted first.
+
+    USAGE:
+
+        with address_standardizer.AddressCacheStore("C:/data/staging.gdb/address_cache.sqlite") as store:
+            standardizer = address_standardizer.AddressStandardizer(store=store)
+            df["address"] = standardizer.standardize(df["address"])
+            standardizer.print_stats()
+"""
+import json
+import logging
+import os
+import re
+import sqlite3
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from importlib import metadata
+
+import pandas as pd
+import usaddress
+
+DEFAULT_CACHE_SIZE = 100000 # distinct addresses kept between calls
+PARALLEL_THRESHOLD = 5000 # unique addresses to parse before a process pool is worth starting
+DEFAULT_STORE_SIZE = 2000000 # distinct addresses kept in the on-disk store
+
+RULES_VERSION = 1 # bump when the fast path, the templates or the output format change
+try:
+    _USADDRESS_VERSION = metadata.version("usaddress")
+except metadata.PackageNotFoundError:
+    _USADDRESS_VERSION = "unknown"
+CACHE_VERSION = f"{RULES_VERSION}-usaddress-{_USADDRESS_VERSION}"
+
+COMPONENTS = ("AddressNumber", "StreetName", "StreetNamePostType")
+
+# common street suffixes (USPS), and words that make usaddress tag something other than the plain street name
+STREET_SUFFIXES = {"ALY", "AVE", "AVENUE", "BLVD", "BOULEVARD", "CIR", "CIRCLE", "CT", "COURT", "CV", "DR", "DRIVE",
+                   "HWY", "HIGHWAY", "LN", "LANE", "LOOP", "PATH", "PKWY", "PARKWAY", "PL", "PLACE", "RD", "ROAD", "ST",
+                   "STREET", "TER", "TERRACE", "TRL", "TRAIL", "WAY"}
+_SPECIAL_WORDS = STREET_SUFFIXES | {"N", "S", "E", "W", "NE", "NW", "SE", "SW", "NORTH", "SOUTH", "EAST", "WEST",
+                                    "APT", "UNIT", "STE", "SUITE", "BOX", "PO", "RR", "HC", "COUNTY", "STATE", "US",
+                                    "ROUTE", "RTE", "SR", "CR", "CO", "ONE", "TWO", "THREE", "FOUR", "FIVE", "TEN"}
+FAST_PATH = re.compile(r"^(\d{1,6}) ((?:[A-Za-z]{3,}|\d+(?:st|nd|rd|th))(?: [A-Za-z]{3,})?) ([A-Za-z]+)$", re.IGNORECASE)
+
+
+##================================================================
+## =============================== Parsing: fast path and usaddress
+##================================================================
+
+def normalize_key(address):
+    """Cache key of an address: words separated by single spaces, case folded"""
+    return " ".join(address.split()).casefold()
+
+
+def _fast_path_template(address):
+    """Word positions of the components for a plain "number street suffix" address, None for anything else"""
+    match = FAST_PATH.match(address)
+    if not match or match.group(3).upper() not in STREET_SUFFIXES:
+        return None
+    street_words = match.group(2).split()
+    if any(word.upper() in _SPECIAL_WORDS for word in street_words):
+        return None
+    return ((0,), tuple(range(1, len(street_words) + 1)), (len(street_words) + 1,))
+
+
+def parse_components(address):
+    """usaddress components of an address, None when usaddress can not parse it. Runs in the worker processes."""
+    try:
+        parsed = usaddress.tag(address)[0]
+    except Exception:
+        return None
+    return tuple(parsed.get(component, "") for component in COMPONENTS)
+
+
+def _to_template(address, components):
+    """Word positions of each component in the address, a component that is not made of whole words is kept as text"""
+    words = [w.strip(",;").casefold() for w in address.split()]
+    template, position = [], 0
+    for value in components:
+        positions = []
+        for token in value.split():
+            try:
+                position = words.index(token.casefold(), position)
+            except ValueError:
+                positions = None
+                break
+            positions.append(position)
+            position += 1
+        template.append(tuple(positions) if positions is not None else value)
+    return tuple(template)
+
+
+def _from_template(address, template):
+    """Standardized address from the words of address, same format as the original per row parse_address"""
+    words = address.split()
+    return " ".join(part if isinstance(part, str) else " ".join(words[i].strip(",;") for i in part) for part in template)
+
+
+def _dump_template(template):
+    return json.dumps(template)
+
+
+def _load_template(text):
+    template = json.loads(text)
+    return tuple(part if isinstance(part, str) else tuple(part) for part in template) if template is not None else None
+
+
+##================================================================
+## =============================== On-disk store shared by runs
+##================================================================
+
+class AddressCacheStore:
+    """SQLite store of address parses kept between ETL runs.
+
+    Each entry maps an address key to its template and the standardized text of the address it was parsed from.
+    Entries written with another CACHE_VERSION are dropped when the store is opened.
+
+    Args:
+        path (str): SQLite file, created if it does not exist (e.g., address_cache.sqlite in the gdb folder).
+        max_entries (int, optional): Entries kept when the store is closed, least recently used first out. Defaults to 2000000.
+        version (str, optional): Version of the parsing rules. Defaults to CACHE_VERSION.
+    """
+    def __init__(self, path, max_entries=DEFAULT_STORE_SIZE, version=CACHE_VERSION):
+        self.path = path
+        self.max_entries = max_entries
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS addresses (key TEXT PRIMARY KEY, template TEXT,
+                             standardized TEXT, last_used INTEGER)""")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS addresses_last_used ON addresses (last_used)")
+        self.conn.execute("CREATE TEMP TABLE lookup (key TEXT PRIMARY KEY)")
+        meta = dict(self.conn.execute("SELECT name, value FROM meta"))
+        if meta.get("version") != version:
+            if meta.get("version"):
+                logging.info("Address cache version changed (%s -> %s), clearing %s", meta.get("version"), version, path)
+                print(f"Address cache version changed, clearing {path}")
+            self.conn.execute("DELETE FROM addresses")
+            meta["run"] = "0"
+        self.run = int(meta.get("run") or 0) + 1
+        self.conn.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)", [("version", version), ("run", str(self.run))])
+        self.conn.commit()
+
+    def get_many(self, keys):
+        """Templates of the keys found in the store, marked as used by this run.
+
+        Args:
+            keys (iterable): Address keys (see normalize_key).
+
+        Returns:
+            dict: {key: template} for the keys in the store.
+        """
+        self.conn.executemany("INSERT OR IGNORE INTO lookup VALUES (?)", ((key,) for key in keys))
+        found = {key: _load_template(template) for key, template in
+                 self.conn.execute("SELECT key, template FROM addresses JOIN lookup USING (key)")}
+        self.conn.execute("UPDATE addresses SET last_used = ? WHERE key IN (SELECT key FROM lookup)", (self.run,))
+        self.conn.execute("DELETE FROM lookup")
+        self.conn.commit()
+        return found
+
+    def put_many(self, entries):
+        """Add or replace entries.
+
+        Args:
+            entries (iterable): (key, template, standardized) tuples, standardized is None for addresses usaddress can not parse.
+        """
+        self.conn.executemany("INSERT OR REPLACE INTO addresses VALUES (?, ?, ?, ?)",
+                              ((key, _dump_template(template), standardized, self.run) for key, template, standardized in entries))
+        self.conn.commit()
+
+    def evict(self):
+        """Remove the least recently used entries above max_entries, returns the number removed"""
+        excess = len(self) - self.max_entries
+        if excess <= 0:
+            return 0
+        self.conn.execute("DELETE FROM addresses WHERE key IN (SELECT key FROM addresses ORDER BY last_used LIMIT ?)", (excess,))
+        self.conn.commit()
+        logging.info("Evicted %s entries from the address cache %s", excess, self.path)
+        return excess
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM addresses").fetchone()[0]
+
+    def close(self):
+        self.evict()
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+##================================================================
+## =============================== Memoized standardizer
+##================================================================
+
+class AddressStandardizer:
+    """Standardize address values with a bounded LRU cache of parses, kept between calls.
+
+    Args:
+        cache_size (int, optional): Maximum number of distinct addresses kept in the cache. Defaults to 100000.
+        workers (int, optional): Processes used to parse new addresses, 1 parses in this process.
+            Defaults to the number of CPUs.
+        parallel_threshold (int, optional): Minimum number of new addresses before the process pool is used. Defaults to 5000.
+        store (AddressCacheStore, optional): On-disk store checked before parsing and updated with new parses.
+            Defaults to None (in memory only).
+    """
+    def __init__(self, cache_size=DEFAULT_CACHE_SIZE, workers=None, parallel_threshold=PARALLEL_THRESHOLD, store=None):
+        self.cache_size = cache_size
+        self.workers = workers or os.cpu_count() or 1
+        self.parallel_threshold = parallel_threshold
+        self.store = store
+        self.cache = OrderedDict() # key -> template, None when usaddress could not parse the address
+        self.stats = {"rows": 0, "unique": 0, "cache_hits": 0, "store_hits": 0, "fast_path": 0, "parsed": 0}
+
+    def _remember(self, key, template):
+        self.cache[key] = template
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def _parse_all(self, addresses):
+        """usaddress components for each address, in a process pool when there are enough of them"""
+        if self.workers > 1 and len(addresses) >= self.parallel_threshold:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                return list(pool.map(parse_components, addresses, chunksize=max(1, len(addresses) // (self.workers * 4))))
+        return [parse_components(address) for address in addresses]
+
+    def templates(self, keys_to_addresses):
+        """Templates for {key: representative address}, from the cache, the store, the fast path, or usaddress"""
+        templates, missing = {}, {}
+        for key, address in keys_to_addresses.items():
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                templates[key] = self.cache[key]
+                self.stats["cache_hits"] += 1
+            else:
+                missing[key] = address
+
+        if self.store is not None and missing:
+            for key, template in self.store.get_many(missing).items():
+                templates[key] = template
+                self._remember(key, template)
+                del missing[key]
+                self.stats["store_hits"] += 1
+
+        new, to_parse = {}, {}
+        for key, address in missing.items():
+            template = _fast_path_template(address)
+            if template is not None:
+                self.stats["fast_path"] += 1
+                new[key] = template
+            else:
+                to_parse[key] = address
+
+        parsed = self._parse_all(list(to_parse.values()))
+        self.stats["parsed"] += len(parsed)
+        for (key, address), components in zip(to_parse.items(), parsed):
+            new[key] = _to_template(address, components) if components is not None else None
+
+        for key, template in new.items():
+            templates[key] = template
+            self._remember(key, template)
+        if self.store is not None and new:
+            self.store.put_many((key, template, _from_template(missing[key], template) if template is not None else None)
+                                for key, template in new.items())
+        return templates
+
+    def standardize(self, addresses):
+        """Standardize a column of addresses.
+
+        Args:
+            addresses (pd.Series): Address values, values that are not text are returned unchanged.
+
+        Returns:
+            pd.Series: Standardized addresses with the same index.
+        """
+        is_text = addresses.map(lambda value: isinstance(value, str))
+        collapsed = addresses[is_text].str.split().str.join(" ")
+        self.stats["rows"] += len(addresses)
+
+        distinct = pd.unique(collapsed)
+        keys = {}
+        for address in distinct:
+            keys.setdefault(normalize_key(address), address)
+        self.stats["unique"] += len(keys)
+        templates = self.templates(keys)
+
+        standardized = {}
+        for address in distinct:
+            template = templates[normalize_key(address)]
+            if template is not None:
+                standardized[address] = _from_template(address, template)
+        result = addresses.copy()
+        mapped = collapsed.map(standardized)
+        parsed = mapped.notna()
+        result.loc[mapped.index[parsed]] = mapped[parsed]
+        return result
+
+    def hit_rate(self):
+        """Share of the rows that did not need the usaddress parser (repeated values, cache and store hits, fast path)"""
+        return 1.0 - self.stats["parsed"] / self.stats["rows"] if self.stats["rows"] else 0.0
+
+    def print_stats(self):
+        """Print and log the cache statistics"""
+        stats = dict(self.stats, hit_rate=round(self.hit_rate(), 4), cache_entries=len(self.cache))
+        print(f"Address standardization: {stats['rows']} rows, {stats['unique']} unique, {stats['cache_hits']} cache hits, "
+              f"{stats['store_hits']} stored from earlier runs, {stats['fast_path']} fast path, {stats['parsed']} parsed with usaddress (hit rate {stats['hit_rate']:.1%})")
+        logging.info("Address standardization stats %s", stats)
+        return stats
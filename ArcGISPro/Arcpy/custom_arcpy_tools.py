@@ -8,7 +8,11 @@ import requests # access data from the web
 import zipfile ## need this to process and extract downloaded zipfiles later on
 import pandas as pd ## use to check spreadsheet formatting
 import webbrowser
+from itertools import islice ## read cursors in fixed size batches
 from IPython.display import IFrame
+import field_profiler as fp ## single pass field profiling engine, see showFieldinfo
+import geometry_hash as gh ## normalized geometry hashing for duplicate detection
+import overlap_detector as od ## R-tree based overlap detection, see check_Fc_Overlap_Index
 
 ###################################################################################################################################################################
 #  BE SURE TO INSTALL MAGIC LIBRARY: 
@@ -35,6 +39,9 @@ import magic ## to validate file type requested from web, custom shapefile downl
     ## To list detailed field info including unique value counts:
     # cat.showFieldinfo(fc)
 
+    ## To profile a shapefile without arcpy (e.g., on Linux), use the field_profiler module directly:
+    # fp.print_profile(fp.profile_shapefile(shp_path))
+
     ## To create a folder in the same path as your python script
     # cat.get_path_mkfolder(make_folder=False,folder_name=None)
 
@@ -47,6 +54,9 @@ import magic ## to validate file type requested from web, custom shapefile downl
     ## To access the ArcGIS Documentation from with a notebook or a stand-alone script as a new browser window
     # cat.open_arcgis_documentation(notebook=True)
 
+    ## To find overlapping features in memory with a spatial index (no output feature class)
+    # cat.check_Fc_Overlap_Index(input_fc, workers=4)
+
 
     
 #====================================================================================================================================================
@@ -131,7 +141,7 @@ def listFC_dataset_Attributes(workspace=None): # accepts a workspace path parame
 
 ###====================== TOOL2: Takes an input feature class and lists detailed info for the field names, type, length, and unique value and unique geometry (WKT) counts
 
-def showFieldinfo(fc):
+def showFieldinfo(fc, approximate=False, memory_cap=fp.DEFAULT_MEMORY_CAP, batch_size=fp.DEFAULT_BATCH_SIZE, tolerance=None):
     """
     Outputs detailed field information for a given ArcGIS Feature Class.
 
@@ -141,16 +151,29 @@ def showFieldinfo(fc):
     - Field length (applicable for Text fields)
     - Count of unique values for each field
     
-    Additionally, it prints counts of total records and total unique Geometries (by Well-Known Text String) for the Feature Class
+    Additionally, it prints counts of total records and total unique Geometries for the Feature Class, and the ObjectIDs of duplicate geometries.
+    Geometries are compared by a normalized hash (see geometry_hash), so the same shape with a different ring start, 
+    winding or float formatting is still reported as a duplicate
+
+    The feature class is read once with a single SearchCursor over all fields, in column batches, 
+    and profiled by field_profiler (distinct/null counts, min/max, geometry duplicates)
 
     Args:
     fc (str): 
         The path to the Feature Class to be analyzed. Must be accessible within the current ArcPy workspace.
+    approximate (bool, optional):
+        Use HyperLogLog (approximate) distinct counts for every field. Defaults to False
+    memory_cap (int, optional):
+        Bytes per field allowed for exact distinct counts before switching to HyperLogLog
+    batch_size (int, optional):
+        Number of rows per column batch. Defaults to 10000
+    tolerance (float, optional):
+        Coordinate tolerance for duplicate geometries. Defaults to the XY tolerance of the feature class spatial reference
     
     Returns:
-    None
-        This function prints the summary information directly to the console. 
-        It does not return any values.
+    dict
+        The structured profile (see field_profiler.profile_batches), also printed to the console.
+        Use pd.DataFrame(profile["fields"]) to get the field summary as a table
 
     Example:
     --------
@@ -173,34 +196,35 @@ def showFieldinfo(fc):
     Shape_Area           | Double     | 8     | 2743      
     Combined_GNIS_IDs    | String     | 50    | 2743      
 
-    Total Record Count: 2744, Total Geometry Count(by WKT): 2743
+    Total Record Count: 2744, Total Geometry Count(by normalized hash): 2743
     Warning 1 Potential Duplicate Features Detected in the Feature Class
+      Same geometry: [1093, 2744]
     """
-    record_count = arcpy.management.GetCount(fc)[0]
-    shape_type = arcpy.Describe(fc).shapeType
-      
-    print(f"*Summary*\n Fields in the {shape_type} Feature Class: {fc}\n")
-    print("Name                 Type         Length   Unique_Values")
-
-
-    geometry_set = set()
-    with arcpy.da.SearchCursor(fc,["SHAPE@WKT"]) as cursor:
-        for row in cursor:
-            geometry_set.add(row[0])
-    for field in arcpy.ListFields(fc):
-        unique_ids = set()
-        field_name= str(field.name)
-        with arcpy.da.SearchCursor(fc,[field_name]) as cursor:
-            for row in cursor:
-                if row[0] is not None:
-                    unique_ids.add(row[0])
-        print( f" {field.name:20} | {field.type:10} | {str(field.length):5} | {str(len(unique_ids)):10}")
-        
-    print(f"\nTotal Record Count: {record_count}, Total Geometry Count(by WKT): {len(geometry_set)}")
+    desc = arcpy.Describe(fc)
+    fields = [f for f in arcpy.ListFields(fc) if f.type != "Geometry"]
+    geometry_fields = [f for f in arcpy.ListFields(fc) if f.type == "Geometry"]
+
+    # one cursor for every field, the geometry is read as WKT and only kept as a digest
+    cursor_fields = [f.name for f in fields] + (["SHAPE@WKT"] if geometry_fields else [])
 
-    if record_count != len(geometry_set):
-        print(f"Warning {(int(record_count)-len(geometry_set))} Potential Duplicate Features Detected in the Feature Class")
-    return
+    def cursor_batches():
+        with arcpy.da.SearchCursor(fc, cursor_fields) as cursor:
+            while True:
+                rows = list(islice(cursor, batch_size))
+                if not rows:
+                    break
+                yield dict(zip(cursor_fields, (list(column) for column in zip(*rows))))
+
+    if tolerance is None:
+        tolerance = getattr(desc.spatialReference, "XYTolerance", None) or gh.DEFAULT_TOLERANCE
+
+    profile = fp.profile_batches(cursor_batches(), [(f.name, f.type, f.length) for f in fields],
+                                 geometry_field="SHAPE@WKT" if geometry_fields else None,
+                                 table_name=fc, shape_type=desc.shapeType,
+                                 approximate=approximate, memory_cap=memory_cap,
+                                 oid_field=desc.OIDFieldName, tolerance=tolerance)
+    fp.print_profile(profile)
+    return profile
 
 
 ###====================== TOOL3: Creates a sub-folder within the folder where your python script exists
@@ -446,6 +470,7 @@ def open_arcgis_documentation(notebook=True):
 def check_Fc_NonselfOverlap(input_fc, output_fc_name):
     """ Detects overlapping features within a feature class using PairwiseIntersect.
         Returns duplicate pair object ID and count
+        See check_Fc_Overlap_Index for an in-memory alternative that does not write an output feature class
     Args:
         input_fc (str): Full path or name of the feature class
         output_fc_name: output feature class name for PairwiseIntersect results
@@ -507,4 +532,37 @@ def check_Fc_NonselfOverlap(input_fc, output_fc_name):
     except Exception as e:
         print("Error Occurred", e, type(e).__name__)
     except arcpy.ExecuteError:
-        print("ArcPy Error", arcpy.GetMessages(2))
\ No newline at end of file
+        print("ArcPy Error", arcpy.GetMessages(2))
+
+
+###===================  TOOL8: Detect Overlapping Features within a Feature Class using a spatial index (R-tree)
+
+
+def check_Fc_Overlap_Index(input_fc, workers=1, min_area=0.0):
+    """ Detects overlapping features within a feature class without PairwiseIntersect.
+        Reads the features once, builds an R-tree over their extents and computes the exact overlap area
+        only for pairs whose extents overlap (see overlap_detector). No output feature class or layer is created
+    Args:
+        input_fc (str): Full path or name of the polygon feature class
+        workers (int, optional): Number of processes used to test candidate pairs. Defaults to 1
+        min_area (float, optional): Only report overlaps larger than this area, in feature class units. Defaults to 0.0
+    Returns:
+        count (int) : number of overlapping feature pairs
+        overlap_ids (list):  list of Object IDs of overlapping features (the higher Object ID of each pair)
+        overlaps (list) : (oid_a, oid_b, overlap_area) for each overlapping pair
+    Example:
+    --------
+    >>> check_Fc_Overlap_Index("city_township_unorg")
+        Overlap index detected 1 overlaps for the following objects Ids: 
+        [2745]
+        (1, [2745], [(1093, 2745, 52.7)])
+    """
+    try:
+        with arcpy.da.SearchCursor(input_fc, ["OID@", "SHAPE@WKT"]) as cursor:
+            overlaps = od.find_overlaps(cursor, workers=workers, min_area=min_area)
+        return od.summarize_overlaps(overlaps)
+
+    except arcpy.ExecuteError:
+        print("ArcPy Error", arcpy.GetMessages(2))
+    except Exception as e:
+        print("Error Occurred", e, type(e).__name__)
@@ -0,0 +1,260 @@
+""" =======================================================================================================
+        BATCH ETL: Run the schema guided ETL over many CSV inputs with a process pool
+    =======================================================================================================
+
+    Runs the clean and align step of the schema guided ETL workflow (ETL_arcrpy_v2.py) for a folder or a manifest of
+    CSV inputs in parallel, and loads the results into one file geodatabase.
+
+        - Cleaning and validation run in a process pool (etl_streaming, no arcpy needed in the workers)
+        - Geodatabase writes are done by a single writer (this process), one feed at a time, as workers finish,
+          because file geodatabases do not support concurrent writers
+        - A per file report (timings and row counts) and one combined validation issues table are written
+
+    For each input feed <name> the geodatabase gets CleanedData_<name> and InputAddressData_<name>, and all
+    validation issues go to one ValidationIssues table with a source_file column, the schema fields and an other_fields
+    column holding the unmapped input columns of each feed.
+
+    COMMAND LINE:
+
+        python etl_batch.py --gdb C:/data/staging.gdb --inputs C:/feeds --template *Address* --mapping mapping.json --workers 8
+
+    MANIFEST (instead of a folder): a JSON list or a CSV with a "csv" column, and optional "mapping" (per feed mapping
+    file) and "table" (output table suffix) columns. Relative paths are resolved from the manifest folder.
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+import etl_loaders
+import etl_streaming # arcpy free cleaning, safe to run in worker processes
+
+
+##================================================================
+## =============================== Inputs: folder or manifest
+##================================================================
+
+def _table_suffix(csv_path):
+    """Geodatabase safe suffix from a file name (letters, digits and underscores)"""
+    name = re.sub(r"\W", "_", os.path.splitext(os.path.basename(csv_path))[0])
+    return name if not name[:1].isdigit() else f"_{name}"
+
+
+def read_inputs(inputs, mapping_path=None):
+    """List the feeds to process from a folder of CSVs or a manifest file.
+
+    Args:
+        inputs (str): Folder containing CSV files, or a manifest (.json or .csv).
+        mapping_path (str, optional): Field mapping file used by feeds that do not name their own. Defaults to None.
+
+    Returns:
+        list: dicts with csv (path), mapping (path or None) and table (output table suffix) for each feed.
+    """
+    if os.path.isdir(inputs):
+        feeds = [{"csv": os.path.join(inputs, f)} for f in sorted(os.listdir(inputs)) if f.lower().endswith(".csv")]
+    else:
+        base = os.path.dirname(os.path.abspath(inputs))
+        if inputs.lower().endswith(".json"):
+            with open(inputs, "r", encoding="utf-8") as f:
+                feeds = [entry if isinstance(entry, dict) else {"csv": entry} for entry in json.load(f)]
+        else:
+            feeds = pd.read_csv(inputs, dtype=str).to_dict("records")
+        for feed in feeds:
+            for key in ("csv", "mapping"):
+                if isinstance(feed.get(key), str) and feed[key] and not os.path.isabs(feed[key]):
+                    feed[key] = os.path.join(base, feed[key])
+
+    for feed in feeds:
+        if not isinstance(feed.get("mapping"), str) or not feed["mapping"]:
+            feed["mapping"] = mapping_path
+        if not isinstance(feed.get("table"), str) or not feed["table"]:
+            feed["table"] = _table_suffix(feed["csv"])
+    return feeds
+
+
+##================================================================
+## =============================== Worker: clean and validate one feed
+##================================================================
+
+def clean_feed(job):
+    """Clean and validate one CSV into staging CSVs. Runs in a worker process, does not touch the geodatabase.
+
+    Args:
+        job (dict): csv, table, schema, field_mapping_dict, missing_defaults, staging_dir and chunksize.
+
+    Returns:
+        dict: csv, table, cleaned_csv, issues_csv (None when there are no issues), summary, clean_seconds and error.
+    """
+    start = time.perf_counter()
+    result = {"csv": job["csv"], "table": job["table"], "cleaned_csv": None, "issues_csv": None,
+              "summary": {}, "clean_seconds": 0.0, "error": None}
+    try:
+        input_columns = list(pd.read_csv(job["csv"], nrows=1).columns)
+        missing_columns = {input_col: job["missing_defaults"].get(input_col, "")
+                           for input_col in job["field_mapping_dict"].values() if input_col and input_col not in input_columns}
+        cleaned_csv = os.path.join(job["staging_dir"], f"CleanedData_{job['table']}.csv")
+        issues_csv = os.path.join(job["staging_dir"], f"ValidationIssues_{job['table']}.csv")
+        result["summary"] = etl_streaming.stream_clean_and_align(
+            job["csv"], job["schema"], job["field_mapping_dict"], cleaned_csv, issues_csv,
+            duplicates_path=os.path.join(job["staging_dir"], f"duplicates_found_{job['table']}.csv"),
+            chunksize=job["chunksize"], missing_columns=missing_columns)
+        result["cleaned_csv"] = cleaned_csv
+        result["issues_csv"] = issues_csv if os.path.exists(issues_csv) else None
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["clean_seconds"] = round(time.perf_counter() - start, 3)
+    return result
+
+
+##================================================================
+## =============================== Single writer: load results into the geodatabase
+##================================================================
+
+def _append_issues(issues_csv, source_file, combined_path, written, columns):
+    """Append one feed's validation issues to the combined table, chunk by chunk, with a source_file column
+
+    Every feed is written with the same columns (source_file, the schema fields, other_fields), input columns that are
+    not mapped to the schema differ between feeds and are packed as JSON into other_fields
+    """
+    for chunk in pd.read_csv(issues_csv, chunksize=etl_streaming.DEFAULT_CHUNKSIZE, dtype=str):
+        extra = [c for c in chunk.columns if c not in columns]
+        other_fields = ([json.dumps({k: v for k, v in row.items() if isinstance(v, str)}) for row in chunk[extra].to_dict("records")]
+                        if extra else "")
+        chunk = chunk.reindex(columns=columns)
+        chunk.insert(0, "source_file", os.path.basename(source_file))
+        chunk["other_fields"] = other_fields
+        chunk.to_csv(combined_path, mode="a" if written else "w", header=not written, index=False)
+        written = True
+    return written
+
+
+def run_batch(gdb_path, inputs, featureClass_name, mapping_path=None, workers=None, chunksize=etl_streaming.DEFAULT_CHUNKSIZE,
+              report_path=None, loader=None):
+    """Clean many CSV feeds in parallel and load them into one geodatabase through a single writer.
+
+    Args:
+        gdb_path (str): Path to the file geodatabase (.gdb).
+        inputs (str): Folder of CSV files or a manifest file (see read_inputs).
+        featureClass_name (str): Template feature class name or wildcard pattern (e.g., *Address*).
+        mapping_path (str, optional): Default field mapping file (JSON/YAML). Defaults to matching column names.
+        workers (int, optional): Number of worker processes. Defaults to the number of CPUs.
+        chunksize (int, optional): Rows per chunk in the workers. Defaults to 100000.
+        report_path (str, optional): CSV for the per file report. Defaults to etl_batch_report.csv next to the geodatabase.
+        loader (etl_loaders.TableLoader, optional): Loader backend used by the writer. Defaults to an arcpy InsertCursor
+            loader on gdb_path.
+
+    Returns:
+        pd.DataFrame: The per file report (rows, duplicates, issues, clean/load/total seconds, error).
+    """
+    import ETL_arcrpy_v2 as etl # imports arcpy, only the writer (this process) needs it
+
+    batch_start = time.perf_counter()
+    feeds = read_inputs(inputs, mapping_path)
+    if not feeds:
+        print(f"No CSV inputs found in {inputs}")
+        return pd.DataFrame()
+
+    etl.set_workspace(gdb_path)
+    template_fc = etl.find_template_fc(featureClass_name)
+    schema = etl.get_schema(template_fc)
+    loader = loader or etl_loaders.ArcpyTableLoader(gdb_path)
+
+    mappings = {}
+    jobs = []
+    staging_dir = tempfile.mkdtemp(prefix="etl_batch_")
+    for feed in feeds:
+        if feed["mapping"]:
+            key = feed["mapping"]
+        else: # the default mapping matches column names, so it depends on the header of each feed
+            columns = list(pd.read_csv(feed["csv"], nrows=1).columns)
+            key = (None, tuple(columns))
+        if key not in mappings:
+            if feed["mapping"]:
+                mappings[key] = etl.load_field_mapping(feed["mapping"])
+            else:
+                mappings[key] = (etl.default_field_mapping(list(schema.keys()), columns), {})
+        field_mapping_dict, missing_defaults = mappings[key]
+        jobs.append({"csv": feed["csv"], "table": feed["table"], "schema": schema, "field_mapping_dict": field_mapping_dict,
+                     "missing_defaults": missing_defaults, "staging_dir": staging_dir, "chunksize": chunksize})
+
+    combined_issues = os.path.join(gdb_path, "ValidationIssues.csv")
+    issues_written = False
+    report = []
+    print(f"\nCleaning {len(jobs)} inputs with {workers or os.cpu_count()} workers...\n")
+    logging.info("Batch ETL started for %s inputs", len(jobs))
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(clean_feed, job): job for job in jobs}
+            for future in as_completed(futures):
+                result = future.result()
+                job = futures[future]
+                load_seconds = 0.0
+                if result["error"]:
+                    print(f"Error cleaning {result['csv']}: {result['error']}")
+                    logging.error("Error cleaning %s: %s", result["csv"], result["error"])
+                else:
+                    # single writer: only this process writes to the geodatabase, one feed at a time
+                    load_start = time.perf_counter()
+                    try:
+                        fields = etl.get_output_fields(template_fc, job["field_mapping_dict"])
+                        loader.load_csv(result["cleaned_csv"], f"CleanedData_{result['table']}", fields, chunksize)
+                        loader.load_csv(result["csv"], f"InputAddressData_{result['table']}", chunksize=chunksize)
+                        if result["issues_csv"]:
+                            issues_written = _append_issues(result["issues_csv"], result["csv"], combined_issues, issues_written,
+                                                            list(schema.keys()))
+                    except Exception as e:
+                        result["error"] = f"{type(e).__name__}: {e}"
+                        print(f"Error loading {result['csv']}: {result['error']}")
+                        logging.error("Error loading %s: %s", result["csv"], result["error"])
+                    load_seconds = round(time.perf_counter() - load_start, 3)
+
+                summary = result["summary"]
+                report.append({"csv": result["csv"], "table": result["table"],
+                               "rows_read": summary.get("rows_read"), "rows_written": summary.get("rows_written"),
+                               "duplicate_rows": summary.get("duplicate_rows"), "missing_value_rows": summary.get("missing_value_rows"),
+                               "clean_seconds": result["clean_seconds"], "load_seconds": load_seconds,
+                               "total_seconds": round(result["clean_seconds"] + load_seconds, 3), "error": result["error"]})
+                logging.info("Batch ETL finished %s", report[-1])
+
+        if issues_written:
+            loader.load_csv(combined_issues, "ValidationIssues", chunksize=chunksize)
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+    report_df = pd.DataFrame(report)
+    report_path = report_path or os.path.join(os.path.dirname(os.path.abspath(gdb_path)), "etl_batch_report.csv")
+    report_df.to_csv(report_path, index=False)
+    print("\nBatch ETL Summary:\n")
+    print(report_df.drop(columns=["csv"]).to_string(index=False))
+    print(f"\nProcessed {len(report_df)} inputs in {time.perf_counter() - batch_start:.1f} seconds, report saved to {report_path}")
+    logging.info("Batch ETL completed, report saved to %s", report_path)
+    return report_df
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Clean and load many CSV inputs into a file geodatabase in parallel.")
+    parser.add_argument("--gdb", required=True, help="Path to the file geodatabase (.gdb)")
+    parser.add_argument("--inputs", required=True, help="Folder of CSV files, or a manifest (.json or .csv)")
+    parser.add_argument("--template", required=True, help="Template feature class name or wildcard pattern (e.g., *Address*)")
+    parser.add_argument("--mapping", help="Default field mapping file (JSON or YAML), defaults to matching column names")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes (default: number of CPUs)")
+    parser.add_argument("--chunksize", type=int, default=etl_streaming.DEFAULT_CHUNKSIZE, help="Rows per chunk in the workers")
+    parser.add_argument("--report", help="Per file report CSV (default: etl_batch_report.csv next to the geodatabase)")
+    parser.add_argument("--log", default="etl_batch.log", help="Log file path (default: etl_batch.log)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(filename=args.log, filemode="w", level=logging.INFO,
+                        format="%(asctime)s - %(levelname)s - %(message)s")
+    run_batch(args.gdb, args.inputs, args.template, args.mapping, args.workers, args.chunksize, args.report)
+    logging.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+""" =======================================================================================================
+        INCREMENTAL ETL: Load only the rows that changed since the last run
+    =======================================================================================================
+
+    Delta mode for the schema guided ETL workflow (ETL_arcrpy_v2.py). Instead of replacing the output table on every
+    run, each row gets a stable 64-bit hash over the loaded fields, and a hash index (SQLite, one per geodatabase)
+    remembers the hash and OID of every row in the target table. A run then only:
+
+        - inserts rows whose key is not in the index
+        - updates rows whose key is in the index with another row hash
+        - deletes rows whose key was not in this run's input
+
+    The key is the row hash itself (changed rows are deleted and inserted), or a hash of key_fields when the data has
+    an identifier (changed rows are updated in place). Each load records a watermark (run number, time, source, counts
+    and status) in the index, the run number is reserved when the load starts so a failed load never shares it with
+    the next one. The table is loaded in full, and the index rebuilt, when the target table is missing, the fields
+    changed, the last load did not complete, or the index was written by another INDEX_VERSION.
+
+    USAGE:
+
+        loader = etl_loaders.ArcpyTableLoader(gdb_path)
+        with etl_incremental.HashIndex(os.path.join(gdb_path, "etl_hash_index.sqlite")) as index:
+            etl_incremental.load_incremental(loader, cleaned_df, "CleanedData", index, fields, key_fields=["address_id"])
+            print(index.watermark("CleanedData"))
+"""
+import datetime
+import json
+import logging
+import sqlite3
+
+import pandas as pd
+
+import etl_loaders
+import etl_streaming
+
+INDEX_VERSION = f"2-pandas-{pd.__version__}" # hash_pandas_object values are only guaranteed within a pandas version
+DEFAULT_INDEX_NAME = "etl_hash_index.sqlite"
+
+
+def _signed(hashes):
+    """uint64 hashes as int64, SQLite integers are signed 64-bit"""
+    return pd.Series(hashes.to_numpy().view("int64"), index=hashes.index)
+
+
+_INTEGER_TYPES = ("Short", "SmallInteger", "Long", "Integer", "BigInteger")
+_FLOAT_TYPES = ("Float", "Single", "Double")
+
+
+def _hash_column(series, field_type):
+    """Column in the one dtype of its field type, hash_pandas_object hashes 1 (int64) and 1.0 (float64) differently"""
+    if field_type in _INTEGER_TYPES:
+        values = pd.to_numeric(series, errors="coerce")
+        return values.astype("Int64") if (values.dropna() % 1 == 0).all() else values.astype("float64")
+    if field_type in _FLOAT_TYPES:
+        return pd.to_numeric(series, errors="coerce").astype("float64")
+    if field_type == "Date":
+        values = pd.to_datetime(series, errors="coerce")
+        if values.dt.tz is not None:
+            values = values.dt.tz_convert(None)
+        return values.astype("datetime64[ns]") # a datetime hashes by its integer value, which depends on the unit
+    return series.astype(object).where(series.notna(), None).map(lambda v: v if v is None else str(v))
+
+
+def row_hashes(df, columns, field_types=None):
+    """Stable 64-bit hash of each row over the given columns (missing columns hash as empty)
+
+    Args:
+        df (pd.DataFrame): Rows to hash.
+        columns (list): Columns covered by the hash.
+        field_types (dict, optional): {column: ArcGIS field type}, each column is cast to the dtype of its type first so
+            a row hashes the same whatever dtype pandas gave the chunk. Defaults to None (text).
+    """
+    frame = df.reindex(columns=list(columns))
+    frame = pd.DataFrame({c: _hash_column(frame[c], (field_types or {}).get(c)) for c in frame.columns}, index=frame.index)
+    return _signed(pd.util.hash_pandas_object(frame, index=False))
+
+
+##================================================================
+## =============================== Hash index and watermarks
+##================================================================
+
+class HashIndex:
+    """SQLite index of the row hashes and OIDs loaded into each target table, with a watermark per load.
+
+    Args:
+        path (str): SQLite file, created if it does not exist.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS watermarks (table_name TEXT, run INTEGER, loaded_at TEXT, source TEXT,
+                             version TEXT, fields TEXT, full_load INTEGER, rows INTEGER, inserted INTEGER, updated INTEGER,
+                             deleted INTEGER, unchanged INTEGER, duplicate_keys INTEGER, status TEXT DEFAULT 'done',
+                             PRIMARY KEY (table_name, run))""")
+        if "status" not in [c[1] for c in self.conn.execute("PRAGMA table_info(watermarks)")]: # index of an earlier version
+            self.conn.execute("ALTER TABLE watermarks ADD COLUMN status TEXT DEFAULT 'done'")
+        self.conn.execute("CREATE TEMP TABLE batch (key INTEGER PRIMARY KEY, row_hash INTEGER, pos INTEGER)")
+        self.conn.execute("CREATE TEMP TABLE occurrences (row_hash INTEGER PRIMARY KEY, n INTEGER)")
+
+    def _rows_table(self, table_name):
+        return f'"rows_{table_name}"'
+
+    def watermark(self, table_name):
+        """Last completed load of table_name as a dict, None if it was never loaded"""
+        cursor = self.conn.execute("SELECT * FROM watermarks WHERE table_name = ? AND status = 'done' ORDER BY run DESC LIMIT 1",
+                                   (table_name,))
+        row = cursor.fetchone()
+        return dict(zip([c[0] for c in cursor.description], row)) if row else None
+
+    def interrupted(self, table_name):
+        """True when the last load of table_name did not complete (failed, or killed while 'running'): the table may
+        hold rows of that load the index does not know about, so the next load is a full load"""
+        last = self.conn.execute("SELECT status FROM watermarks WHERE table_name = ? ORDER BY run DESC LIMIT 1",
+                                 (table_name,)).fetchone()
+        return last is not None and last[0] != "done"
+
+    def start_run(self, table_name, source=None):
+        """Reserve the next run number of table_name with a 'running' watermark, committed before any row is loaded.
+
+        Run numbers are never reused, and a load that follows a failed or killed one is a full load (see interrupted).
+        """
+        last = self.conn.execute("SELECT MAX(run) FROM watermarks WHERE table_name = ?", (table_name,)).fetchone()[0]
+        run = (last or 0) + 1
+        self.conn.execute("INSERT INTO watermarks (table_name, run, loaded_at, source, version, status) VALUES (?, ?, ?, ?, ?, 'running')",
+                          (table_name, run, datetime.datetime.now().isoformat(timespec="seconds"), source, INDEX_VERSION))
+        self.conn.commit()
+        return run
+
+    def is_current(self, table_name, fields_signature):
+        """True when the index holds the rows of table_name, for the same fields and index version"""
+        last = self.watermark(table_name)
+        return last is not None and last["version"] == INDEX_VERSION and last["fields"] == fields_signature
+
+    def reset(self, table_name):
+        rows = self._rows_table(table_name)
+        self.conn.execute(f"DROP TABLE IF EXISTS {rows}")
+        self.conn.execute(f"CREATE TABLE {rows} (key INTEGER PRIMARY KEY, row_hash INTEGER, oid INTEGER, run INTEGER)")
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+##================================================================
+## =============================== Incremental target table
+##================================================================
+
+class IncrementalTable:
+    """Target table loaded in delta mode, used like the writers of etl_loaders: append(df) for each chunk, then close().
+
+    Args:
+        loader (etl_loaders.TableLoader): Loader backend of the target table.
+        index (HashIndex): Hash index of the geodatabase.
+        table_name (str): Target table name.
+        fields (list): etl_loaders.OutputField list of the loaded fields, the row hash covers these fields.
+        key_fields (list, optional): Fields identifying a record, changed records are updated in place.
+            Defaults to None (the key is the row hash).
+        source (str, optional): Input recorded in the watermark (e.g., the CSV path). Defaults to None.
+    """
+    def __init__(self, loader, index, table_name, fields, key_fields=None, source=None):
+        self.index = index
+        self.table_name = table_name
+        self.fields = fields
+        self.columns = [f.name for f in fields]
+        self.field_types = {f.name: f.type for f in fields}
+        self.key_fields = list(key_fields) if key_fields else None
+        self.source = source
+        self.fields_signature = json.dumps([[f.name, f.type] for f in fields])
+        self.full_load = (not loader.exists(table_name) or not index.is_current(table_name, self.fields_signature)
+                          or index.interrupted(table_name))
+        if self.full_load:
+            index.reset(table_name)
+        self.run = index.start_run(table_name, source)
+        self.rows_table = index._rows_table(table_name)
+        self.writer = loader.open_table(table_name, fields, replace=self.full_load)
+        index.conn.execute("DELETE FROM occurrences")
+        self.summary = {"rows": 0, "inserted": 0, "updated": 0, "deleted": 0, "unchanged": 0, "duplicate_keys": 0}
+
+    def _occurrence_keys(self, row_hash):
+        """Keys for rows without key fields: the row hash, combined with the occurrence number for repeated rows,
+        so identical rows are kept as separate records like in a full load"""
+        conn = self.index.conn
+        unique = pd.unique(row_hash)
+        conn.executemany("INSERT OR IGNORE INTO occurrences VALUES (?, 0)", ((int(h),) for h in unique))
+        earlier = pd.Series(dict(conn.execute("SELECT row_hash, n FROM occurrences WHERE n > 0")))
+        occurrence = row_hash.groupby(row_hash).cumcount() + row_hash.map(earlier).fillna(0).astype("int64")
+        counts = row_hash.value_counts()
+        conn.executemany("UPDATE occurrences SET n = n + ? WHERE row_hash = ?", ((int(c), int(h)) for h, c in counts.items()))
+        repeated = occurrence > 0
+        if not repeated.any():
+            return row_hash
+        key = row_hash.copy()
+        key[repeated] = _signed(pd.util.hash_pandas_object(
+            pd.DataFrame({"row_hash": row_hash[repeated], "occurrence": occurrence[repeated]}), index=False))
+        return key
+
+    def append(self, df):
+        """Compare a chunk with the index and apply its inserts and updates to the target table"""
+        conn = self.index.conn
+        self.summary["rows"] += len(df)
+        row_hash = row_hashes(df, self.columns, self.field_types)
+        key = row_hashes(df, self.key_fields, self.field_types) if self.key_fields else self._occurrence_keys(row_hash)
+        repeated = key.duplicated()
+        self.summary["duplicate_keys"] += int(repeated.sum())
+
+        positions = [i for i, r in enumerate(repeated) if not r]
+        conn.executemany("INSERT INTO batch VALUES (?, ?, ?)",
+                         ((int(key.iat[i]), int(row_hash.iat[i]), i) for i in positions))
+        new, changed, changed_oids, changed_keys, loaded = [], [], [], [], []
+        for pos, batch_hash, stored_hash, oid, run in conn.execute(
+                f"SELECT b.pos, b.row_hash, r.row_hash, r.oid, r.run FROM batch b LEFT JOIN {self.rows_table} r USING (key)").fetchall():
+            if oid is None:
+                new.append(pos)
+            elif run == self.run: # key already loaded by an earlier chunk of this run
+                self.summary["duplicate_keys"] += 1
+                loaded.append((pos,))
+            elif stored_hash != batch_hash:
+                changed.append(pos)
+                changed_oids.append(oid)
+                changed_keys.append((batch_hash, self.run, int(key.iat[pos])))
+            else:
+                self.summary["unchanged"] += 1
+
+        conn.executemany("DELETE FROM batch WHERE pos = ?", loaded)
+        new.sort()
+        if new:
+            oids = self.writer.insert(df.iloc[new])
+            conn.executemany(f"INSERT INTO {self.rows_table} VALUES (?, ?, ?, ?)",
+                             ((int(key.iat[pos]), int(row_hash.iat[pos]), oid, self.run) for pos, oid in zip(new, oids)))
+            self.summary["inserted"] += len(new)
+        if changed:
+            self.writer.update(changed_oids, df.iloc[changed])
+            conn.executemany(f"UPDATE {self.rows_table} SET row_hash = ?, run = ? WHERE key = ?", changed_keys)
+            self.summary["updated"] += len(changed)
+        conn.execute(f"UPDATE {self.rows_table} SET run = ? WHERE key IN (SELECT key FROM batch)", (self.run,))
+        conn.execute("DELETE FROM batch")
+        self.writer.flush() # the table rows first, the index must never list rows the table does not have
+        conn.commit()
+        return self.summary["rows"]
+
+    def close(self):
+        """Delete the rows that were not in this run's input and record the watermark"""
+        conn = self.index.conn
+        stale = [oid for (oid,) in conn.execute(f"SELECT oid FROM {self.rows_table} WHERE run < ?", (self.run,))]
+        if stale:
+            self.writer.delete(stale)
+            conn.execute(f"DELETE FROM {self.rows_table} WHERE run < ?", (self.run,))
+        self.summary["deleted"] = len(stale)
+        self.writer.close()
+        self._record("done")
+        logging.info("Incremental load of %s (run %s, full_load=%s): %s", self.table_name, self.run, self.full_load, self.summary)
+        print(f"{self.table_name}: {self.summary['inserted']} inserted, {self.summary['updated']} updated, "
+              f"{self.summary['deleted']} deleted, {self.summary['unchanged']} unchanged"
+              f"{' (full load)' if self.full_load else ''}")
+
+    def abort(self):
+        """Close the target table after a failed load, without deleting rows, and mark its watermark as failed"""
+        self.writer.close()
+        self._record("failed")
+
+    def _record(self, status):
+        self.index.conn.execute("""UPDATE watermarks SET loaded_at = ?, fields = ?, full_load = ?, rows = ?, inserted = ?,
+                                   updated = ?, deleted = ?, unchanged = ?, duplicate_keys = ?, status = ?
+                                   WHERE table_name = ? AND run = ?""",
+                                (datetime.datetime.now().isoformat(timespec="seconds"), self.fields_signature, int(self.full_load),
+                                 self.summary["rows"], self.summary["inserted"], self.summary["updated"], self.summary["deleted"],
+                                 self.summary["unchanged"], self.summary["duplicate_keys"], status, self.table_name, self.run))
+        self.index.conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if exc[0] is None:
+            self.close()
+        else: # do not delete rows for a failed load, its run number stays used and the next load is a full load
+            self.abort()
+
+
+##================================================================
+## =============================== Loading DataFrames and CSV files
+##================================================================
+
+def load_incremental(loader, df, table_name, index, fields=None, key_fields=None, source=None):
+    """Load a DataFrame into table_name in delta mode.
+
+    Args:
+        loader (etl_loaders.TableLoader): Loader backend of the target table.
+        df (pd.DataFrame): Full current content of the table, already coerced to the field types.
+        table_name (str): Target table name.
+        index (HashIndex): Hash index of the geodatabase.
+        fields (list, optional): etl_loaders.OutputField list. Defaults to fields inferred from df.
+        key_fields (list, optional): Fields identifying a record. Defaults to None (the key is the row hash).
+        source (str, optional): Input recorded in the watermark. Defaults to None.
+
+    Returns:
+        dict: Counts of the load (rows, inserted, updated, deleted, unchanged, duplicate_keys).
+    """
+    with IncrementalTable(loader, index, table_name, fields or etl_loaders.infer_fields(df), key_fields, source) as table:
+        table.append(df)
+    return table.summary
+
+
+def load_csv_incremental(loader, csv_path, table_name, index, fields=None, key_fields=None,
+                         chunksize=etl_streaming.DEFAULT_CHUNKSIZE):
+    """Load a CSV into table_name in delta mode, chunk by chunk (same arguments as load_incremental)"""
+    table = None
+    try:
+        for fields, chunk in etl_loaders.read_csv_chunks(csv_path, fields, chunksize):
+            if table is None:
+                table = IncrementalTable(loader, index, table_name, fields, key_fields, source=csv_path)
+            table.append(chunk)
+    except Exception:
+        if table is not None:
+            table.abort()
+        raise
+    if table is None:
+        return {}
+    table.close()
+    return table.summary
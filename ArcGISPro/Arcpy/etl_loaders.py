@@ -0,0 +1,432 @@
+""" =======================================================================================================
+        ETL LOADERS: Write typed DataFrames straight into output tables in batched inserts
+    =======================================================================================================
+
+    Loader backends for the schema guided ETL workflow (ETL_arcrpy_v2.py). Instead of writing the cleaned DataFrame to a
+    temporary CSV and letting arcpy.conversion.TableToTable parse it again (and guess the types again), the loaders create
+    the output table from the field schema and insert the already typed column values in batches.
+
+        - ArcpyTableLoader:  file geodatabase table, arcpy.management.CreateTable/AddField + arcpy.da.InsertCursor
+        - SQLiteTableLoader: SQLite database, or an OGC GeoPackage when the path ends with .gpkg (no arcpy, for Linux testing)
+
+    Both take the output fields as OutputField(name, type, length, alias) with ArcGIS field type names, the
+    properties of the template feature class fields (see output_fields).
+
+    USAGE:
+
+        loader = etl_loaders.SQLiteTableLoader("staging.gpkg")
+        loader.load(cleaned_df, "CleanedData", fields)
+
+        # or append chunk by chunk (e.g., from etl_streaming)
+        with loader.open_table("CleanedData", fields) as table:
+            table.append(chunk)
+"""
+import datetime
+import os
+import sqlite3
+from collections import namedtuple
+
+import pandas as pd
+
+import etl_streaming
+
+DEFAULT_BATCH_SIZE = 10000
+DEFAULT_TEXT_LENGTH = 8000 # length ArcGIS uses for text fields read from CSV
+
+OutputField = namedtuple("OutputField", ["name", "type", "length", "alias"])
+
+# ArcGIS field types (arcpy.ListFields / schema names) -> arcpy.management.AddField field types
+ADD_FIELD_TYPES = {"String": "TEXT", "Text": "TEXT", "Integer": "LONG", "Long": "LONG", "SmallInteger": "SHORT",
+                   "Short": "SHORT", "BigInteger": "BIGINTEGER", "Double": "DOUBLE", "Single": "FLOAT",
+                   "Float": "FLOAT", "Date": "DATE", "GUID": "GUID"}
+
+# ArcGIS field types -> SQLite column types
+SQLITE_TYPES = {"String": "TEXT", "Text": "TEXT", "Integer": "INTEGER", "Long": "INTEGER", "SmallInteger": "INTEGER",
+                "Short": "INTEGER", "BigInteger": "INTEGER", "Double": "REAL", "Single": "REAL", "Float": "REAL",
+                "Date": "DATETIME", "GUID": "TEXT"}
+
+
+##================================================================
+## =============================== Output schema
+##================================================================
+
+def output_fields(template_fields, field_mapping_dict, df=None):
+    """Output fields for the mapped schema fields, with the type, length and alias of the template feature class field.
+
+    The output field is named after the schema field and takes its properties from the template field with that name. Fields without a template field get a type inferred from df.
+
+    Args:
+        template_fields (list): (name, type, length, alias) of the template feature class fields,
+            e.g., [(f.name, f.type, f.length, f.aliasName) for f in arcpy.ListFields(template_fc)].
+        field_mapping_dict (dict): Mapping from schema field names to input column names, blank columns are skipped.
+        df (pd.DataFrame, optional): Cleaned data used to infer the type of fields missing from the template.
+
+    Returns:
+        list: OutputField for each mapped schema field.
+    """
+    template = {name: OutputField(name, field_type, length, alias) for name, field_type, length, alias in template_fields}
+    inferred = {f.name: f for f in infer_fields(df)} if df is not None else {}
+    fields = []
+    for schema_field, input_col in field_mapping_dict.items():
+        if not input_col:
+            continue
+        fields.append(template.get(schema_field) or inferred.get(schema_field) or
+                      OutputField(schema_field, "String", DEFAULT_TEXT_LENGTH, schema_field))
+    return fields
+
+
+def infer_fields(df):
+    """Output fields inferred from the DataFrame column types, for tables without a template schema.
+
+    Args:
+        df (pd.DataFrame): Data to load.
+
+    Returns:
+        list: OutputField for each column.
+    """
+    fields = []
+    for column, dtype in df.dtypes.items():
+        if pd.api.types.is_bool_dtype(dtype):
+            field_type = "SmallInteger"
+        elif pd.api.types.is_integer_dtype(dtype):
+            field_type = "Integer" if df[column].dropna().abs().max() < 2**31 else "BigInteger"
+        elif pd.api.types.is_float_dtype(dtype):
+            field_type = "Double"
+        elif pd.api.types.is_datetime64_any_dtype(dtype):
+            field_type = "Date"
+        else:
+            field_type = "String"
+        fields.append(OutputField(str(column), field_type, DEFAULT_TEXT_LENGTH if field_type == "String" else 0, str(column)))
+    return fields
+
+
+def fields_to_schema(fields):
+    """{name: type} schema for etl_streaming.coerce_to_schema"""
+    return {f.name: f.type for f in fields}
+
+
+_INTEGER_TEXT = r"[-+]?(?:0|[1-9]\d*)"
+_DOUBLE_TEXT = r"[-+]?(?:(?:0|[1-9]\d*)(?:\.\d*)?|\.\d+)(?:[eE][-+]?\d+)?"
+
+
+def infer_csv_fields(chunk):
+    """Output fields for CSV columns read as text. A column is numeric only when every value reads back the same as a
+    number, so zero padded codes (zip "05401") and identifiers stay text.
+
+    Args:
+        chunk (pd.DataFrame): Rows read with dtype=str.
+
+    Returns:
+        list: OutputField for each column.
+    """
+    fields = []
+    for column in chunk.columns:
+        values = chunk[column].dropna()
+        if values.empty:
+            field_type = "String"
+        elif values.str.fullmatch(_INTEGER_TEXT).all():
+            field_type = "Integer" if pd.to_numeric(values).abs().max() < 2**31 else "BigInteger"
+        elif values.str.fullmatch(_DOUBLE_TEXT).all():
+            field_type = "Double"
+        else:
+            field_type = "String"
+        fields.append(OutputField(str(column), field_type, DEFAULT_TEXT_LENGTH if field_type == "String" else 0, str(column)))
+    return fields
+
+
+def read_csv_chunks(csv_path, fields=None, chunksize=etl_streaming.DEFAULT_CHUNKSIZE):
+    """Read a CSV in chunks coerced to the field types.
+
+    Cells are read as text and converted once, to the type of their field: pandas type inference would turn
+    zero padded text (zip "05401") into numbers. Empty cells become missing values (None in the table).
+
+    Args:
+        csv_path (str): Path to the CSV.
+        fields (list, optional): OutputField list. Defaults to fields inferred from the first chunk (see infer_csv_fields).
+        chunksize (int, optional): Rows per chunk. Defaults to 100000.
+
+    Yields:
+        tuple: (fields, chunk) for each chunk.
+    """
+    schema = None
+    for chunk in pd.read_csv(csv_path, chunksize=chunksize, dtype=str):
+        if schema is None:
+            fields = fields or infer_csv_fields(chunk)
+            schema = fields_to_schema(fields)
+        text = [name for name, field_type in schema.items() if field_type in ("String", "Text", "GUID") and name in chunk.columns]
+        # text fields are already str, coerce_to_schema would turn their empty cells into "nan"
+        chunk = etl_streaming.coerce_to_schema(chunk, {name: t for name, t in schema.items() if name not in text})
+        for name in text:
+            chunk[name] = chunk[name].astype(object).where(chunk[name].notna(), None)
+        yield fields, chunk
+
+
+def _python_columns(df, fields):
+    """Column values as python objects the database drivers accept: missing values -> None, timestamps -> datetime"""
+    columns = []
+    for field in fields:
+        if field.name not in df.columns:
+            columns.append([None] * len(df))
+            continue
+        series = df[field.name]
+        if pd.api.types.is_datetime64_any_dtype(series.dtype):
+            values = [None if pd.isna(v) else v.to_pydatetime() for v in series]
+        else:
+            values = series.astype(object).where(series.notna(), None).tolist()
+        columns.append(values)
+    return columns
+
+
+##================================================================
+## =============================== Loader base: whole frames and CSV files through open_table
+##================================================================
+
+class TableLoader:
+    """Base class, backends implement exists(table_name) and open_table(table_name, fields, replace=True) returning a
+    writer with append(df) (or insert(df) returning the new OIDs), update(oids, df), delete(oids) and close()"""
+    batch_size = DEFAULT_BATCH_SIZE
+
+    def load(self, df, table_name, fields=None):
+        """Create (or replace) table_name and insert all rows of df.
+
+        Args:
+            df (pd.DataFrame): Data to load, already coerced to the field types.
+            table_name (str): Output table name.
+            fields (list, optional): OutputField list. Defaults to fields inferred from df.
+
+        Returns:
+            int: Number of rows inserted.
+        """
+        with self.open_table(table_name, fields or infer_fields(df)) as table:
+            table.append(df)
+        return table.rows
+
+    def load_csv(self, csv_path, table_name, fields=None, chunksize=etl_streaming.DEFAULT_CHUNKSIZE):
+        """Create (or replace) table_name from a CSV, read and inserted chunk by chunk.
+
+        Args:
+            csv_path (str): Path to the CSV.
+            table_name (str): Output table name.
+            fields (list, optional): OutputField list, chunks are coerced to these types.
+                Defaults to fields inferred from the first chunk.
+            chunksize (int, optional): Rows per chunk. Defaults to 100000.
+
+        Returns:
+            int: Number of rows inserted.
+        """
+        table = None
+        try:
+            for fields, chunk in read_csv_chunks(csv_path, fields, chunksize):
+                if table is None:
+                    table = self.open_table(table_name, fields)
+                table.append(chunk)
+        finally:
+            if table is not None:
+                table.close()
+        return table.rows if table is not None else 0
+
+
+class _TableWriter:
+    """Writer returned by open_table, inserts appended frames in batches of batch_size rows"""
+    def __init__(self, fields, batch_size):
+        self.fields = fields
+        self.batch_size = batch_size
+        self.rows = 0
+
+    def _batches(self, df):
+        for start in range(0, len(df), self.batch_size):
+            batch = df.iloc[start:start + self.batch_size]
+            yield list(zip(*_python_columns(batch, self.fields)))
+
+    def insert(self, df):
+        """Insert the rows of df, returns the OIDs given to the new rows, in order"""
+        oids = []
+        for rows in self._batches(df):
+            oids.extend(self._insert(rows))
+            self.rows += len(rows)
+        return oids
+
+    def append(self, df):
+        self.insert(df)
+        return self.rows
+
+    def update(self, oids, df):
+        """Replace the field values of the rows with the given OIDs by the rows of df, in the same order"""
+        for start, rows in zip(range(0, len(df), self.batch_size), self._batches(df)):
+            self._update(dict(zip(oids[start:start + self.batch_size], rows)))
+
+    def delete(self, oids):
+        """Delete the rows with the given OIDs"""
+        oids = list(oids)
+        for start in range(0, len(oids), self.batch_size):
+            self._delete(oids[start:start + self.batch_size])
+
+    def _insert(self, rows):
+        raise NotImplementedError
+
+    def _update(self, rows_by_oid):
+        raise NotImplementedError
+
+    def _delete(self, oids):
+        raise NotImplementedError
+
+    def flush(self):
+        """Make the rows written so far durable, e.g., before an index of the table records them"""
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+##================================================================
+## =============================== arcpy backend: CreateTable + InsertCursor
+##================================================================
+
+class ArcpyTableLoader(TableLoader):
+    """Loads into a file geodatabase table with arcpy.da.InsertCursor, replacing an existing table of the same name.
+
+    Args:
+        gdb_path (str): Path to the file geodatabase (.gdb).
+        batch_size (int, optional): Rows converted and inserted per batch. Defaults to 10000.
+    """
+    def __init__(self, gdb_path, batch_size=DEFAULT_BATCH_SIZE):
+        import arcpy # only this backend needs arcpy
+        self.arcpy = arcpy
+        self.gdb_path = gdb_path
+        self.batch_size = batch_size
+
+    def exists(self, table_name):
+        return bool(self.arcpy.Exists(os.path.join(self.gdb_path, table_name)))
+
+    def open_table(self, table_name, fields, replace=True):
+        arcpy = self.arcpy
+        table_path = os.path.join(self.gdb_path, table_name)
+        if replace or not arcpy.Exists(table_path):
+            if arcpy.Exists(table_path):
+                arcpy.management.Delete(table_path)
+            arcpy.management.CreateTable(self.gdb_path, table_name)
+            for f in fields:
+                arcpy.management.AddField(table_path, f.name, ADD_FIELD_TYPES.get(f.type, "TEXT"),
+                                          field_length=f.length or None, field_alias=f.alias or f.name)
+        return _ArcpyTableWriter(arcpy, table_path, fields, self.batch_size)
+
+
+class _ArcpyTableWriter(_TableWriter):
+    """Cursors are opened per batch, so inserts, updates and deletes never hold locks on the table at the same time.
+    Each batch is saved when its cursor closes, flush has nothing left to write"""
+    def __init__(self, arcpy, table_path, fields, batch_size):
+        super().__init__(fields, batch_size)
+        self.arcpy = arcpy
+        self.table_path = table_path
+        self.names = [f.name for f in fields]
+        self.oid_field = arcpy.Describe(table_path).OIDFieldName
+
+    def _where(self, oids):
+        return f"{self.oid_field} IN ({','.join(str(int(oid)) for oid in oids)})"
+
+    def _insert(self, rows):
+        with self.arcpy.da.InsertCursor(self.table_path, self.names) as cursor:
+            return [cursor.insertRow(row) for row in rows]
+
+    def _update(self, rows_by_oid):
+        with self.arcpy.da.UpdateCursor(self.table_path, self.names + ["OID@"], self._where(rows_by_oid)) as cursor:
+            for row in cursor:
+                cursor.updateRow(list(rows_by_oid[row[-1]]) + [row[-1]])
+
+    def _delete(self, oids):
+        with self.arcpy.da.UpdateCursor(self.table_path, ["OID@"], self._where(oids)) as cursor:
+            for _ in cursor:
+                cursor.deleteRow()
+
+
+##================================================================
+## =============================== SQLite / GeoPackage backend
+##================================================================
+
+class SQLiteTableLoader(TableLoader):
+    """Loads into a SQLite database with executemany, replacing an existing table of the same name.
+
+    When the path ends with .gpkg the database is set up as an OGC GeoPackage and the tables are registered as
+    attribute tables in gpkg_contents, so they open in ArcGIS Pro and QGIS.
+
+    Args:
+        db_path (str): Path to the .sqlite/.db or .gpkg file, created if it does not exist.
+        batch_size (int, optional): Rows per executemany batch. Defaults to 10000.
+    """
+    def __init__(self, db_path, batch_size=DEFAULT_BATCH_SIZE):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.geopackage = db_path.lower().endswith(".gpkg")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path)
+        if self.geopackage:
+            conn.execute("PRAGMA application_id = 1196444487") # 'GPKG'
+            conn.execute("PRAGMA user_version = 10300")
+            conn.execute("""CREATE TABLE IF NOT EXISTS gpkg_spatial_ref_sys (srs_name TEXT NOT NULL, srs_id INTEGER PRIMARY KEY,
+                            organization TEXT NOT NULL, organization_coordsys_id INTEGER NOT NULL, definition TEXT NOT NULL, description TEXT)""")
+            conn.executemany("INSERT OR IGNORE INTO gpkg_spatial_ref_sys VALUES (?, ?, ?, ?, ?, ?)", [
+                ("Undefined cartesian SRS", -1, "NONE", -1, "undefined", None),
+                ("Undefined geographic SRS", 0, "NONE", 0, "undefined", None),
+                ("WGS 84 geodetic", 4326, "EPSG", 4326, 'GEOGCS["WGS 84",DATUM["WGS_1984",SPHEROID["WGS 84",6378137,298.257223563]],'
+                 'PRIMEM["Greenwich",0],UNIT["degree",0.0174532925199433]]', None)])
+            conn.execute("""CREATE TABLE IF NOT EXISTS gpkg_contents (table_name TEXT NOT NULL PRIMARY KEY, data_type TEXT NOT NULL,
+                            identifier TEXT UNIQUE, description TEXT DEFAULT '', last_change DATETIME NOT NULL DEFAULT
+                            (strftime('%Y-%m-%dT%H:%M:%fZ','now')), min_x DOUBLE, min_y DOUBLE, max_x DOUBLE, max_y DOUBLE,
+                            srs_id INTEGER)""")
+        return conn
+
+    def exists(self, table_name):
+        if not os.path.exists(self.db_path):
+            return False
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table_name,)).fetchone() is not None
+        finally:
+            conn.close()
+
+    def open_table(self, table_name, fields, replace=True):
+        conn = self._connect()
+        columns = ", ".join(f'"{f.name}" {SQLITE_TYPES.get(f.type, "TEXT")}' for f in fields)
+        if replace:
+            conn.execute(f'DROP TABLE IF EXISTS "{table_name}"')
+        conn.execute(f'CREATE TABLE IF NOT EXISTS "{table_name}" (OBJECTID INTEGER PRIMARY KEY AUTOINCREMENT, {columns})')
+        if self.geopackage:
+            conn.execute("INSERT OR REPLACE INTO gpkg_contents (table_name, data_type, identifier, last_change) VALUES (?, 'attributes', ?, ?)",
+                         (table_name, table_name, datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")))
+        return _SQLiteTableWriter(conn, table_name, fields, self.batch_size)
+
+
+class _SQLiteTableWriter(_TableWriter):
+    def __init__(self, conn, table_name, fields, batch_size):
+        super().__init__(fields, batch_size)
+        self.conn = conn
+        self.table_name = table_name
+        names = [f'"{f.name}"' for f in fields]
+        self.insert_sql = f'INSERT INTO "{table_name}" ({", ".join(names)}) VALUES ({", ".join("?" for _ in names)})'
+        self.update_sql = f'UPDATE "{table_name}" SET {", ".join(f"{n} = ?" for n in names)} WHERE OBJECTID = ?'
+
+    def _insert(self, rows):
+        # AUTOINCREMENT numbers new rows from the table sequence, one after the other (this writer is the only one)
+        seq = self.conn.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (self.table_name,)).fetchone()
+        self.conn.executemany(self.insert_sql, rows)
+        first = (seq[0] if seq else 0) + 1
+        return list(range(first, first + len(rows)))
+
+    def _update(self, rows_by_oid):
+        self.conn.executemany(self.update_sql, (tuple(row) + (oid,) for oid, row in rows_by_oid.items()))
+
+    def _delete(self, oids):
+        self.conn.executemany(f'DELETE FROM "{self.table_name}" WHERE OBJECTID = ?', ((oid,) for oid in oids))
+
+    def flush(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
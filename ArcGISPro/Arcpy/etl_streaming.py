@@ -0,0 +1,212 @@
+""" =======================================================================================================
+        STREAMING ETL: Clean and validate large CSV inputs in bounded size chunks
+    =======================================================================================================
+
+    Streaming mode of the schema guided ETL workflow (ETL_arcrpy_v2.py) for inputs that do not fit in memory.
+    The CSV is read in chunks of a fixed number of rows, each chunk gets the same type coercion and validation as
+    clean_and_align_data, and the results are appended to their output CSVs before the next chunk is read:
+        - cleaned rows                -> cleaned_path
+        - rows with missing values    -> validation_issues_path
+        - duplicate rows (removed)    -> duplicates_path
+
+    Duplicates are found across chunks with a hashed key store: one 64-bit hash per distinct row, kept in an
+    on-disk SQLite table, so peak memory depends on the chunk size and not on the input size.
+    Does not need arcpy.
+"""
+import logging
+import os
+import sqlite3
+import tempfile
+
+import pandas as pd
+
+DEFAULT_CHUNKSIZE = 100000
+
+
+##================================================================
+## =============================== Type coercion shared with clean_and_align_data
+##================================================================
+
+def coerce_to_schema(df, schema):
+    """Coerce the columns of a DataFrame to the pandas types matching their ArcGIS field types.
+
+    Values that can not be converted become missing (NaN/NaT/<NA>), text fields are converted with str().
+    Each field type gets one fixed dtype whatever the values of the chunk (Int64, float64, datetime64, str), so the
+    same row hashes the same in every chunk.
+
+    Args:
+        df (pd.DataFrame): DataFrame whose columns are already renamed to the schema field names.
+        schema (dict): Dictionary mapping schema field names to ArcGIS field types.
+
+    Returns:
+        pd.DataFrame: The same DataFrame with coerced columns.
+    """
+    for field, dtype in schema.items():
+        if field in df.columns:
+            # Handle ArcGIS types
+            if dtype in ["Short", "Long", "Integer"]:
+                df[field] = pd.to_numeric(df[field], errors="coerce").astype("Int64")
+            elif dtype in ["Float", "Double"]:
+                # always float64: a chunk of whole numbers would otherwise come out int64 and hash differently
+                df[field] = pd.to_numeric(df[field], errors="coerce").astype("float64")
+            elif dtype in ["Text", "String"]:
+                df[field] = df[field].astype(str)
+            elif dtype == "Date":
+                df[field] = pd.to_datetime(df[field], errors="coerce")
+    return df
+
+
+##================================================================
+## =============================== Hashed key store for duplicates across chunks
+##================================================================
+
+class HashedKeyStore:
+    """On-disk set of 64-bit row hashes used to find duplicate rows across chunks.
+
+    Args:
+        path (str, optional): SQLite file for the store. Defaults to a temporary file that is removed on close.
+        cache_kb (int, optional): SQLite page cache size in KB, bounds the memory used by the store. Defaults to 65536.
+    """
+    def __init__(self, path=None, cache_kb=65536):
+        self._temp_path = None
+        if path is None:
+            handle, path = tempfile.mkstemp(suffix=".sqlite")
+            os.close(handle)
+            self._temp_path = path
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(f"PRAGMA cache_size = -{int(cache_kb)}")
+        self.conn.execute("PRAGMA journal_mode = OFF")
+        self.conn.execute("PRAGMA synchronous = OFF")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS keys (h INTEGER PRIMARY KEY)")
+        self.conn.execute("CREATE TEMP TABLE batch (h INTEGER PRIMARY KEY)")
+
+    def seen(self, hashes):
+        """Flag the hashes that were already added, by an earlier call or earlier in this batch, then add them all.
+
+        Args:
+            hashes (pd.Series): uint64 row hashes (e.g., from pd.util.hash_pandas_object).
+
+        Returns:
+            pd.Series: bool, True where the hash was seen before, aligned with hashes.
+        """
+        signed = pd.Series(hashes.to_numpy().view("int64"), index=hashes.index) # SQLite integers are signed 64-bit
+        repeated = signed.duplicated()
+        unique = signed[~repeated]
+        self.conn.executemany("INSERT INTO batch VALUES (?)", ((int(h),) for h in unique))
+        known = {h for (h,) in self.conn.execute("SELECT h FROM batch JOIN keys USING (h)")}
+        self.conn.execute("INSERT OR IGNORE INTO keys SELECT h FROM batch")
+        self.conn.execute("DELETE FROM batch")
+        self.conn.commit()
+        return repeated | signed.isin(known)
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM keys").fetchone()[0]
+
+    def close(self):
+        self.conn.close()
+        if self._temp_path and os.path.exists(self._temp_path):
+            os.remove(self._temp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+##================================================================
+## =============================== Chunked clean and align
+##================================================================
+
+def _append_csv(df, path, written):
+    """Append a chunk to a CSV, writing the header only with the first chunk"""
+    df.to_csv(path, mode="a" if written else "w", header=not written, index=False)
+    return True
+
+
+def stream_clean_and_align(input_table, schema, field_mapping_dict, cleaned_path, validation_issues_path,
+                           duplicates_path=None, chunksize=DEFAULT_CHUNKSIZE, missing_columns=None,
+                           key_store_path=None, cleaned_sink=None, standardizer=None):
+    """Validate, clean, and align a CSV to a target ArcGIS schema in chunks of bounded size.
+
+    Same rules as clean_and_align_data: columns are renamed and coerced to the schema, rows with missing values
+    are reported as validation issues (and kept), duplicate rows are reported and removed. Duplicates are found
+    across the whole file, the first occurrence of a row is kept.
+
+    Columns are read as text so every chunk gets the same types before coercion (pandas would otherwise infer
+    types per chunk, and the same row could hash differently in two chunks).
+
+    Args:
+        input_table (str): Path to the input CSV.
+        schema (dict): Dictionary mapping schema field names to ArcGIS field types.
+        field_mapping_dict (dict): Mapping from schema field names to input column names.
+        cleaned_path (str): Output CSV for the cleaned rows, not used when cleaned_sink is given.
+        validation_issues_path (str): Output CSV for rows with missing values, only written if there are any.
+        duplicates_path (str, optional): Output CSV for removed duplicate rows. Defaults to None (not written).
+        chunksize (int, optional): Number of rows per chunk. Defaults to 100000.
+        missing_columns (dict, optional): {input column: default value} for mapped columns absent from the CSV.
+        key_store_path (str, optional): SQLite file for the duplicate key store. Defaults to a temporary file.
+        cleaned_sink (callable, optional): Called with each cleaned chunk instead of writing it to cleaned_path,
+            e.g., the append method of an etl_loaders table. Defaults to None (write cleaned_path).
+        standardizer (address_standardizer.AddressStandardizer, optional): Standardizes the address field of the cleaned
+            rows, its cache is shared by all chunks. Defaults to None (addresses are not standardized).
+
+    Returns:
+        dict: Run summary with rows_read, rows_written, missing_value_rows, duplicate_rows and chunks.
+    """
+    logging.info("Starting streaming data validation and cleaning (chunksize=%s)...", chunksize)
+    print(f"Starting streaming data validation and cleaning (chunksize={chunksize})...")
+    rename = {v: k for k, v in field_mapping_dict.items() if v}
+    summary = {"rows_read": 0, "rows_written": 0, "missing_value_rows": 0, "duplicate_rows": 0, "chunks": 0}
+    cleaned_written = issues_written = duplicates_written = False
+
+    with HashedKeyStore(key_store_path) as key_store:
+        for chunk in pd.read_csv(input_table, chunksize=chunksize, dtype=str):
+            summary["chunks"] += 1
+            summary["rows_read"] += len(chunk)
+            for input_col, default_val in (missing_columns or {}).items():
+                if input_col not in chunk.columns:
+                    chunk[input_col] = default_val
+
+            chunk = coerce_to_schema(chunk.rename(columns=rename), schema)
+
+            # Check for missing values
+            missing_values = chunk[chunk.isnull().any(axis=1)]
+            if not missing_values.empty:
+                summary["missing_value_rows"] += len(missing_values)
+                issues_written = _append_csv(missing_values, validation_issues_path, issues_written)
+
+            # Check for duplicate records, within this chunk and against every earlier chunk
+            duplicated = key_store.seen(pd.util.hash_pandas_object(chunk, index=False))
+            if duplicated.any():
+                summary["duplicate_rows"] += int(duplicated.sum())
+                if duplicates_path:
+                    duplicates_written = _append_csv(chunk[duplicated], duplicates_path, duplicates_written)
+                chunk = chunk[~duplicated]
+
+            if standardizer is not None and "address" in chunk.columns:
+                chunk = chunk.copy()
+                chunk["address"] = standardizer.standardize(chunk["address"])
+
+            if cleaned_sink is not None:
+                cleaned_sink(chunk)
+            else:
+                cleaned_written = _append_csv(chunk, cleaned_path, cleaned_written)
+            summary["rows_written"] += len(chunk)
+
+    if summary["missing_value_rows"]:
+        logging.warning("Found %s rows with missing values.", summary["missing_value_rows"])
+        print(f"Found {summary['missing_value_rows']} rows with missing values.")
+        logging.info("Validation issues saved to CSV.")
+        print("Validation issues saved to CSV.")
+    if summary["duplicate_rows"]:
+        logging.warning("%s duplicate rows found and removed", summary["duplicate_rows"])
+        print(f"{summary['duplicate_rows']} duplicate rows found and removed")
+    else:
+        logging.info("No duplicate rows found")
+        print("No duplicate rows found")
+    if standardizer is not None:
+        standardizer.print_stats()
+    logging.info("Streaming cleaning summary %s", summary)
+    return summary
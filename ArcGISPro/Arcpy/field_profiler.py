@@ -0,0 +1,269 @@
+""" Field Profiler (fp)
+Single pass, column batch profiling engine for feature classes and shapefiles
+Computes per field distinct counts, null counts, min/max and geometry duplicates (see geometry_hash) while reading each table only once
+Distinct counts are exact until a memory cap is reached, then switch to a HyperLogLog estimate
+Does not need arcpy: custom_arcpy_tools.showFieldinfo feeds it arcpy cursor batches, profile_shapefile feeds it shapefile_reader batches
+"""
+import hashlib # fixed size digests for HyperLogLog
+import math
+import os
+import sys
+from itertools import islice
+
+import geometry_hash as gh
+import shapefile_reader as shpr
+
+
+### How do use these scripts in my own work?:
+## 1. import the profiler next to your script:
+
+    #  import field_profiler as fp
+
+## 2. call the functions like this:
+
+    ## To profile a shapefile without arcpy (works on Linux)
+    # profile = fp.profile_shapefile(r"DataValidation/1Data/shp_bdry_mn_city_township_unorg/city_township_unorg.shp")
+    # fp.print_profile(profile)
+
+    ## To use approximate (HyperLogLog) distinct counts with ~4 KB per field
+    # fp.profile_shapefile(shp_path, approximate=True, memory_cap=4096)
+
+    ## To turn the structured result into a table
+    # pd.DataFrame(profile["fields"])
+
+
+DEFAULT_MEMORY_CAP = 64 * 1024 * 1024 # bytes per field allowed for exact distinct value sets before switching to HyperLogLog
+DEFAULT_BATCH_SIZE = 10000
+
+
+###====================== TOOL1: HyperLogLog approximate distinct counter
+
+def _value_bytes(value):
+    if isinstance(value, bytes):
+        return value
+    if isinstance(value, str):
+        return value.encode("utf-8")
+    return repr(value).encode("utf-8")
+
+
+class HyperLogLog:
+    """Approximate distinct counter using 2**precision one byte registers (standard error ~1.04/sqrt(2**precision))
+
+    Args:
+        precision (int, optional): Number of index bits, between 4 and 16. Defaults to 14 (16 KB, ~0.8% error)
+    """
+    def __init__(self, precision=14):
+        if not 4 <= precision <= 16:
+            raise ValueError("HyperLogLog precision must be between 4 and 16")
+        self.precision = precision
+        self.m = 1 << precision
+        self.registers = bytearray(self.m)
+
+    @classmethod
+    def from_memory(cls, max_bytes):
+        """Create the most precise counter whose registers fit in max_bytes"""
+        precision = int(math.log2(max(max_bytes, 16)))
+        return cls(min(max(precision, 4), 16))
+
+    @property
+    def memory_bytes(self):
+        return self.m
+
+    def add(self, value):
+        hashed = int.from_bytes(hashlib.blake2b(_value_bytes(value), digest_size=8).digest(), "big")
+        index = hashed >> (64 - self.precision)
+        remaining = hashed & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - remaining.bit_length() + 1 # position of the first 1 bit
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def update(self, values):
+        for value in values:
+            self.add(value)
+
+    def merge(self, other):
+        """Combine another counter of the same precision into this one (for parallel profiling)"""
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLog counters with different precision")
+        self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+
+    def count(self):
+        alpha = {16: 0.673, 32: 0.697, 64: 0.709}.get(self.m, 0.7213 / (1 + 1.079 / self.m))
+        estimate = alpha * self.m * self.m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * self.m and zeros: # small range correction, use linear counting
+            estimate = self.m * math.log(self.m / zeros)
+        return int(round(estimate))
+
+
+###====================== TOOL2: Per field and per geometry accumulators
+
+class FieldProfiler:
+    """Accumulates count, null count, distinct count and min/max for one field from column batches
+
+    Args:
+        name (str): Field name
+        field_type (str): ArcGIS field type (String, Integer, Double, Date, OID...)
+        length (int): Field length
+        approximate (bool, optional): Use HyperLogLog from the start. Defaults to False
+        memory_cap (int, optional): Bytes allowed for the exact distinct set before switching to HyperLogLog
+    """
+    def __init__(self, name, field_type, length, approximate=False, memory_cap=DEFAULT_MEMORY_CAP):
+        self.name = name
+        self.field_type = field_type
+        self.length = length
+        self.memory_cap = memory_cap
+        self.count = 0
+        self.null_count = 0
+        self.min = None
+        self.max = None
+        self.exact = None if approximate else set()
+        self.hll = HyperLogLog.from_memory(memory_cap) if approximate else None
+        self._item_bytes = None # average size of one distinct value, sampled from the first batch
+
+    def update(self, values):
+        nulls = values.count(None)
+        self.null_count += nulls
+        self.count += len(values) - nulls
+        non_null = [v for v in values if v is not None] if nulls else values
+        if not non_null:
+            return
+        try:
+            batch_min, batch_max = min(non_null), max(non_null)
+            self.min = batch_min if self.min is None else min(self.min, batch_min)
+            self.max = batch_max if self.max is None else max(self.max, batch_max)
+        except TypeError: # mixed, unorderable types (e.g., blobs), skip min/max
+            pass
+
+        if self.exact is None:
+            self.hll.update(non_null)
+            return
+        self.exact.update(non_null)
+        if self._item_bytes is None:
+            sample = list(islice(self.exact, 100))
+            self._item_bytes = sum(sys.getsizeof(v) for v in sample) / len(sample)
+        if sys.getsizeof(self.exact) + len(self.exact) * self._item_bytes > self.memory_cap:
+            self._switch_to_approximate()
+
+    def _switch_to_approximate(self):
+        self.hll = HyperLogLog.from_memory(self.memory_cap)
+        self.hll.update(self.exact)
+        self.exact = None
+
+    @property
+    def approximate(self):
+        return self.exact is None
+
+    @property
+    def distinct(self):
+        return self.hll.count() if self.approximate else len(self.exact)
+
+    def result(self):
+        return {"name": self.name, "type": self.field_type, "length": self.length,
+                "count": self.count, "null_count": self.null_count,
+                "distinct": self.distinct, "approximate": self.approximate,
+                "min": self.min, "max": self.max}
+
+
+###====================== TOOL3: Profile a stream of column batches in one pass
+
+def profile_batches(batches, fields, geometry_field=None, table_name=None, shape_type=None,
+                    approximate=False, memory_cap=DEFAULT_MEMORY_CAP, oid_field=None, tolerance=gh.DEFAULT_TOLERANCE):
+    """Profile a table from an iterable of column batches, reading every row once
+
+    Args:
+        batches (iterable): dicts of {column name: [values]}, e.g., from shapefile_reader.iter_shapefile_batches
+        fields (list): (name, type, length) for each field to profile, in output order
+        geometry_field (str, optional): Name of the batch column holding geometries (WKT or Shape). Defaults to None
+        table_name (str, optional): Name reported in the result. Defaults to None
+        shape_type (str, optional): Geometry type reported in the result. Defaults to None
+        approximate (bool, optional): Use HyperLogLog distinct counts for every field. Defaults to False
+        memory_cap (int, optional): Bytes per field for exact distinct sets before switching to HyperLogLog
+        oid_field (str, optional): Batch column with the OIDs reported in duplicate groups. Defaults to the row position
+        tolerance (float, optional): Grid size for geometry duplicate hashing, in layer units (see geometry_hash)
+
+    Returns:
+        dict: {"table", "shape_type", "record_count", "fields": [per field results], "geometry": geometry result or None}
+            the geometry result includes the OID groups of duplicate geometries ("duplicate_groups")
+    """
+    profilers = [FieldProfiler(name, field_type, length, approximate, memory_cap) for name, field_type, length in fields]
+    geometry = gh.DuplicateGeometryDetector(tolerance) if geometry_field else None
+    record_count = 0
+
+    for batch in batches:
+        if not batch:
+            continue
+        batch_count = len(next(iter(batch.values())))
+        for profiler in profilers:
+            profiler.update(batch[profiler.name])
+        if geometry:
+            oids = batch[oid_field] if oid_field else range(record_count, record_count + batch_count)
+            geometry.update(oids, batch[geometry_field])
+        record_count += batch_count
+
+    return {"table": table_name, "shape_type": shape_type, "record_count": record_count,
+            "fields": [profiler.result() for profiler in profilers],
+            "geometry": dict(geometry.result(), field=geometry_field) if geometry else None}
+
+
+def profile_shapefile(shp_path, approximate=False, memory_cap=DEFAULT_MEMORY_CAP, batch_size=DEFAULT_BATCH_SIZE,
+                      tolerance=gh.DEFAULT_TOLERANCE):
+    """Profile a shapefile without arcpy, reading the .dbf and .shp once
+
+    If the .shp file is missing (e.g., only the attribute table was shipped) only the attributes are profiled
+
+    Args:
+        shp_path (str): Path to the .shp file
+        approximate (bool, optional): Use HyperLogLog distinct counts. Defaults to False
+        memory_cap (int, optional): Bytes per field for exact distinct sets before switching to HyperLogLog
+        batch_size (int, optional): Records per column batch. Defaults to 10000
+        tolerance (float, optional): Grid size for geometry duplicate hashing, in layer units (see geometry_hash)
+
+    Returns:
+        dict: the profile_batches result, with FID and Shape reported like arcpy.ListFields does
+    """
+    with_geometry = os.path.exists(shp_path)
+    if not with_geometry:
+        print(f"Warning: {shp_path} not found, profiling attributes only")
+
+    fields = [("FID", "OID", 4)] + [(f.name, f.type, f.length) for f in shpr.read_dbf_fields(shp_path)]
+    batches = ({("FID" if k == "OID" else k): v for k, v in batch.items()}
+               for batch in shpr.iter_shapefile_batches(shp_path, batch_size=batch_size, with_geometry=with_geometry))
+    shx_path = os.path.splitext(shp_path)[0] + ".shx" # the index file has the same header, use it when only the .shp is missing
+    header_path = shp_path if with_geometry else shx_path
+    shape_type = shpr.read_shp_header(header_path)["shape_type_name"] if os.path.exists(header_path) else None
+
+    return profile_batches(batches, fields, geometry_field="SHAPE" if with_geometry else None,
+                           table_name=os.path.splitext(os.path.basename(shp_path))[0], shape_type=shape_type,
+                           approximate=approximate, memory_cap=memory_cap, oid_field="FID", tolerance=tolerance)
+
+
+###====================== TOOL4: Print the profile like showFieldinfo
+
+def print_profile(profile):
+    """Print a profile in the showFieldinfo summary format
+
+    Args:
+        profile (dict): Result of profile_batches or profile_shapefile
+
+    Returns:
+        None
+    """
+    print(f"*Summary*\n Fields in the {profile['shape_type']} Feature Class: {profile['table']}\n")
+    print("Name                 Type         Length   Unique_Values")
+    geometry = profile["geometry"]
+    rows = [(f["name"], f["type"], f["length"], f"{'~' if f['approximate'] else ''}{f['distinct']}") for f in profile["fields"]]
+    if geometry:
+        rows.insert(1, ("Shape", "Geometry", 0, geometry["unique"]))
+    for name, field_type, length, distinct in rows:
+        print(f" {name:20} | {field_type:10} | {str(length):5} | {str(distinct):10}")
+
+    record_count = profile["record_count"]
+    if geometry is None:
+        print(f"\nTotal Record Count: {record_count}")
+        return
+    print(f"\nTotal Record Count: {record_count}, Total Geometry Count(by normalized hash): {geometry['unique']}")
+    if geometry["duplicates"]:
+        print(f"Warning {geometry['duplicates']} Potential Duplicate Features Detected in the Feature Class")
+        for oids in geometry["duplicate_groups"]:
+            print(f"  Same geometry: {oids}")
@@ -0,0 +1,314 @@
+""" Geometry Hash (gh)
+Duplicate geometry detection by hashing normalized geometries into fixed size digests
+Coordinates are quantized to a tolerance, polygon rings get a canonical start vertex and orientation, holes stay with their exterior ring, parts get a canonical order,
+so the same feature digitized with a different ring start, winding or float formatting still gets the same digest
+Memory use is one 16 byte digest (+ the first OID) per feature, independent of the geometry size
+"""
+import hashlib
+import re
+import struct
+
+import shapefile_reader as shpr
+
+
+### How do use these scripts in my own work?:
+## 1. import the module next to your script:
+
+    #  import geometry_hash as gh
+
+## 2. call the functions like this:
+
+    ## To find the OID groups of duplicate features in a shapefile (no arcpy needed)
+    # gh.find_duplicate_geometries_in_shapefile(shp_path, tolerance=0.001)
+
+    ## To hash your own (oid, geometry) pairs, geometry can be WKT or a shapefile_reader.Shape
+    # detector = gh.DuplicateGeometryDetector(tolerance=0.001)
+    # for oid, wkt in rows:
+    #     detector.add(oid, wkt)
+    # detector.groups()
+
+
+DEFAULT_TOLERANCE = 1e-6 # in layer units, use the feature class XY tolerance when known
+DIGEST_SIZE = 16
+
+# geometry families, used as the WKB type code of the normalized geometry
+POINT, LINE, POLYGON = 4, 5, 6 # MultiPoint, MultiLineString, MultiPolygon
+
+
+###====================== TOOL1: Read geometries from WKT or shapefile records
+
+_WKT_FAMILIES = {"POINT": POINT, "MULTIPOINT": POINT, "LINESTRING": LINE, "MULTILINESTRING": LINE,
+                 "POLYGON": POLYGON, "MULTIPOLYGON": POLYGON}
+_WKT_TOKENS = re.compile(r"\(|\)|[^(),]+")
+
+
+def _parse_wkt(wkt, grouped=False):
+    """Parse a WKT string into (family, parts), parts is a flat list of rings/paths of (x, y). Z and M values are dropped
+
+    With grouped=True the parts of a polygon family are grouped per polygon instead: a list of polygons, each a list of
+    rings with the exterior ring first
+    """
+    match = re.match(r"\s*([A-Za-z]+)(?:\s+(?:Z|M|ZM))?\s*(.*)$", wkt, re.S)
+    if not match:
+        raise ValueError(f"Invalid WKT: {wkt[:50]}")
+    name, body = match.group(1).upper(), match.group(2).strip()
+    if name not in _WKT_FAMILIES:
+        raise ValueError(f"Unsupported WKT geometry type: {name}")
+    if not body or body.upper() == "EMPTY":
+        return _WKT_FAMILIES[name], []
+
+    # the innermost parenthesised lists are the rings/paths, points of a multipoint may be bare or in their own parentheses
+    # the rings of a multipolygon are grouped by the list they are in at depth 2, a polygon has a single group
+    parts, groups, current, depth, group = [], [], None, 0, 0
+    for token in _WKT_TOKENS.findall(body):
+        if token == "(":
+            depth += 1
+            if depth == 2 and name == "MULTIPOLYGON":
+                group += 1
+            current = []
+        elif token == ")":
+            depth -= 1
+            if current:
+                parts.append(current)
+                groups.append(group)
+            current = None
+        elif current is not None:
+            values = token.split()
+            if len(values) >= 2:
+                current.append((float(values[0]), float(values[1])))
+    family = _WKT_FAMILIES[name]
+    if family == POINT: # one part holding every point
+        parts = [[point for part in parts for point in part]]
+    elif family == POLYGON and grouped:
+        polygons = {}
+        for ring, ring_group in zip(parts, groups):
+            polygons.setdefault(ring_group, []).append(ring)
+        parts = list(polygons.values())
+    return family, parts
+
+
+def read_geometry(geometry):
+    """Return (family, parts) for a WKT string or a shapefile_reader.Shape"""
+    if isinstance(geometry, str):
+        return _parse_wkt(geometry)
+    if geometry.shape_type in shpr.POINT_TYPES or geometry.shape_type in shpr.MULTIPOINT_TYPES:
+        return POINT, geometry.parts
+    if shpr.SHAPE_TYPE_NAMES.get(geometry.shape_type) == "Polygon":
+        return POLYGON, geometry.parts
+    return LINE, geometry.parts
+
+
+def _signed_area(ring):
+    """Twice the signed area of a ring, positive for counter clockwise winding"""
+    return sum(x1 * y2 - x2 * y1 for (x1, y1), (x2, y2) in zip(ring, ring[1:] + ring[:1]))
+
+
+def _point_in_ring(x, y, ring):
+    inside = False
+    for (x1, y1), (x2, y2) in zip(ring, ring[1:] + ring[:1]):
+        if (y1 > y) != (y2 > y) and x < x1 + (y - y1) * (x2 - x1) / (y2 - y1):
+            inside = not inside
+    return inside
+
+
+def _group_shape_rings(rings):
+    """Group the rings of a shapefile polygon per polygon: clockwise rings are exterior rings, counter clockwise rings
+    are holes and belong to the smallest exterior ring containing them (holes outside every exterior ring are kept as
+    exterior rings)"""
+    exteriors = [ring for ring in rings if _signed_area(ring) <= 0]
+    holes = [ring for ring in rings if _signed_area(ring) > 0]
+    polygons = [[ring] for ring in exteriors]
+    for hole in holes:
+        containing = [i for i, ring in enumerate(exteriors) if any(_point_in_ring(x, y, ring) for x, y in hole)]
+        if containing:
+            polygons[min(containing, key=lambda i: abs(_signed_area(exteriors[i])))].append(hole)
+        else:
+            polygons.append([hole])
+    return polygons
+
+
+###====================== TOOL2: Normalize and hash
+
+def _quantize(part, tolerance):
+    """Snap coordinates to the tolerance grid and drop repeated vertices"""
+    snapped = []
+    for x, y in part:
+        point = (round(x / tolerance), round(y / tolerance))
+        if not snapped or snapped[-1] != point:
+            snapped.append(point)
+    return snapped
+
+
+def _canonical_ring(ring, clockwise=True):
+    """Rotate a closed ring to start at its smallest vertex with the given winding, the closing vertex is dropped
+
+    Exterior rings are made clockwise and holes counter clockwise, the shapefile ring order
+    """
+    if len(ring) > 1 and ring[0] == ring[-1]:
+        ring = ring[:-1]
+    if len(ring) < 3:
+        return tuple(ring)
+    if (_signed_area(ring) < 0) != clockwise:
+        ring = ring[::-1]
+    start = min(ring)
+    return min(tuple(ring[i:] + ring[:i]) for i, point in enumerate(ring) if point == start)
+
+
+def _canonical_path(path):
+    """A line reads the same in both directions, keep the smaller of the two"""
+    return min(tuple(path), tuple(path[::-1]))
+
+
+def _canonical_polygon(rings, tolerance):
+    """Exterior ring first, then the holes of this polygon only, in sorted order"""
+    exterior = _canonical_ring(_quantize(rings[0], tolerance), clockwise=True)
+    holes = (_canonical_ring(_quantize(ring, tolerance), clockwise=False) for ring in rings[1:])
+    return (exterior,) + tuple(sorted(hole for hole in holes if hole))
+
+
+def normalize_geometry(geometry, tolerance=DEFAULT_TOLERANCE):
+    """Normalize a geometry to quantized integer coordinates in canonical order
+
+    Args:
+        geometry (str or shapefile_reader.Shape): WKT string or Shape record
+        tolerance (float, optional): Grid size coordinates are snapped to, in layer units. Defaults to 1e-6
+
+    Returns:
+        tuple: (family, parts) where family is POINT, LINE or POLYGON and parts is a sorted tuple of integer coordinate tuples,
+            for polygons a sorted tuple of polygons, each a tuple of rings (exterior ring, then its sorted holes)
+    """
+    if isinstance(geometry, str):
+        family, parts = _parse_wkt(geometry, grouped=True)
+    else:
+        family, parts = read_geometry(geometry)
+        if family == POLYGON:
+            parts = _group_shape_rings(parts)
+    if family == POLYGON: # holes stay with their own exterior ring
+        polygons = (_canonical_polygon(rings, tolerance) for rings in parts)
+        return family, tuple(sorted(polygon for polygon in polygons if polygon[0]))
+    if family == POINT:
+        points = sorted(set((round(x / tolerance), round(y / tolerance)) for part in parts for x, y in part))
+        return family, (tuple(points),) if points else ()
+    normalized = [_canonical_path(_quantize(part, tolerance)) for part in parts]
+    return family, tuple(sorted(part for part in normalized if part))
+
+
+def normalized_wkb(geometry, tolerance=DEFAULT_TOLERANCE):
+    """Encode the normalized geometry as little endian WKB style bytes with int64 grid coordinates
+
+    Args:
+        geometry (str or shapefile_reader.Shape): WKT string or Shape record
+        tolerance (float, optional): Grid size coordinates are snapped to, in layer units. Defaults to 1e-6
+
+    Returns:
+        bytes: byte order, family type code, part count, then the point count and coordinates of each part,
+            for polygons each part is a ring count followed by its rings
+    """
+    family, parts = normalize_geometry(geometry, tolerance)
+    chunks = [struct.pack("<BII", 1, family, len(parts))]
+
+    def add_points(points):
+        chunks.append(struct.pack("<I", len(points)))
+        chunks.append(struct.pack(f"<{2 * len(points)}q", *(c for point in points for c in point)))
+
+    for part in parts:
+        if family == POLYGON:
+            chunks.append(struct.pack("<I", len(part)))
+            for ring in part:
+                add_points(ring)
+        else:
+            add_points(part)
+    return b"".join(chunks)
+
+
+def geometry_hash(geometry, tolerance=DEFAULT_TOLERANCE):
+    """Fixed size digest of the normalized geometry, equal for geometries that match within the tolerance grid
+
+    Args:
+        geometry (str or shapefile_reader.Shape): WKT string or Shape record
+        tolerance (float, optional): Grid size coordinates are snapped to, in layer units. Defaults to 1e-6
+
+    Returns:
+        bytes: 16 byte blake2b digest
+    """
+    return hashlib.blake2b(normalized_wkb(geometry, tolerance), digest_size=DIGEST_SIZE).digest()
+
+
+###====================== TOOL3: Duplicate detection
+
+class DuplicateGeometryDetector:
+    """Finds duplicate geometries while streaming (oid, geometry) pairs
+
+    Only the digest and first OID of each geometry are kept, OID lists are only built for digests seen more than once
+
+    Args:
+        tolerance (float, optional): Grid size coordinates are snapped to, in layer units. Defaults to 1e-6
+    """
+    def __init__(self, tolerance=DEFAULT_TOLERANCE):
+        self.tolerance = tolerance
+        self.count = 0
+        self.null_count = 0
+        self._first_oid = {} # digest -> oid of the first feature with that geometry
+        self._duplicates = {} # digest -> [oids of every feature with that geometry], only for duplicates
+
+    def add(self, oid, geometry):
+        if geometry is None:
+            self.null_count += 1
+            return
+        self.count += 1
+        digest = geometry_hash(geometry, self.tolerance)
+        if digest not in self._first_oid:
+            self._first_oid[digest] = oid
+        elif digest in self._duplicates:
+            self._duplicates[digest].append(oid)
+        else:
+            self._duplicates[digest] = [self._first_oid[digest], oid]
+
+    def update(self, oids, geometries):
+        for oid, geometry in zip(oids, geometries):
+            self.add(oid, geometry)
+
+    @property
+    def unique(self):
+        return len(self._first_oid)
+
+    def groups(self):
+        """OID groups of duplicate geometries, each group lists every feature sharing one geometry
+
+        Returns:
+            list: lists of OIDs, ordered by their first OID
+        """
+        return sorted(self._duplicates.values(), key=lambda oids: oids[0])
+
+    def result(self):
+        return {"count": self.count, "null_count": self.null_count, "unique": self.unique,
+                "duplicates": self.count - self.unique, "duplicate_groups": self.groups()}
+
+
+def find_duplicate_geometries(records, tolerance=DEFAULT_TOLERANCE):
+    """Find duplicate geometries in an iterable of (oid, geometry) pairs
+
+    Args:
+        records (iterable): (oid, geometry) pairs, geometry can be WKT, a shapefile_reader.Shape or None
+        tolerance (float, optional): Grid size coordinates are snapped to, in layer units. Defaults to 1e-6
+
+    Returns:
+        list: OID groups of duplicate geometries
+    """
+    detector = DuplicateGeometryDetector(tolerance)
+    for oid, geometry in records:
+        detector.add(oid, geometry)
+    return detector.groups()
+
+
+def find_duplicate_geometries_in_shapefile(shp_path, tolerance=DEFAULT_TOLERANCE):
+    """Find duplicate geometries in a shapefile without arcpy, streaming the .shp once
+
+    Args:
+        shp_path (str): Path to the .shp file
+        tolerance (float, optional): Grid size coordinates are snapped to, in layer units. Defaults to 1e-6
+
+    Returns:
+        list: OID (FID) groups of duplicate geometries
+    """
+    return find_duplicate_geometries(shpr.iter_shapes(shp_path), tolerance)
@@ -0,0 +1,277 @@
+""" Overlap Detector (od)
+In-process detection of overlapping polygons within one layer, an alternative to the PairwiseIntersect workflow in custom_arcpy_tools.check_Fc_NonselfOverlap
+An STR packed R-tree over the feature bounding boxes finds candidate pairs, only candidates get the exact overlap area computed
+Does not need arcpy, runs on shapefiles (shapefile_reader) or on (oid, WKT) rows from an arcpy cursor, optionally over a process pool
+"""
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import geometry_hash as gh
+import shapefile_reader as shpr
+
+
+### How do use these scripts in my own work?:
+## 1. import the module next to your script:
+
+    #  import overlap_detector as od
+
+## 2. call the functions like this:
+
+    ## To find overlapping polygons in a shapefile, using 4 processes
+    # od.find_overlaps_in_shapefile(shp_path, workers=4)
+    #  [(oid_a, oid_b, overlap_area), ...]
+
+    ## To check (oid, geometry) rows, geometry can be WKT or a shapefile_reader.Shape
+    # od.find_overlaps(rows, min_area=1.0)
+
+
+DEFAULT_NODE_CAPACITY = 10
+
+
+###====================== TOOL1: STR packed R-tree over bounding boxes
+
+def _bbox_of(parts):
+    xs = [x for part in parts for x, _ in part]
+    ys = [y for part in parts for _, y in part]
+    return (min(xs), min(ys), max(xs), max(ys))
+
+
+def _bboxes_overlap(a, b):
+    """True when two boxes share interior area, boxes that only touch can not hold an overlap"""
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+class STRtree:
+    """Static R-tree bulk loaded with the Sort-Tile-Recursive algorithm
+
+    Args:
+        bboxes (list): (xmin, ymin, xmax, ymax) of each item, items are referred to by their position in this list
+        node_capacity (int, optional): Maximum children per node. Defaults to 10
+    """
+    def __init__(self, bboxes, node_capacity=DEFAULT_NODE_CAPACITY):
+        self.bboxes = list(bboxes)
+        self.node_capacity = node_capacity
+        # a node is (bbox, children, is_leaf), leaf children are item positions
+        self.leaves = self._pack([(bbox, i) for i, bbox in enumerate(self.bboxes)], leaf=True)
+        level = self.leaves
+        while len(level) > 1:
+            level = self._pack([(node[0], node) for node in level], leaf=False)
+        self.root = level[0] if level else None
+
+    def _pack(self, entries, leaf):
+        """Group entries (bbox, child) into nodes: sort by x center, cut into vertical slices, sort each slice by y center"""
+        capacity = self.node_capacity
+        node_count = math.ceil(len(entries) / capacity)
+        slice_size = capacity * math.ceil(math.sqrt(node_count)) if node_count else capacity
+        entries = sorted(entries, key=lambda e: e[0][0] + e[0][2])
+        nodes = []
+        for s in range(0, len(entries), slice_size):
+            vertical_slice = sorted(entries[s:s + slice_size], key=lambda e: e[0][1] + e[0][3])
+            for n in range(0, len(vertical_slice), capacity):
+                group = vertical_slice[n:n + capacity]
+                bbox = (min(e[0][0] for e in group), min(e[0][1] for e in group),
+                        max(e[0][2] for e in group), max(e[0][3] for e in group))
+                nodes.append((bbox, [e[1] for e in group], leaf))
+        return nodes
+
+    def query(self, bbox):
+        """Positions of the items whose bounding box shares interior area with bbox"""
+        if self.root is None or not _bboxes_overlap(self.root[0], bbox):
+            return []
+        found, stack = [], [self.root]
+        while stack:
+            node_bbox, children, leaf = stack.pop()
+            if leaf:
+                found.extend(i for i in children if _bboxes_overlap(self.bboxes[i], bbox))
+            else:
+                stack.extend(child for child in children if _bboxes_overlap(child[0], bbox))
+        return found
+
+    def partitions(self, count):
+        """Split the items into count spatially coherent groups of whole leaves, used to spread work over processes"""
+        count = max(1, min(count, len(self.leaves)))
+        size = math.ceil(len(self.leaves) / count) if self.leaves else 1
+        return [[i for leaf in self.leaves[p:p + size] for i in leaf[1]] for p in range(0, len(self.leaves), size)]
+
+
+###====================== TOOL2: Exact overlap area of two polygons
+
+def _edges(parts, xmin, xmax):
+    """Non vertical edges (xa, ya, xb, yb) with xa < xb of all rings, limited to the x range, sorted by xa"""
+    edges = []
+    for ring in parts:
+        if len(ring) > 1 and ring[0] != ring[-1]:
+            ring = ring + ring[:1]
+        for (x1, y1), (x2, y2) in zip(ring, ring[1:]):
+            if x1 == x2: # vertical edges have no width, they never cross a slab
+                continue
+            if x1 > x2:
+                x1, y1, x2, y2 = x2, y2, x1, y1
+            if x2 > xmin and x1 < xmax:
+                edges.append((x1, y1, x2, y2))
+    edges.sort()
+    return edges
+
+
+def _y_at(edge, x):
+    xa, ya, xb, yb = edge
+    return ya + (yb - ya) * (x - xa) / (xb - xa)
+
+
+def _inside_length(edges_a, edges_b, x):
+    """Length of the vertical line at x that is inside both polygons (even-odd rule, so holes are handled)"""
+    ys_a = sorted(_y_at(e, x) for e in edges_a)
+    ys_b = sorted(_y_at(e, x) for e in edges_b)
+    length, i, j = 0.0, 0, 0
+    while i + 1 < len(ys_a) and j + 1 < len(ys_b):
+        low = max(ys_a[i], ys_b[j])
+        high = min(ys_a[i + 1], ys_b[j + 1])
+        if high > low:
+            length += high - low
+        if ys_a[i + 1] < ys_b[j + 1]:
+            i += 2
+        else:
+            j += 2
+    return length
+
+
+def polygon_overlap_area(parts_a, parts_b):
+    """Exact area shared by two polygons, using a vertical slab sweep
+
+    Between two consecutive vertex x coordinates the edges crossing a slab are fixed, and once the slab is also split
+    at the x of every edge crossing between the two polygons, the inside length is linear in x, so the area of each slab
+    is its width times the inside length at the slab middle
+
+    Args:
+        parts_a (list): Rings of the first polygon, lists of (x, y)
+        parts_b (list): Rings of the second polygon, lists of (x, y)
+
+    Returns:
+        float: the overlap area, 0.0 for polygons that are disjoint or only share boundaries
+    """
+    bbox_a, bbox_b = _bbox_of(parts_a), _bbox_of(parts_b)
+    xmin, xmax = max(bbox_a[0], bbox_b[0]), min(bbox_a[2], bbox_b[2])
+    if xmin >= xmax:
+        return 0.0
+    edges_a, edges_b = _edges(parts_a, xmin, xmax), _edges(parts_b, xmin, xmax)
+    xs = sorted({xmin, xmax} | {x for e in edges_a + edges_b for x in (e[0], e[2]) if xmin < x < xmax})
+
+    area = 0.0
+    active_a, active_b = [], []
+    next_a = next_b = 0
+    for x0, x1 in zip(xs, xs[1:]):
+        # edges spanning the slab: started at or before x0, end at or after x1
+        while next_a < len(edges_a) and edges_a[next_a][0] <= x0:
+            active_a.append(edges_a[next_a])
+            next_a += 1
+        while next_b < len(edges_b) and edges_b[next_b][0] <= x0:
+            active_b.append(edges_b[next_b])
+            next_b += 1
+        active_a = [e for e in active_a if e[2] >= x1]
+        active_b = [e for e in active_b if e[2] >= x1]
+        if len(active_a) < 2 or len(active_b) < 2:
+            continue
+
+        # split the slab where an edge of a crosses an edge of b
+        cuts = [x0, x1]
+        for ea in active_a:
+            for eb in active_b:
+                d0, d1 = _y_at(ea, x0) - _y_at(eb, x0), _y_at(ea, x1) - _y_at(eb, x1)
+                if d0 * d1 < 0:
+                    cuts.append(x0 + (x1 - x0) * d0 / (d0 - d1))
+        cuts.sort()
+        for c0, c1 in zip(cuts, cuts[1:]):
+            if c1 > c0:
+                area += (c1 - c0) * _inside_length(active_a, active_b, (c0 + c1) / 2)
+    return area
+
+
+###====================== TOOL3: Find overlapping pairs
+
+# state shared with pool workers, set once per process by _init_worker
+_WORKER_STATE = {}
+
+
+def _init_worker(oids, parts, bboxes, node_capacity):
+    _WORKER_STATE.update(oids=oids, parts=parts, bboxes=bboxes, tree=STRtree(bboxes, node_capacity))
+
+
+def _overlaps_for(positions, min_area):
+    """Overlaps between the features at positions and every later feature in the layer"""
+    oids, parts, bboxes, tree = (_WORKER_STATE[k] for k in ("oids", "parts", "bboxes", "tree"))
+    found = []
+    for i in positions:
+        for j in tree.query(bboxes[i]):
+            if j <= i: # each pair is tested once, from its first feature
+                continue
+            area = polygon_overlap_area(parts[i], parts[j])
+            if area > min_area:
+                a, b = sorted((oids[i], oids[j]))
+                found.append((a, b, area))
+    return found
+
+
+def find_overlaps(records, workers=1, min_area=0.0, node_capacity=DEFAULT_NODE_CAPACITY):
+    """Find pairs of polygons in one layer whose interiors overlap
+
+    Args:
+        records (iterable): (oid, geometry) pairs, geometry can be WKT, a shapefile_reader.Shape or None
+        workers (int, optional): Number of processes, each takes a partition of the tree. Defaults to 1 (in-process)
+        min_area (float, optional): Only report overlaps larger than this area, in layer units. Defaults to 0.0
+        node_capacity (int, optional): R-tree node size. Defaults to 10
+
+    Returns:
+        list: (oid_a, oid_b, overlap_area) tuples with oid_a < oid_b, sorted by OIDs
+    """
+    oids, parts = [], []
+    for oid, geometry in records:
+        if geometry is None:
+            continue
+        family, geometry_parts = gh.read_geometry(geometry)
+        if family != gh.POLYGON:
+            raise ValueError(f"Overlap detection needs polygons, feature {oid} is not a polygon")
+        if geometry_parts:
+            oids.append(oid)
+            parts.append(geometry_parts)
+    bboxes = [_bbox_of(p) for p in parts]
+
+    if workers <= 1 or len(parts) < 2:
+        _init_worker(oids, parts, bboxes, node_capacity)
+        found = _overlaps_for(range(len(parts)), min_area)
+    else:
+        partitions = STRtree(bboxes, node_capacity).partitions(workers * 4) # several partitions per worker balances the load
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(oids, parts, bboxes, node_capacity)) as pool:
+            found = [pair for result in pool.map(_overlaps_for, partitions, [min_area] * len(partitions)) for pair in result]
+    return sorted(found)
+
+
+def find_overlaps_in_shapefile(shp_path, workers=1, min_area=0.0):
+    """Find overlapping polygons in a shapefile without arcpy
+
+    Args:
+        shp_path (str): Path to the polygon .shp file
+        workers (int, optional): Number of processes. Defaults to 1
+        min_area (float, optional): Only report overlaps larger than this area, in layer units. Defaults to 0.0
+
+    Returns:
+        list: (fid_a, fid_b, overlap_area) tuples with fid_a < fid_b
+    """
+    if not os.path.exists(shp_path):
+        raise FileNotFoundError(f"Shapefile geometry not found: {shp_path}")
+    return find_overlaps(shpr.iter_shapes(shp_path), workers, min_area)
+
+
+def summarize_overlaps(overlaps):
+    """Print and return the overlaps in the check_Fc_NonselfOverlap format
+
+    Args:
+        overlaps (list): Result of find_overlaps
+
+    Returns:
+        tuple: (count, overlap_ids, overlaps), overlap_ids lists the higher OID of each pair like the FID > FID_1 filter
+    """
+    overlap_ids = sorted({b for _, b, _ in overlaps})
+    print(f" Overlap index detected {len(overlaps)} overlaps for the following objects Ids: \n{overlap_ids}")
+    return len(overlaps), overlap_ids, overlaps
@@ -0,0 +1,285 @@
+""" Shapefile Reader (shpr)
+Pure python reader for ESRI shapefiles (.shp/.shx/.dbf) that does not need arcpy
+Reads the attribute table and geometries in column batches so large layers can be scanned once, on any platform (e.g., Linux CI)
+"""
+import os # build the sidecar paths (.dbf, .cpg) from the .shp path
+import struct # unpack the binary headers and coordinate arrays
+import datetime # convert dBASE D fields to dates
+from collections import namedtuple
+
+
+### How do use these scripts in my own work?:
+## 1. import the reader next to your script:
+
+    #  import shapefile_reader as shpr
+
+## 2. call the functions like this:
+
+    ## To list the attribute fields of a shapefile
+    # shpr.read_dbf_fields(r"path/to/layer.dbf")
+
+    ## To stream attributes + geometry in batches of 10,000 rows
+    # for batch in shpr.iter_shapefile_batches(r"path/to/layer.shp"):
+    #     batch["OID"], batch["SHAPE"], batch["FEATURE_NA"]
+
+
+# A dBASE field descriptor, type is reported with the ArcGIS field type names (String, Integer, Double, Date)
+DbfField = namedtuple("DbfField", ["name", "type", "length", "decimals", "dbf_type"])
+
+# A shape record, parts is a list of rings/paths, each a list of (x, y) tuples. Z and M values are not kept
+Shape = namedtuple("Shape", ["shape_type", "bbox", "parts"])
+
+# shp shape type codes -> ArcGIS shape type names
+SHAPE_TYPE_NAMES = {
+    0: "Null", 1: "Point", 3: "Polyline", 5: "Polygon", 8: "Multipoint",
+    11: "Point", 13: "Polyline", 15: "Polygon", 18: "Multipoint",
+    21: "Point", 23: "Polyline", 25: "Polygon", 28: "Multipoint",
+}
+POINT_TYPES = (1, 11, 21)
+MULTIPOINT_TYPES = (8, 18, 28)
+PART_TYPES = (3, 5, 13, 15, 23, 25) # polyline and polygon records share the same layout
+
+
+###====================== TOOL1: Read the dBASE (.dbf) attribute table
+
+def _dbf_path(shp_path):
+    return os.path.splitext(shp_path)[0] + ".dbf"
+
+
+def _dbf_encoding(dbf_path, default="latin-1"):
+    """Read the code page from the .cpg sidecar file, falls back to latin-1 when there is none"""
+    cpg_path = os.path.splitext(dbf_path)[0] + ".cpg"
+    if os.path.exists(cpg_path):
+        with open(cpg_path, "r") as f:
+            encoding = f.read().strip()
+        if encoding:
+            return encoding
+    return default
+
+
+def _arcgis_field_type(dbf_type, length, decimals):
+    if dbf_type == "C":
+        return "String"
+    if dbf_type == "N":
+        return "Integer" if decimals == 0 and length <= 10 else "Double"
+    if dbf_type == "F":
+        return "Double"
+    if dbf_type == "D":
+        return "Date"
+    return "String" # L (logical), M (memo) and anything else are read as text
+
+
+def _read_dbf_header(f):
+    """Reads the dbf header from an open file and returns (record_count, header_length, record_length, fields)"""
+    header = f.read(32)
+    if len(header) < 32:
+        raise ValueError("Invalid dbf file: header is truncated")
+    record_count, header_length, record_length = struct.unpack("<IHH", header[4:12])
+    fields = []
+    while True:
+        descriptor = f.read(32)
+        if not descriptor or descriptor[0:1] == b"\r": # 0x0D terminates the field descriptors
+            break
+        name = descriptor[:11].split(b"\x00")[0].decode("ascii", errors="replace").strip()
+        dbf_type = chr(descriptor[11])
+        length, decimals = descriptor[16], descriptor[17]
+        fields.append(DbfField(name, _arcgis_field_type(dbf_type, length, decimals), length, decimals, dbf_type))
+    return record_count, header_length, record_length, fields
+
+
+def read_dbf_fields(dbf_path):
+    """List the fields of a dBASE table
+
+    Args:
+        dbf_path (str): Path to the .dbf file (a .shp path is also accepted)
+
+    Returns:
+        list: DbfField(name, type, length, decimals, dbf_type) for each field, in table order
+    """
+    with open(_dbf_path(dbf_path), "rb") as f:
+        return _read_dbf_header(f)[3]
+
+
+def _parse_dbf_value(raw, field, encoding):
+    """Convert the raw bytes of one dbf cell to a python value, blank numbers and dates become None"""
+    if field.dbf_type == "C":
+        return raw.decode(encoding, errors="replace").strip()
+    text = raw.strip()
+    if field.dbf_type in ("N", "F"):
+        if not text or text.startswith(b"*"): # dbf writes ***** for values that overflow the field width
+            return None
+        try:
+            if field.decimals == 0 and b"." not in text:
+                return int(text)
+            return float(text)
+        except ValueError:
+            return None
+    if field.dbf_type == "D":
+        try:
+            return datetime.date(int(text[:4]), int(text[4:6]), int(text[6:8]))
+        except ValueError:
+            return None
+    if field.dbf_type == "L":
+        if text in (b"T", b"t", b"Y", b"y"):
+            return True
+        if text in (b"F", b"f", b"N", b"n"):
+            return False
+        return None
+    return raw.decode(encoding, errors="replace").strip()
+
+
+def iter_dbf_batches(dbf_path, field_names=None, batch_size=10000, encoding=None):
+    """Stream a dBASE table in column batches
+
+    Args:
+        dbf_path (str): Path to the .dbf file (a .shp path is also accepted)
+        field_names (list, optional): Fields to read. Defaults to all fields
+        batch_size (int, optional): Number of records per batch. Defaults to 10000
+        encoding (str, optional): Text encoding. Defaults to the .cpg code page, or latin-1
+
+    Yields:
+        dict: {"OID": [record index, ...], field_name: [value, ...]} for up to batch_size records.
+            Deleted records are skipped, OIDs are the 0-based record positions (the shapefile FID)
+    """
+    dbf_path = _dbf_path(dbf_path)
+    encoding = encoding or _dbf_encoding(dbf_path)
+    with open(dbf_path, "rb") as f:
+        record_count, header_length, record_length, fields = _read_dbf_header(f)
+        if field_names is not None:
+            missing = [name for name in field_names if name not in {fld.name for fld in fields}]
+            if missing:
+                raise ValueError(f"Fields not found in {dbf_path}: {missing}")
+
+        # byte offset of every field within a record, the first byte is the deletion flag
+        offsets = []
+        position = 1
+        for fld in fields:
+            if field_names is None or fld.name in field_names:
+                offsets.append((fld, position, position + fld.length))
+            position += fld.length
+
+        f.seek(header_length)
+        batch = _new_batch(["OID"] + [fld.name for fld, _, _ in offsets])
+        for oid in range(record_count):
+            record = f.read(record_length)
+            if len(record) < record_length:
+                break
+            if record[0:1] == b"*": # deleted record
+                continue
+            batch["OID"].append(oid)
+            for fld, start, end in offsets:
+                batch[fld.name].append(_parse_dbf_value(record[start:end], fld, encoding))
+            if len(batch["OID"]) >= batch_size:
+                yield batch
+                batch = _new_batch(batch.keys())
+        if batch["OID"]:
+            yield batch
+
+
+def _new_batch(columns):
+    return {column: [] for column in columns}
+
+
+###====================== TOOL2: Read the geometries (.shp)
+
+def read_shp_header(shp_path):
+    """Read the main .shp file header
+
+    Args:
+        shp_path (str): Path to the .shp file
+
+    Returns:
+        dict: shape_type (code), shape_type_name, bbox (xmin, ymin, xmax, ymax) and file_length in bytes
+    """
+    with open(shp_path, "rb") as f:
+        header = f.read(100)
+    if len(header) < 100 or struct.unpack(">i", header[:4])[0] != 9994:
+        raise ValueError(f"{shp_path} is not a valid shapefile")
+    file_length = struct.unpack(">i", header[24:28])[0] * 2 # stored in 16-bit words
+    shape_type = struct.unpack("<i", header[32:36])[0]
+    bbox = struct.unpack("<4d", header[36:68])
+    return {"shape_type": shape_type, "shape_type_name": SHAPE_TYPE_NAMES.get(shape_type, "Unknown"),
+            "bbox": bbox, "file_length": file_length}
+
+
+def _parse_shape(content):
+    """Convert the content of one shp record to a Shape, returns None for null shapes"""
+    shape_type = struct.unpack_from("<i", content, 0)[0]
+    if shape_type == 0:
+        return None
+    if shape_type in POINT_TYPES:
+        x, y = struct.unpack_from("<2d", content, 4)
+        return Shape(shape_type, (x, y, x, y), [[(x, y)]])
+    if shape_type in MULTIPOINT_TYPES:
+        bbox = struct.unpack_from("<4d", content, 4)
+        num_points = struct.unpack_from("<i", content, 36)[0]
+        coords = struct.unpack_from(f"<{2 * num_points}d", content, 40)
+        return Shape(shape_type, bbox, [list(zip(coords[0::2], coords[1::2]))])
+    if shape_type in PART_TYPES:
+        bbox = struct.unpack_from("<4d", content, 4)
+        num_parts, num_points = struct.unpack_from("<2i", content, 36)
+        starts = struct.unpack_from(f"<{num_parts}i", content, 44)
+        coords = struct.unpack_from(f"<{2 * num_points}d", content, 44 + 4 * num_parts)
+        points = list(zip(coords[0::2], coords[1::2]))
+        ends = list(starts[1:]) + [num_points]
+        return Shape(shape_type, bbox, [points[start:end] for start, end in zip(starts, ends)])
+    raise ValueError(f"Unsupported shape type: {shape_type}")
+
+
+def iter_shapes(shp_path):
+    """Stream the geometries of a .shp file one record at a time
+
+    Args:
+        shp_path (str): Path to the .shp file
+
+    Yields:
+        tuple: (oid, Shape or None), oid is the 0-based record position (the shapefile FID)
+    """
+    file_length = read_shp_header(shp_path)["file_length"]
+    with open(shp_path, "rb") as f:
+        f.seek(100)
+        oid = 0
+        while f.tell() < file_length:
+            record_header = f.read(8)
+            if len(record_header) < 8:
+                break
+            content_length = struct.unpack(">2i", record_header)[1] * 2
+            yield oid, _parse_shape(f.read(content_length))
+            oid += 1
+
+
+###====================== TOOL3: Read attributes + geometry together in column batches
+
+def iter_shapefile_batches(shp_path, field_names=None, batch_size=10000, with_geometry=True, encoding=None):
+    """Stream a shapefile as column batches of attributes and geometry in a single pass
+
+    Args:
+        shp_path (str): Path to the .shp file
+        field_names (list, optional): Attribute fields to read. Defaults to all fields
+        batch_size (int, optional): Number of records per batch. Defaults to 10000
+        with_geometry (bool, optional): Add a "SHAPE" column of Shape records. Defaults to True
+        encoding (str, optional): Text encoding of the dbf. Defaults to the .cpg code page
+
+    Yields:
+        dict: {"OID": [...], field_name: [...], "SHAPE": [...]} for up to batch_size records
+
+    Raises:
+        FileNotFoundError: if with_geometry is True and the .shp file is missing
+    """
+    if not with_geometry:
+        yield from iter_dbf_batches(shp_path, field_names, batch_size, encoding)
+        return
+    if not os.path.exists(shp_path):
+        raise FileNotFoundError(f"Shapefile geometry not found: {shp_path}")
+
+    shapes = iter_shapes(shp_path)
+    for batch in iter_dbf_batches(shp_path, field_names, batch_size, encoding):
+        geometries = []
+        for oid in batch["OID"]:
+            # advance the shp stream to the dbf record, skipping geometries of deleted rows
+            shape_oid, shape = next(shapes, (None, None))
+            while shape_oid is not None and shape_oid < oid:
+                shape_oid, shape = next(shapes, (None, None))
+            geometries.append(shape)
+        batch["SHAPE"] = geometries
+        yield batch
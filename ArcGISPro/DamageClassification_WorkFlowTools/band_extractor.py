@@ -0,0 +1,140 @@
+""" Band Extractor (be)
+Windowed alternative to the ExtractBand + in_memory + CopyRaster steps of extractBands_exportRaster.py
+Reads the input raster window by window, keeps the RGB bands (drops alpha), turns transparent and 0,0,0 pixels into NoData,
+scales each window to 8-bit and writes it straight into a tiled, compressed GeoTIFF, memory stays at a few windows whatever the raster size
+Does not need arcpy (rasterio / GDAL), runs on Linux
+"""
+import argparse
+import math
+
+import numpy as np
+import rasterio
+from rasterio.windows import Window
+
+
+### How do use these scripts in my own work?:
+## 1. import the module next to your script:
+
+    #  import band_extractor as be
+
+## 2. call the functions like this:
+
+    ## To write bands 1, 2, 3 of an orthomosaic as an 8-bit GeoTIFF with 0 as NoData
+    # be.extract_bands(r"C:\Data\ortho.tif", r"C:\Data\ortho_rgb.tif")
+    #  {'width': 84000, 'height': 61000, 'bands': [1, 2, 3], 'windows': 4956}
+
+    ## From a terminal
+    # python band_extractor.py ortho.tif ortho_rgb.tif --bands 1 2 3
+
+
+DEFAULT_BANDS = (1, 2, 3)
+TILE_SIZE = 512  # output GeoTIFF tiles
+WINDOW_SIZE = 2048  # pixels read and written at once (a multiple of TILE_SIZE), ~50 MB per window for 3 float bands
+NODATA = 0
+
+
+###====================== TOOL1: Block windows
+
+def iter_windows(width, height, window_size=WINDOW_SIZE):
+    """Windows covering the raster row by row, edge windows are clipped to the raster"""
+    for row in range(0, height, window_size):
+        for col in range(0, width, window_size):
+            yield Window(col, row, min(window_size, width - col), min(window_size, height - row))
+
+
+###====================== TOOL2: 8-bit scaling
+
+def band_scaling(src, bands, window_size=WINDOW_SIZE):
+    """(offset, scale) per band so that (value - offset) * scale spans 0 - 255
+
+    Integer bands are scaled from the full range of their pixel type, like CopyRaster ScalePixelValue (16-bit 65535 -> 255),
+    8-bit bands are copied as they are. Float bands have no type range: they are scaled from their min / max over the
+    valid pixels, found in a first windowed pass.
+    """
+    dtype = np.dtype(src.dtypes[bands[0] - 1])
+    if dtype == np.uint8:
+        return [(0.0, 1.0)] * len(bands)
+    if np.issubdtype(dtype, np.integer):
+        info = np.iinfo(dtype)
+        return [(float(info.min), 255.0 / (float(info.max) - info.min))] * len(bands)
+
+    low, high = np.full(len(bands), np.inf), np.full(len(bands), -np.inf)
+    for window in iter_windows(src.width, src.height, window_size):
+        block = src.read(bands, window=window, masked=True)
+        valid = src.dataset_mask(window=window) > 0
+        for i in range(len(bands)):
+            values = block[i][valid & ~np.ma.getmaskarray(block[i])]
+            values = values[np.isfinite(values)]
+            if values.size:
+                low[i], high[i] = min(low[i], values.min()), max(high[i], values.max())
+    return [(lo, 255.0 / (hi - lo)) if hi > lo else (lo if math.isfinite(lo) else 0.0, 0.0) for lo, hi in zip(low, high)]
+
+
+def scale_block(block, scaling, invalid):
+    """8-bit window: bands scaled to 0 - 255, invalid pixels (transparent, source NoData, 0 in every band) set to NODATA"""
+    if all(scale == 1.0 and offset == 0.0 for offset, scale in scaling) and block.dtype == np.uint8:
+        out = block.copy()
+    else:
+        out = np.empty(block.shape, dtype=np.uint8)
+        for i, (offset, scale) in enumerate(scaling):
+            band = (block[i].astype(np.float64) - offset) * scale
+            np.rint(band, out=band)
+            np.clip(np.nan_to_num(band, nan=NODATA), 0, 255, out=band)
+            out[i] = band
+    out[:, invalid | np.all(block == 0, axis=0)] = NODATA
+    return out
+
+
+###====================== TOOL3: Extract bands to an 8-bit GeoTIFF
+
+def extract_bands(input_raster, output_raster, bands=DEFAULT_BANDS, window_size=WINDOW_SIZE, tile_size=TILE_SIZE):
+    """Write bands of a raster as a tiled, Deflate compressed 8-bit GeoTIFF with NoData 0, one window at a time
+
+    Args:
+        input_raster (str): Raster GDAL can read (GeoTIFF, IMG, ...)
+        output_raster (str): Output GeoTIFF
+        bands (sequence, optional): Band numbers to keep, from 1. Defaults to (1, 2, 3), which drops an alpha band 4
+        window_size (int, optional): Window width and height in pixels, a multiple of tile_size. Defaults to 2048
+        tile_size (int, optional): Output tile width and height, a multiple of 16. Defaults to 512
+
+    Returns:
+        dict: {"width", "height", "bands", "windows"}
+    """
+    bands = list(bands)
+    if window_size % tile_size:
+        raise ValueError(f"window size {window_size} is not a multiple of the tile size {tile_size}")
+    with rasterio.open(input_raster) as src:
+        missing = [b for b in bands if not 1 <= b <= src.count]
+        if missing:  # same as ExtractBand missing_band_action='Fail'
+            raise ValueError(f"{input_raster} has {src.count} bands, band(s) {missing} not found")
+        scaling = band_scaling(src, bands, window_size)
+        profile = {"driver": "GTiff", "width": src.width, "height": src.height, "count": len(bands), "dtype": "uint8",
+                   "crs": src.crs, "transform": src.transform, "nodata": NODATA,
+                   "tiled": True, "blockxsize": tile_size, "blockysize": tile_size,
+                   "compress": "deflate", "predictor": 2, "zlevel": 6, "num_threads": "all_cpus", "bigtiff": "if_safer"}
+        if len(bands) == 3:
+            profile.update(photometric="rgb", interleave="pixel")
+
+        windows = 0
+        with rasterio.open(output_raster, "w", **profile) as dst:
+            for window in iter_windows(src.width, src.height, window_size):
+                block = src.read(bands, window=window)
+                invalid = src.dataset_mask(window=window) == 0  # alpha 0 and source NoData
+                dst.write(scale_block(block, scaling, invalid), window=window)
+                windows += 1
+    return {"width": profile["width"], "height": profile["height"], "bands": bands, "windows": windows}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract bands of a raster to a tiled 8-bit GeoTIFF, window by window")
+    parser.add_argument("input_raster", help="Input raster")
+    parser.add_argument("output_raster", help="Output GeoTIFF")
+    parser.add_argument("--bands", type=int, nargs="+", default=list(DEFAULT_BANDS), help="Band numbers to keep (default: 1 2 3)")
+    parser.add_argument("--window", type=int, default=WINDOW_SIZE, help=f"Window size in pixels (default: {WINDOW_SIZE})")
+    args = parser.parse_args()
+    result = extract_bands(args.input_raster, args.output_raster, args.bands, args.window)
+    print(f"{result['width']} x {result['height']} raster, bands {result['bands']}, written in {result['windows']} windows")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,13 @@
 import arcpy
 import os 
+import sys
+
+# windowed engine (rasterio), reads and writes the raster block by block instead of staging it in memory
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+try:
+    import band_extractor as be
+except ImportError: # rasterio is not installed in this ArcGIS Pro environment, use ExtractBand + CopyRaster
+    be = None
 
 
 ###================== Set up folders and settings 
@@ -21,25 +29,31 @@ arcpy.env.overwriteOutput=True
 ###================== Extract bands and save the raster as 8-bit TIF  
 
 try:
-    extracted_raster = arcpy.ia.ExtractBand(input_raster,[1,2,3],missing_band_action='Fail' )
+    if be is not None and os.path.isfile(input_raster): # file rasters only, geodatabase rasters go through arcpy
+        result = be.extract_bands(input_raster, output_raster, bands=[1,2,3])
+        arcpy.SetParameterAsText(3,output_raster)
+        arcpy.AddMessage(f"Saved 3 band 8-bit raster with NoData value applied at {output_raster} ({result['windows']} windows)")
+
+    else:
+        extracted_raster = arcpy.ia.ExtractBand(input_raster,[1,2,3],missing_band_action='Fail' )
+
+        # save the output raster temporarily
+        temp_raster = "in_memory\\temp_raster"
+        extracted_raster.save(temp_raster)
 
-    # save the output raster temporarily
-    temp_raster = "in_memory\\temp_raster"
-    extracted_raster.save(temp_raster)
 
+        # add success message (green text) to show it completes
+        arcpy.AddMessage(f"Extracted 3 band raster saved it at {output_raster}")
 
-    # add success message (green text) to show it completes
-    arcpy.AddMessage(f"Extracted 3 band raster saved it at {output_raster}")
+        # copy to specify the no data value converting 0,0,0 pixels to NoData rather than 0,0,0 pixel appearing as black after removing the alpha channel
+        # convert to 8-bit unsigned with proper scaling if not already done.
+        arcpy.management.CopyRaster(temp_raster,output_raster,pixel_type="8_BIT_UNSIGNED", scale_pixel_value="ScalePixelValue",nodata_value=0, format="TIFF") # no data value is 0, change if your no Data value is different
 
-    # copy to specify the no data value converting 0,0,0 pixels to NoData rather than 0,0,0 pixel appearing as black after removing the alpha channel
-    # convert to 8-bit unsigned with proper scaling if not already done.
-    arcpy.management.CopyRaster(temp_raster,output_raster,pixel_type="8_BIT_UNSIGNED", scale_pixel_value="ScalePixelValue",nodata_value=0, format="TIFF") # no data value is 0, change if your no Data value is different
+        # Display the output in ArcGIS
+        arcpy.SetParameterAsText(3,output_raster)
 
-    # Display the output in ArcGIS
-    arcpy.SetParameterAsText(3,output_raster)
-    
-    # add success message (green text) to show it completes
-    arcpy.AddMessage(f"Saved raster with NoData value applied at {output_raster}")
+        # add success message (green text) to show it completes
+        arcpy.AddMessage(f"Saved raster with NoData value applied at {output_raster}")
 
 except Exception as e:
     arcpy.AddError(f"Error processing raster: {str(e)}") # critical errors that cause failure (red text)
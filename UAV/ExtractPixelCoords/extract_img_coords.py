@@ -25,9 +25,17 @@
 
 
 import cv2
+import numpy as np
 import os
+import subprocess
+import sys
 import pandas as pd
 import easygui
+import gcp_detection  # automatic GCP target detection, see gcp_detection.py
+import gcp_projection  # GCP pixel position predicted from the photo GPS pose, see gcp_projection.py
+import gcp_export  # pair building and incremental exports, see gcp_export.py
+from marking_journal import JOURNAL_FILE, MarkingJournal  # crash-safe journal of the marks, see marking_journal.py
+from image_cache import ImageCache, ImagePrefetcher  # decoded images and pyramid levels, see image_cache.py
 
 # Initialize variables
 coordinates_dict = {}  # Stores latest clicks per (gcp_label, image)
@@ -40,6 +48,22 @@ zoom_level = 1
 zoom_center = None
 WINDOW_W, WINDOW_H = 900, 600  # Set desired window size
 SCALE_FACTOR = 0.25  # Display images at 1/4 size
+IMAGE_CACHE_MB = 1024  # Memory budget for decoded images
+PREFETCH_AHEAD = 4  # Images decoded in the background ahead of the current one
+PREFETCH_WORKERS = 2  # Background decoding threads
+UTM_ZONE = None  # UTM zone of the GCP Easting/Northing, None uses the zone of each photo's GPS position
+ODM_PROJECTION = None  # First line of the ODM gcp_list.txt, None derives "WGS84 UTM <zone><N|S>" from the photo GPS
+
+def get_gcp_points(gcp_input_df):
+    # GCP coordinates per label from the Easting, Northing and Elevation columns, empty if the CSV has none
+    gcp_label_col = gcp_input_df.attrs.get('gcp_label_col', None)
+    cols = {col.strip().lower(): col for col in gcp_input_df.columns}
+    if gcp_label_col is None or 'easting' not in cols or 'northing' not in cols:
+        return {}
+    points = gcp_input_df.dropna(subset=[gcp_label_col, cols['easting'], cols['northing']]).drop_duplicates(gcp_label_col)
+    elevations = points[cols['elevation']] if 'elevation' in cols else [None] * len(points)
+    return {label: (float(e), float(n), None if pd.isna(z) else float(z))
+            for label, e, n, z in zip(points[gcp_label_col], points[cols['easting']], points[cols['northing']], elevations)}
 
 def get_gcp_pairs_from_csv(gcp_input_df, image_list):
     gcp_label_col = gcp_input_df.attrs.get('gcp_label_col', None)
@@ -52,19 +76,7 @@ def get_gcp_pairs_from_csv(gcp_input_df, image_list):
             filename_col = col
             break
     gcp_input_df.attrs['filename_col'] = filename_col
-    pairs = []
-    if filename_col:
-        for _, row in gcp_input_df.iterrows():
-            gcp_label = row[gcp_label_col]
-            fname = row[filename_col]
-            if pd.notna(gcp_label) and pd.notna(fname) and fname in image_list:
-                pairs.append((fname, gcp_label))
-    else:
-        gcp_labels = list(gcp_input_df[gcp_label_col].dropna().unique())
-        for fname in image_list:
-            for gcp_label in gcp_labels:
-                pairs.append((fname, gcp_label))
-    return pairs
+    return gcp_export.build_pairs(gcp_input_df, gcp_label_col, filename_col, image_list)
 
 # Get folder path from user using easygui
 def get_image_folder():
@@ -82,10 +94,30 @@ if os.path.exists(folder_path):
 else:
     print("Invalid folder path. Exiting.")
     exit()
+image_cache = ImageCache(folder_path, memory_budget_mb=IMAGE_CACHE_MB)
+prefetcher = ImagePrefetcher(image_cache, workers=PREFETCH_WORKERS)
 
 # Add variables to track mouse position and clicked position
 mouse_x, mouse_y = -1, -1
-clicked_pos = {}
+clicked_pos = {}  # {gcp_label: {image: (x, y)}} clicks indexed for drawing the crosses of a label
+# Render state: the window is only redrawn when something changed
+needs_redraw = True
+base_frame_cache = {}  # resized image for the current image and zoom
+text_overlay_cache = {}  # pre-rendered text layer
+
+# Every mark is journaled as it happens, marks of an earlier session of this folder are restored
+journal = MarkingJournal(os.path.join(folder_path, JOURNAL_FILE))
+for (gcp, fname), xy in journal.marks.items():
+    coordinates_dict[(gcp, fname)] = xy
+    clicked_pos.setdefault(gcp, {})[fname] = xy
+if journal.marks:
+    print(f"Restored {len(journal.marks)} marked coordinates from {journal.path}")
+
+def set_mark(gcp_label, filename, x, y):
+    # Mark a GCP on an image: coordinates, drawing index and journal (written in the background)
+    coordinates_dict[(gcp_label, filename)] = (x, y)
+    clicked_pos.setdefault(gcp_label, {})[filename] = (x, y)
+    journal.record(gcp_label, filename, x, y)
 
 # Prompt for optional GCP CSV file (move this before any OpenCV or input() calls)
 def prompt_for_gcp_csv():
@@ -126,14 +158,87 @@ else:
     # If no CSV, just mark each image once with a dummy label
     marking_queue = [(fname, "GCP1") for fname in image_list]
 
+# Drop pairs whose GCP projects outside the photo (camera GPS pose from EXIF), keep the predicted pixel windows
+predicted_windows = {}  # {(gcp_label, image): (x, y, radius)}
+gcp_points = get_gcp_points(gcp_input_df) if gcp_input_df is not None else {}
+if gcp_points:
+    projected_queue, predicted_windows = gcp_projection.project_pairs(folder_path, marking_queue, gcp_points, zone=UTM_ZONE)
+    if projected_queue:
+        marking_queue = projected_queue
+    else:
+        print("No GCP projects inside any photo, check UTM_ZONE and the Easting/Northing columns. Keeping all pairs.")
+        predicted_windows = {}
+
+# Load automatically detected GCP targets (gcp_detection.py), offer to run the detection once per folder.
+# The detection runs in its own process: its process pool must not re-import this script
+candidates_path = os.path.join(folder_path, gcp_detection.CANDIDATES_FILE)
+if not os.path.exists(candidates_path) and easygui.ynbox(
+        "Detect GCP targets automatically to pre-fill pixel coordinates? (runs once per image folder)", "GCP Detection"):
+    subprocess.run([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "gcp_detection.py"), folder_path])
+detected_targets = gcp_detection.load_candidates(candidates_path) if os.path.exists(candidates_path) else {}
+
+def pick_seed(fname, gcp):
+    # Detected target for a pair: the closest to the predicted GCP position within its radius, else the best of the image
+    candidates = detected_targets.get(fname, [])
+    prediction = predicted_windows.get((gcp, fname))
+    if prediction is None:
+        return candidates[0] if candidates else None
+    px, py, radius = prediction
+    near = [c for c in candidates if (c[0] - px) ** 2 + (c[1] - py) ** 2 <= radius ** 2]
+    return min(near, key=lambda c: (c[0] - px) ** 2 + (c[1] - py) ** 2) if near else None
+
+# Seed the marking queue with the detected targets: (filename, gcp_label, (x, y, confidence) or None)
+marking_queue = [(fname, gcp, pick_seed(fname, gcp)) for fname, gcp in marking_queue]
+detected_seeds = {(gcp, fname): seed for fname, gcp, seed in marking_queue if seed is not None}
+if detected_targets:
+    print(f"Detected targets pre-fill {len(detected_seeds)} of {len(marking_queue)} image/GCP label pairs. Press 'a' to accept, click to correct.")
+
 current_marking_idx = 0  # Index in marking_queue
 
-def get_pixel_coordinates(event, x, y, flags, param):
-    global mouse_x, mouse_y, current_gcp_label, zoom_level, zoom_center
+# Exports keep their state between calls: the merged table is built once, the coordinate files are appended to
+exporter = gcp_export.CoordinateExporter(
+    gcp_input_df, gcp_input_df.attrs.get('gcp_label_col') if gcp_input_df is not None else None,
+    gcp_input_df.attrs.get('filename_col') if gcp_input_df is not None else None, image_list, gcp_points,
+    ODM_PROJECTION or (gcp_projection.utm_projection(folder_path, image_list, UTM_ZONE) if gcp_points else None))
+queued_pairs = {(gcp, fname) for fname, gcp, _ in marking_queue}
+queued_images = {fname for fname, _, _ in marking_queue}
+
+def is_queued(filename):
+    # Once the projection dropped pairs, 'n' only stops at images that may show the current GCP (any GCP without label)
+    if not predicted_windows:
+        return True
+    if current_gcp_label is None:
+        return filename in queued_images
+    return (current_gcp_label, filename) in queued_pairs
+
+def auto_zoom():
+    # Zoom to the predicted GCP window of the current image and label, while the pair is not marked yet
+    global zoom_level, zoom_center, needs_redraw
     filename = image_list[current_index]
-    img_path = os.path.join(folder_path, filename)
-    image = cv2.imread(img_path)
-    h, w = image.shape[:2]
+    prediction = predicted_windows.get((current_gcp_label, filename))
+    if prediction is None or (current_gcp_label, filename) in coordinates_dict:
+        return
+    x, y, radius = prediction
+    h, w = image_cache.shape(filename)
+    zoom_level = 1
+    while zoom_level < 8 and min(w, h) / (zoom_level * 2) >= 2 * radius:  # Max 8x zoom, keep the whole window visible
+        zoom_level *= 2
+    # Keep the zoomed view inside the image (points near the border are not centred)
+    zw, zh = w // zoom_level, h // zoom_level
+    zoom_center = (int(min(max(x, zw // 2), w - zw + zw // 2)), int(min(max(y, zh // 2), h - zh + zh // 2)))
+    needs_redraw = True
+
+def prefetch_neighbours():
+    # Decode the next images and the images queued for the current GCP label in the background
+    upcoming = [fname for fname in image_list[current_index + 1:] if is_queued(fname)][:PREFETCH_AHEAD]
+    if current_gcp_label is not None:
+        label_images = [fname for fname, gcp, _ in marking_queue if gcp == current_gcp_label and fname != image_list[current_index]]
+        upcoming += label_images[:PREFETCH_AHEAD]
+    prefetcher.prefetch(upcoming)
+
+def view_window(filename):
+    # Visible window (x1, y1, x2, y2) in image pixels, display size and display scale for the current zoom
+    h, w = image_cache.shape(filename)  # cached size, no decode on mouse events
     # Always use the same display size for mapping
     disp_w = int(w * SCALE_FACTOR)
     disp_h = int(h * SCALE_FACTOR)
@@ -144,80 +249,54 @@ def get_pixel_coordinates(event, x, y, flags, param):
         y1 = max(zy - zh // 2, 0)
         x2 = min(x1 + zw, w)
         y2 = min(y1 + zh, h)
-        crop_w, crop_h = x2 - x1, y2 - y1
-        scale_x = disp_w / crop_w
-        scale_y = disp_h / crop_h
-        # Mouse coordinates map to crop, then to image
-        img_x = int(x1 + min(max(int(x / scale_x), 0), crop_w - 1))
-        img_y = int(y1 + min(max(int(y / scale_y), 0), crop_h - 1))
-    else:
-        x1, y1 = 0, 0
-        x2, y2 = w, h
-        scale_x = SCALE_FACTOR
-        scale_y = SCALE_FACTOR
-        img_x = min(max(int(x / scale_x), 0), w - 1)
-        img_y = min(max(int(y / scale_y), 0), h - 1)
-    mouse_x, mouse_y = img_x, img_y
+        return (x1, y1, x2, y2), (disp_w, disp_h), disp_w / (x2 - x1), disp_h / (y2 - y1)
+    return (0, 0, w, h), (disp_w, disp_h), SCALE_FACTOR, SCALE_FACTOR
+
+def get_pixel_coordinates(event, x, y, flags, param):
+    global mouse_x, mouse_y, current_gcp_label, zoom_level, zoom_center, needs_redraw
+    filename = image_list[current_index]
+    (x1, y1, x2, y2), _, scale_x, scale_y = view_window(filename)
+    # Mouse coordinates map to the visible window, then to image
+    img_x = int(x1 + min(max(int(x / scale_x), 0), x2 - x1 - 1))
+    img_y = int(y1 + min(max(int(y / scale_y), 0), y2 - y1 - 1))
+    if (img_x, img_y) != (mouse_x, mouse_y):
+        mouse_x, mouse_y = img_x, img_y
+        needs_redraw = True  # cursor cross moved
     if event == cv2.EVENT_LBUTTONDOWN:
         if flags & cv2.EVENT_FLAG_CTRLKEY:
             zoom_level = min(zoom_level * 2, 8)  # Max 8x zoom
             zoom_center = (img_x, img_y)
-            display_image()
+            needs_redraw = True
             return
         if not current_gcp_label:
             print("No GCP Label selected. Press 'f' and enter a GCP Label before marking.")
             return
-        coordinates_dict[(current_gcp_label, filename)] = (img_x, img_y)
-        clicked_pos[(current_gcp_label, filename)] = (img_x, img_y)
+        set_mark(current_gcp_label, filename, img_x, img_y)
         print(f"Updated {filename} [{current_gcp_label}]: {img_x}, {img_y}")
-        display_image()  # Redraw to show permanent cross
+        needs_redraw = True  # Redraw to show permanent cross
 
 def draw_cross(img, x, y, color=(255, 0, 0), size=6, thickness=2):
     # x, y are in display (resized) coordinates
     cv2.line(img, (x - size, y), (x + size, y), color, thickness)
     cv2.line(img, (x, y - size), (x, y + size), color, thickness)
 
-def display_image():
-    global current_index, mouse_x, mouse_y, current_gcp_label, zoom_level, zoom_center
-    filename = image_list[current_index]
-    img_path = os.path.join(folder_path, filename)
-    image = cv2.imread(img_path)
-    h, w = image.shape[:2]
-    # Always display at fixed display size (full image at SCALE_FACTOR)
-    disp_w = int(w * SCALE_FACTOR)
-    disp_h = int(h * SCALE_FACTOR)
-    # Only apply zoom if zoom_level > 1 and zoom_center is set
-    if zoom_level > 1 and zoom_center is not None:
-        zx, zy = zoom_center
-        zh, zw = h // zoom_level, w // zoom_level
-        x1 = max(zx - zw // 2, 0)
-        y1 = max(zy - zh // 2, 0)
-        x2 = min(x1 + zw, w)
-        y2 = min(y1 + zh, h)
-        image_disp = image[y1:y2, x1:x2].copy()
-        # Resize the crop to the fixed display size
-        image_disp_resized = cv2.resize(image_disp, (disp_w, disp_h), interpolation=cv2.INTER_AREA)
-        crop_offset = (x1, y1)
-        crop_w, crop_h = x2 - x1, y2 - y1
-        scale_x = disp_w / crop_w
-        scale_y = disp_h / crop_h
-    else:
-        x1, y1 = 0, 0
-        x2, y2 = w, h
-        image_disp = image.copy()
-        image_disp_resized = cv2.resize(image_disp, (disp_w, disp_h), interpolation=cv2.INTER_AREA)
-        crop_offset = (0, 0)
-        scale_x = SCALE_FACTOR
-        scale_y = SCALE_FACTOR
-    # Draw permanent crosses for all GCPs marked for the current GCP label (across all images)
-    if current_gcp_label is not None:
-        for (gcp, fname), (cx, cy) in clicked_pos.items():
-            if gcp == current_gcp_label and x1 <= cx < x2 and y1 <= cy < y2:
-                # Draw at scaled position
-                draw_cross(image_disp_resized, int((cx - x1) * scale_x), int((cy - y1) * scale_y), color=(255, 0, 0), size=6, thickness=2)
-    # Draw temporary cross at mouse position (if visible)
-    if x1 <= mouse_x < x2 and y1 <= mouse_y < y2:
-        draw_cross(image_disp_resized, int((mouse_x - x1) * scale_x), int((mouse_y - y1) * scale_y), color=(0, 0, 255), size=6, thickness=1)
+def pending_seed(filename):
+    # Detected target of the current label on this image, while the pair is not marked yet
+    if current_gcp_label is None or (current_gcp_label, filename) in coordinates_dict:
+        return None
+    return detected_seeds.get((current_gcp_label, filename))
+
+def get_base_frame(filename):
+    # Resized image for the current zoom, cut from the image cache only when the image or zoom changed
+    key = (filename, zoom_level, zoom_center)
+    if base_frame_cache.get("key") != key:
+        window, disp_size, _, _ = view_window(filename)
+        base_frame_cache["key"] = key
+        base_frame_cache["frame"] = image_cache.view(filename, window, disp_size)
+    return base_frame_cache["frame"]
+
+def draw_text(overlay, filename, disp_w, disp_h, scale_x, gcp_count, seed_text):
+    # Filename, detected target hint, GCP count, directions, controls and current label boxes
     # Display filename at the top left
     font = cv2.FONT_HERSHEY_SIMPLEX
     font_scale = 1.0 * scale_x + 0.2  # Adjust font size for smaller image
@@ -226,18 +305,21 @@ def display_image():
     bg_color = (0, 0, 0)
     text = f"{filename}"
     (tw, th), _ = cv2.getTextSize(text, font, font_scale, font_thickness)
-    cv2.rectangle(image_disp_resized, (5, 5), (10 + tw, 10 + th), bg_color, -1)
-    cv2.putText(image_disp_resized, text, (10, 10 + th - 5), font, font_scale, text_color, font_thickness, cv2.LINE_AA)
+    cv2.rectangle(overlay, (5, 5), (10 + tw, 10 + th), bg_color, -1)
+    cv2.putText(overlay, text, (10, 10 + th - 5), font, font_scale, text_color, font_thickness, cv2.LINE_AA)
+    # Detected target waiting for confirmation, below the filename
+    if seed_text:
+        (sw, sh), _ = cv2.getTextSize(seed_text, font, 0.8 * scale_x + 0.1, font_thickness)
+        cv2.rectangle(overlay, (5, 15 + th), (10 + sw, 20 + th + sh), bg_color, -1)
+        cv2.putText(overlay, seed_text, (10, 15 + th + sh), font, 0.8 * scale_x + 0.1, (0, 255, 255), font_thickness, cv2.LINE_AA)
     # Display running GCP count for current label (unique images marked for this label)
     if current_gcp_label is not None:
-        unique_imgs = set(fname for (gcp, fname) in clicked_pos if gcp == current_gcp_label)
-        gcp_count = len(unique_imgs)
         gcp_text = f"Images marked for '{current_gcp_label}': {gcp_count}"
     else:
         gcp_text = "No GCP label selected."
     (gw, gh), _ = cv2.getTextSize(gcp_text, font, 0.8 * scale_x + 0.1, font_thickness)
-    cv2.rectangle(image_disp_resized, (5, disp_h - 10 - gh), (10 + gw, disp_h - 5), bg_color, -1)
-    cv2.putText(image_disp_resized, gcp_text, (10, disp_h - 10), font, 0.8 * scale_x + 0.1, text_color, font_thickness, cv2.LINE_AA)
+    cv2.rectangle(overlay, (5, disp_h - 10 - gh), (10 + gw, disp_h - 5), bg_color, -1)
+    cv2.putText(overlay, gcp_text, (10, disp_h - 10), font, 0.8 * scale_x + 0.1, text_color, font_thickness, cv2.LINE_AA)
     # Display directions at the bottom right
     directions_lines = [
         "Directions:",
@@ -255,16 +337,17 @@ def display_image():
     total_dir_height = dir_line_height * len(directions_lines)
     dx = disp_w - dir_width - 15
     dy = disp_h - total_dir_height - 15
-    cv2.rectangle(image_disp_resized, (dx - 5, dy - 5), (dx + dir_width + 5, dy + total_dir_height + 5), bg_color, -1)
+    cv2.rectangle(overlay, (dx - 5, dy - 5), (dx + dir_width + 5, dy + total_dir_height + 5), bg_color, -1)
     for i, line in enumerate(directions_lines):
         y = dy + dir_line_height * (i + 1) - 3
-        cv2.putText(image_disp_resized, line, (dx, y), font, dir_font_scale, dir_color, font_thickness, cv2.LINE_AA)
+        cv2.putText(overlay, line, (dx, y), font, dir_font_scale, dir_color, font_thickness, cv2.LINE_AA)
     # Display user controls at top right
     controls = [
         "Controls:",
         "f: Select GCP label",
         "n: Next image",
         "s: Search filename",
+        "a: Accept detected target",
         "e: Export CSV",
         "q: Quit",
         "r: Reset zoom"
@@ -276,17 +359,74 @@ def display_image():
         (cw, ch), _ = cv2.getTextSize(ctrl, font, ctrl_font_scale, font_thickness)
         x = disp_w - cw - 10
         y = y_offset + (ch + 5) * (i + 1)
-        cv2.putText(image_disp_resized, ctrl, (x, y), font, ctrl_font_scale, ctrl_color, font_thickness, cv2.LINE_AA)
+        cv2.putText(overlay, ctrl, (x, y), font, ctrl_font_scale, ctrl_color, font_thickness, cv2.LINE_AA)
     # Show current GCP label at the top center
     if current_gcp_label:
         gcp_label_text = f"Current GCP Label: {current_gcp_label}"
         (lw, lh), _ = cv2.getTextSize(gcp_label_text, font, 0.9 * scale_x + 0.1, font_thickness)
         lx = max(0, (disp_w - lw) // 2)
         ly = 30
-        cv2.rectangle(image_disp_resized, (lx - 5, ly - lh - 5), (lx + lw + 5, ly + 5), bg_color, -1)
-        cv2.putText(image_disp_resized, gcp_label_text, (lx, ly), font, 0.9 * scale_x + 0.1, (0, 255, 255), font_thickness, cv2.LINE_AA)
+        cv2.rectangle(overlay, (lx - 5, ly - lh - 5), (lx + lw + 5, ly + 5), bg_color, -1)
+        cv2.putText(overlay, gcp_label_text, (lx, ly), font, 0.9 * scale_x + 0.1, (0, 255, 255), font_thickness, cv2.LINE_AA)
+
+def render_text_overlay(filename, disp_w, disp_h, scale_x, gcp_count, seed_text):
+    # Text drawn once on black and once on white. Drawing (anti-aliased edges included) blends linearly with the
+    # pixels below, so for any image: drawn = on_black + image * (on_white - on_black) / 255
+    on_black = np.zeros((disp_h, disp_w, 3), dtype=np.uint8)
+    on_white = np.full((disp_h, disp_w, 3), 255, dtype=np.uint8)
+    draw_text(on_black, filename, disp_w, disp_h, scale_x, gcp_count, seed_text)
+    draw_text(on_white, filename, disp_w, disp_h, scale_x, gcp_count, seed_text)
+    # Opaque pixels (text boxes) are copied, only the anti-aliased edges over the image are blended
+    opaque = (on_black == on_white).all(axis=2)
+    blended = np.nonzero(~opaque & ((on_black != 0).any(axis=2) | (on_white != 255).any(axis=2)))
+    opaque = np.nonzero(opaque)
+    color = on_black[blended].astype(np.float32)
+    keep = (on_white[blended].astype(np.float32) - color) / 255
+    return opaque, on_black[opaque], blended, color, keep
+
+def get_text_overlay(filename, disp_w, disp_h, scale_x):
+    # Text layer, rendered again only when the image, zoom, label or marked image count changed
+    gcp_count = len(clicked_pos.get(current_gcp_label, {}))
+    seed = pending_seed(filename)
+    seed_text = f"Detected target ({seed[2]:.2f}): press 'a' to accept or click to correct" if seed else None
+    key = (filename, disp_w, disp_h, scale_x, current_gcp_label, gcp_count, seed_text)
+    if text_overlay_cache.get("key") != key:
+        text_overlay_cache["key"] = key
+        text_overlay_cache["layer"] = render_text_overlay(filename, disp_w, disp_h, scale_x, gcp_count, seed_text)
+    return text_overlay_cache["layer"]
+
+def display_image():
+    global needs_redraw
+    filename = image_list[current_index]
+    (x1, y1, x2, y2), (disp_w, disp_h), scale_x, scale_y = view_window(filename)
+    image_disp_resized = get_base_frame(filename).copy()
+    # Draw permanent crosses for all GCPs marked for the current GCP label (across all images)
+    if current_gcp_label is not None:
+        for fname, (cx, cy) in clicked_pos.get(current_gcp_label, {}).items():
+            if x1 <= cx < x2 and y1 <= cy < y2:
+                # Draw at scaled position
+                draw_cross(image_disp_resized, int((cx - x1) * scale_x), int((cy - y1) * scale_y), color=(255, 0, 0), size=6, thickness=2)
+    # Draw the predicted GCP window of the current label
+    prediction = predicted_windows.get((current_gcp_label, filename))
+    if prediction is not None:
+        px, py, radius = prediction
+        cv2.circle(image_disp_resized, (int((px - x1) * scale_x), int((py - y1) * scale_y)), max(int(radius * scale_x), 1), (255, 0, 255), 1)
+    # Draw detected target candidates of this image, the one pre-filled for the current label as a cross
+    for cx, cy, _ in detected_targets.get(filename, []):
+        if x1 <= cx < x2 and y1 <= cy < y2:
+            cv2.circle(image_disp_resized, (int((cx - x1) * scale_x), int((cy - y1) * scale_y)), 10, (0, 255, 255), 1)
+    seed = pending_seed(filename)
+    if seed and x1 <= seed[0] < x2 and y1 <= seed[1] < y2:
+        draw_cross(image_disp_resized, int((seed[0] - x1) * scale_x), int((seed[1] - y1) * scale_y), color=(0, 255, 255), size=8, thickness=2)
+    # Draw temporary cross at mouse position (if visible)
+    if x1 <= mouse_x < x2 and y1 <= mouse_y < y2:
+        draw_cross(image_disp_resized, int((mouse_x - x1) * scale_x), int((mouse_y - y1) * scale_y), color=(0, 0, 255), size=6, thickness=1)
+    # Composite the cached text layer on top
+    opaque, text, blended, color, keep = get_text_overlay(filename, disp_w, disp_h, scale_x)
+    image_disp_resized[blended] = (image_disp_resized[blended] * keep + color + 0.5).astype(np.uint8)
+    image_disp_resized[opaque] = text
     cv2.imshow("Image Viewer", image_disp_resized)
-    cv2.setMouseCallback("Image Viewer", get_pixel_coordinates)
+    needs_redraw = False
 
 def export_coordinates():
     # For each GCP label, require it is marked on more than 1 image
@@ -302,56 +442,26 @@ def export_coordinates():
         print("Please mark each GCP label on at least two images.")
         return
     if gcp_input_df is not None:
-        gcp_df = gcp_input_df.copy()
-        gcp_label_col = gcp_input_df.attrs.get('gcp_label_col', None)
-        if gcp_label_col is None:
+        if exporter.gcp_label_col is None:
             print("No GCP label column specified in input CSV.")
-            print(f"Available columns: {list(gcp_df.columns)}")
+            print(f"Available columns: {list(gcp_input_df.columns)}")
             print("Exporting only pixel coordinates.")
-            df = pd.DataFrame([
-                (g, f, x, y) for (g, f), (x, y) in coordinates_dict.items()
-            ], columns=[gcp_label_col or "GCP Label", "Filename", "X", "Y"])
-            df.to_csv("pixel_coordinates.csv", index=False)
-            print("Final coordinates saved to pixel_coordinates.csv")
+            exporter.export_coordinates(coordinates_dict)
             return
-        filename_col = gcp_input_df.attrs.get('filename_col', None)
-        # If a Filename column exists, merge on both, else merge on GCP label and all images
-        if filename_col:
-            all_pairs = pd.DataFrame([
-                (row[gcp_label_col], row[filename_col]) for _, row in gcp_df.iterrows() if row[filename_col] in image_list
-            ], columns=[gcp_label_col, filename_col])
-        else:
-            all_pairs = pd.DataFrame([
-                (gcp_label, fname) for gcp_label in gcp_df[gcp_label_col].unique() for fname in image_list
-            ], columns=[gcp_label_col, "Filename"])
-        # Merge with input GCP data (on GCP label and filename if present)
-        if filename_col:
-            merged = pd.merge(all_pairs, gcp_df, on=[gcp_label_col, filename_col], how="left")
-        else:
-            merged = pd.merge(all_pairs, gcp_df, on=[gcp_label_col], how="left")
-        # Merge with marked coordinates (on GCP label and filename)
-        coords_df = pd.DataFrame([
-            (g, f, x, y) for (g, f), (x, y) in coordinates_dict.items()
-        ], columns=[gcp_label_col, "Filename", "X", "Y"])
-        if filename_col:
-            merged = pd.merge(merged, coords_df, left_on=[gcp_label_col, filename_col], right_on=[gcp_label_col, "Filename"], how="left")
-            merged = merged.drop(columns=["Filename"], errors='ignore')
-        else:
-            merged = pd.merge(merged, coords_df, on=[gcp_label_col, "Filename"], how="left")
-        merged.to_csv("pixel_coordinates_merged.csv", index=False)
-        print("Merged coordinates saved to pixel_coordinates_merged.csv")
+        # Every pair of the input CSV with its marked coordinates, plus the ODM gcp_list.txt
+        exporter.export_merged(coordinates_dict)
+        exporter.export_odm(coordinates_dict)
     else:
-        df = pd.DataFrame([
-            (g, f, x, y) for (g, f), (x, y) in coordinates_dict.items()
-        ], columns=["GCP Label", "Filename", "X", "Y"])
-        df.to_csv("pixel_coordinates.csv", index=False)
-        print("Final coordinates saved to pixel_coordinates.csv")
+        exporter.export_coordinates(coordinates_dict)
 
 cv2.namedWindow("Image Viewer")
 cv2.setMouseCallback("Image Viewer", get_pixel_coordinates)
+auto_zoom()
+prefetch_neighbours()
 
 while True:
-    display_image()
+    if needs_redraw:
+        display_image()
     key = cv2.waitKey(20) & 0xFF
     if key == ord('f'):
         # Prompt user to enter/select GCP Label, showing available unique values using easygui
@@ -382,15 +492,32 @@ while True:
             print(f"Label '{new_label}' not found in input file. Valid labels: {label_list}")
             continue
         current_gcp_label = new_label
+        needs_redraw = True
         print(f"Now marking for GCP Label: {current_gcp_label}")
+        auto_zoom()
+        prefetch_neighbours()
+    elif key == ord('a'):
+        # Accept the detected target for the current label
+        filename = image_list[current_index]
+        seed = pending_seed(filename)
+        if seed is None:
+            print(f"No detected target to accept on {filename} for GCP Label: {current_gcp_label}")
+            continue
+        set_mark(current_gcp_label, filename, seed[0], seed[1])
+        needs_redraw = True
+        print(f"Accepted detected target on {filename} [{current_gcp_label}]: {seed[0]}, {seed[1]} (confidence {seed[2]})")
     elif key == ord('r'):
         zoom_level = 1
         zoom_center = None
-        display_image()
+        needs_redraw = True
     elif key == ord('n'):
-        # Move to next image
-        if current_index < len(image_list) - 1:
-            current_index += 1
+        # Move to next image (skipping images outside the GCP footprint)
+        next_index = next((i for i in range(current_index + 1, len(image_list)) if is_queued(image_list[i])), None)
+        if next_index is not None:
+            current_index = next_index
+            needs_redraw = True
+            auto_zoom()
+            prefetch_neighbours()
         else:
             print("End of image list.")
     elif key == ord('s'):
@@ -402,6 +529,9 @@ while True:
             continue
         if search_name in image_list:
             current_index = image_list.index(search_name)
+            needs_redraw = True
+            auto_zoom()
+            prefetch_neighbours()
         else:
             print("File not found.")
     elif key == ord('q'):
@@ -409,4 +539,6 @@ while True:
     elif key == ord('e'):
         export_coordinates()
 
+prefetcher.close()
+journal.close()
 cv2.destroyAllWindows()
\ No newline at end of file
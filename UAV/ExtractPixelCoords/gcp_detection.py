@@ -0,0 +1,180 @@
+"""
+========================================================================================
+    Automatic GCP Target Detection for the GCP Pixel Marking Viewer (extract_img_coords.py)
+========================================================================================
+    Finds candidate positions of checkerboard / X ground control point targets in drone photos,
+    so the marking viewer only has to confirm or correct them instead of marking every pair by hand.
+
+    - Each photo is decoded at 1/4 resolution (IMREAD_REDUCED_GRAYSCALE_4) and matched against synthetic
+      2x2 checker templates at several sizes and rotations (normalized cross correlation, both polarities)
+    - Only high contrast spots count (grey level standard deviation under the template of at least MIN_CONTRAST),
+      normalized correlation alone also scores the saddles of smooth, low contrast ground
+    - Local maxima above the minimum score are the candidates, the score is the confidence (0 - 1)
+    - Candidates are refined to sub-pixel accuracy on the full resolution image (cornerSubPix on the target centre)
+    - Photos are processed in parallel in a process pool, results are written to a CSV next to the photos
+
+    USAGE:
+        python gcp_detection.py "C:/Flights/2024_05_01/images" --workers 8
+
+    OUTPUT CSV FORMAT (gcp_candidates.csv in the image folder):
+    -----------------------------------------------------------
+    Filename        Rank    X         Y         Confidence
+    DJI_0104.JPG    1       1196.42   182.77    0.91
+ """
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+import pandas as pd
+
+CANDIDATES_FILE = "gcp_candidates.csv"
+IMAGE_EXTENSIONS = ('.jpg', '.png', '.jpeg')
+DETECT_FLAG = cv2.IMREAD_REDUCED_GRAYSCALE_4
+DETECT_SCALE = 0.25
+TEMPLATE_SIZES = (12, 18, 26, 36)  # target width in pixels at DETECT_SCALE
+TEMPLATE_ANGLES = tuple(np.arange(0, 90, 7.5))  # a checker rotated by 90 degrees is the same target with inverted colours
+MIN_CONFIDENCE = 0.75  # smooth ground (saddles of the shading) scores up to about 0.85, printed targets above 0.9
+MIN_CONTRAST = 40  # grey level standard deviation under the template, black/white targets are around 100
+MAX_CANDIDATES = 5
+
+
+def checker_template(size, angle):
+    """2x2 checker of size x size pixels rotated by angle degrees, values -1 / 1"""
+    c = (size - 1) / 2
+    y, x = np.mgrid[0:size, 0:size] - c
+    t = np.deg2rad(angle)
+    u = x * np.cos(t) + y * np.sin(t)
+    v = -x * np.sin(t) + y * np.cos(t)
+    return np.sign(u * v).astype(np.float32)
+
+
+def score_map(gray, sizes=TEMPLATE_SIZES, angles=TEMPLATE_ANGLES, min_contrast=MIN_CONTRAST):
+    """Best absolute template correlation of every pixel, taken as the target centre (0 where the contrast is too low)"""
+    scores = np.zeros(gray.shape, dtype=np.float32)
+    gray = gray.astype(np.float32)
+    for size in sizes:
+        if size > min(gray.shape):
+            continue
+        offset = size // 2
+        # standard deviation under the template, centred like the correlation below
+        mean = cv2.boxFilter(gray, -1, (size, size))
+        std = np.sqrt(np.maximum(cv2.boxFilter(gray * gray, -1, (size, size)) - mean * mean, 0))
+        for angle in angles:
+            res = np.abs(cv2.matchTemplate(gray, checker_template(size, angle), cv2.TM_CCOEFF_NORMED))
+            res[std[offset:offset + res.shape[0], offset:offset + res.shape[1]] < min_contrast] = 0
+            view = scores[offset:offset + res.shape[0], offset:offset + res.shape[1]]
+            np.maximum(view, res, out=view)
+    return scores
+
+
+def find_peaks(scores, min_confidence=MIN_CONFIDENCE, max_candidates=MAX_CANDIDATES, spacing=max(TEMPLATE_SIZES)):
+    """Local maxima of the score map, at least spacing pixels apart, best first: [(x, y, score)]"""
+    local_max = scores == cv2.dilate(scores, np.ones((spacing, spacing), np.uint8))
+    ys, xs = np.nonzero(local_max & (scores >= min_confidence))
+    order = np.argsort(-scores[ys, xs])
+    peaks = []
+    for i in order:
+        if all(abs(xs[i] - px) >= spacing or abs(ys[i] - py) >= spacing for px, py, _ in peaks): # plateaus give several maxima
+            peaks.append((int(xs[i]), int(ys[i]), float(scores[ys[i], xs[i]])))
+            if len(peaks) == max_candidates:
+                break
+    return peaks
+
+
+def refine_corners(path, points, window):
+    """Sub-pixel target centres on the full resolution image, points that do not converge keep their position"""
+    gray = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+    if gray is None or not points:
+        return points
+    corners = np.array(points, dtype=np.float32).reshape(-1, 1, 2)
+    refined = cv2.cornerSubPix(gray, corners.copy(), (window, window), (-1, -1),
+                               (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 40, 0.01))
+    moved = np.linalg.norm(refined - corners, axis=2).ravel()
+    return [tuple(r[0]) if m <= window else p for r, p, m in zip(refined.astype(float), points, moved)]
+
+
+def detect_targets(path, min_confidence=MIN_CONFIDENCE, max_candidates=MAX_CANDIDATES, refine=True):
+    """Candidate GCP target centres in one photo
+
+    Args:
+        path (str): Image path
+        min_confidence (float, optional): Minimum correlation score (0 - 1). Defaults to 0.75
+        max_candidates (int, optional): Maximum candidates returned. Defaults to 5
+        refine (bool, optional): Refine the centres on the full resolution image. Defaults to True
+
+    Returns:
+        list: [(x, y, confidence)] in full resolution pixels, best first
+    """
+    gray = cv2.imread(path, DETECT_FLAG)
+    if gray is None:
+        print(f"Could not read image: {path}")
+        return []
+    peaks = find_peaks(score_map(gray), min_confidence, max_candidates)
+    # centre of the reduced pixel in full resolution pixels
+    points = [((x + 0.5) / DETECT_SCALE - 0.5, (y + 0.5) / DETECT_SCALE - 0.5) for x, y, _ in peaks]
+    if refine:
+        points = refine_corners(path, points, window=int(min(TEMPLATE_SIZES) / DETECT_SCALE / 4))
+    return [(round(float(x), 2), round(float(y), 2), round(score, 3)) for (x, y), (_, _, score) in zip(points, peaks)]
+
+
+def _init_worker():
+    cv2.setNumThreads(1)  # one image per process, do not oversubscribe the cores
+
+
+def _detect_file(args):
+    folder, filename, min_confidence, max_candidates = args
+    return filename, detect_targets(os.path.join(folder, filename), min_confidence, max_candidates)
+
+
+def detect_folder(folder, filenames=None, workers=None, min_confidence=MIN_CONFIDENCE, max_candidates=MAX_CANDIDATES):
+    """Detect GCP targets in the photos of a folder in a process pool
+
+    Args:
+        folder (str): Image folder
+        filenames (list, optional): Photos to process. Defaults to all images in the folder
+        workers (int, optional): Worker processes. Defaults to the number of CPUs
+        min_confidence (float, optional): Minimum correlation score (0 - 1). Defaults to 0.75
+        max_candidates (int, optional): Maximum candidates per photo. Defaults to 5
+
+    Returns:
+        pd.DataFrame: Filename, Rank, X, Y, Confidence (one row per candidate)
+    """
+    if filenames is None:
+        filenames = sorted(f for f in os.listdir(folder) if f.lower().endswith(IMAGE_EXTENSIONS))
+    rows = []
+    start = time.time()
+    tasks = [(folder, f, min_confidence, max_candidates) for f in filenames]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        for i, (filename, candidates) in enumerate(pool.map(_detect_file, tasks, chunksize=4), start=1):
+            rows.extend((filename, rank, x, y, conf) for rank, (x, y, conf) in enumerate(candidates, start=1))
+            if i % 50 == 0 or i == len(tasks):
+                print(f"Detected targets in {i}/{len(tasks)} images ({time.time() - start:.1f}s)")
+    return pd.DataFrame(rows, columns=["Filename", "Rank", "X", "Y", "Confidence"])
+
+
+def load_candidates(csv_path):
+    """Candidates CSV as {filename: [(x, y, confidence)]}, best first"""
+    df = pd.read_csv(csv_path).sort_values(["Filename", "Rank"])
+    return {filename: list(zip(group["X"], group["Y"], group["Confidence"])) for filename, group in df.groupby("Filename")}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detect GCP targets in drone photos and write candidate pixel coordinates")
+    parser.add_argument("folder", help="Folder containing the photos")
+    parser.add_argument("--output", help=f"Output CSV (default: {CANDIDATES_FILE} in the photo folder)")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: number of CPUs)")
+    parser.add_argument("--min-confidence", type=float, default=MIN_CONFIDENCE, help="Minimum correlation score 0 - 1")
+    parser.add_argument("--max-candidates", type=int, default=MAX_CANDIDATES, help="Maximum candidates per photo")
+    args = parser.parse_args()
+    output = args.output or os.path.join(args.folder, CANDIDATES_FILE)
+    df = detect_folder(args.folder, workers=args.workers, min_confidence=args.min_confidence, max_candidates=args.max_candidates)
+    df.to_csv(output, index=False)
+    print(f"{len(df)} candidates in {df['Filename'].nunique()} images saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+========================================================================================
+    GCP Pair Building and Coordinate Export for the GCP Pixel Marking Viewer (extract_img_coords.py)
+========================================================================================
+    Builds the (image, GCP label) marking pairs and writes the marked pixel coordinates, without
+    iterating over DataFrame rows.
+
+    - Pairs come from boolean masks (Filename column in the GCP CSV) or a label x image cross product built with
+      numpy repeat/tile
+    - The merged export table (every pair with its GCP input columns) is built and formatted as CSV text once,
+      each export joins the marked coordinates on the (GCP label, filename) index and only formats their X/Y
+    - pixel_coordinates.csv and the ODM gcp_list.txt are written incrementally: an export appends the pairs marked
+      since the previous one, and rewrites the file only when an exported pair was moved or the file was changed
+    - gcp_list.txt lines are streamed straight from the marked coordinates and the GCP Easting/Northing/Elevation
+
+    ODM gcp_list.txt FORMAT:
+    ------------------------
+    WGS84 UTM 15N
+    472946.1849 4953066.3993 243.503 1196 182 DJI_0104.JPG POINT_01
+ """
+
+import csv
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+MERGED_FILE = "pixel_coordinates_merged.csv"
+COORDINATES_FILE = "pixel_coordinates.csv"
+ODM_GCP_FILE = "gcp_list.txt"
+
+
+def build_pairs(gcp_df, gcp_label_col, filename_col, image_list):
+    """(filename, gcp_label) pairs to mark: the rows of the Filename column, else every label on every image"""
+    if filename_col:
+        labels, fnames = gcp_df[gcp_label_col], gcp_df[filename_col]
+        keep = labels.notna() & fnames.notna() & fnames.isin(set(image_list))
+        return list(zip(fnames[keep], labels[keep]))
+    gcp_labels = gcp_df[gcp_label_col].dropna().unique()
+    return list(zip(np.repeat(image_list, len(gcp_labels)).tolist(), np.tile(gcp_labels, len(image_list)).tolist()))
+
+
+def build_merged_base(gcp_df, gcp_label_col, filename_col, image_list):
+    """Rows of the merged export without coordinates: every pair with its GCP input columns, pair keys first
+
+    Returns:
+        tuple: (pd.DataFrame, [gcp label column, filename column])
+    """
+    if filename_col:
+        base = gcp_df[gcp_df[filename_col].isin(set(image_list))].reset_index(drop=True)
+        keys = [gcp_label_col, filename_col]
+    else:
+        # each label's GCP rows repeated for every image, labels in order of appearance
+        codes, _ = pd.factorize(gcp_df[gcp_label_col], use_na_sentinel=False)
+        order = np.argsort(codes, kind="stable")
+        bounds = np.concatenate([[0], np.cumsum(np.bincount(codes))]) if len(codes) else [0]
+        positions, fnames = [], []
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            positions.append(np.tile(order[start:end], len(image_list)))
+            fnames.append(np.repeat(np.asarray(image_list, dtype=object), end - start))
+        base = gcp_df.iloc[np.concatenate(positions) if positions else []].reset_index(drop=True)
+        base.insert(0, "Filename", np.concatenate(fnames) if fnames else [])
+        keys = [gcp_label_col, "Filename"]
+    return base[keys + [c for c in base.columns if c not in keys]], keys
+
+
+def csv_line(values):
+    """One CSV line formatted like DataFrame.to_csv"""
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator=os.linesep).writerow(values)
+    return buffer.getvalue()
+
+
+class IncrementalWriter:
+    """Text file of the marked coordinates that only appends the pairs marked since the last write
+
+    Args:
+        path (str): Output file
+        header (str): First line(s) of the file, with line ending
+        format_line (callable): (gcp_label, filename, x, y) -> line with line ending, None to leave the pair out
+    """
+    def __init__(self, path, header, format_line):
+        self.path = path
+        self.header = header
+        self.format_line = format_line
+        self.exported = {}
+        self.size = None
+
+    def write(self, coordinates_dict):
+        """Write {(gcp_label, filename): (x, y)}, returns (lines written, True when the file was rewritten)"""
+        moved = any(coordinates_dict.get(key) != xy for key, xy in self.exported.items())
+        rewrite = moved or not os.path.exists(self.path) or os.path.getsize(self.path) != self.size
+        items = coordinates_dict.items() if rewrite else ((k, xy) for k, xy in coordinates_dict.items() if k not in self.exported)
+        written = 0
+        with open(self.path, "w" if rewrite else "a", newline="") as f:
+            if rewrite:
+                f.write(self.header)
+            for (gcp_label, filename), (x, y) in items:
+                line = self.format_line(gcp_label, filename, x, y)
+                if line is not None:
+                    f.write(line)
+                    written += 1
+        self.exported = dict(coordinates_dict)
+        self.size = os.path.getsize(self.path)
+        return written, rewrite
+
+
+class CoordinateExporter:
+    """Exports of the marking viewer, kept between exports so each one only handles what changed
+
+    Args:
+        gcp_df (pd.DataFrame, optional): GCP input CSV. Defaults to None (pixel coordinates only)
+        gcp_label_col (str, optional): GCP label column of gcp_df. Defaults to None
+        filename_col (str, optional): Filename column of gcp_df. Defaults to None (every label on every image)
+        image_list (list, optional): Images of the folder. Defaults to None
+        gcp_points (dict, optional): {gcp_label: (easting, northing, elevation)} for gcp_list.txt. Defaults to None
+        projection (str, optional): First line of gcp_list.txt, e.g. "WGS84 UTM 15N". Defaults to None (no gcp_list.txt)
+    """
+    def __init__(self, gcp_df=None, gcp_label_col=None, filename_col=None, image_list=None, gcp_points=None, projection=None):
+        self.gcp_df = gcp_df
+        self.gcp_label_col = gcp_label_col
+        self.filename_col = filename_col
+        self.image_list = list(image_list or [])
+        self.gcp_points = gcp_points or {}
+        self.merged_base = None
+        self.merged_lines = None
+        self.coordinates_writer = IncrementalWriter(
+            COORDINATES_FILE, csv_line([gcp_label_col or "GCP Label", "Filename", "X", "Y"]),
+            lambda g, f, x, y: csv_line([g, f, x, y]))
+        self.odm_writer = None
+        if projection and self.gcp_points:
+            self.odm_writer = IncrementalWriter(ODM_GCP_FILE, projection + "\n", self._odm_line)
+
+    def _odm_line(self, gcp_label, filename, x, y):
+        point = self.gcp_points.get(gcp_label)
+        if point is None or point[2] is None:
+            return None
+        return f"{point[0]} {point[1]} {point[2]} {x} {y} {filename} {gcp_label}\n"
+
+    def _merged_lines(self):
+        """CSV lines of the merged table without X/Y, formatted once (None when a value spans several lines)"""
+        base, _ = self.merged_base
+        text = base.to_csv(index=False, lineterminator="\n")
+        lines = text.split("\n")[:-1]
+        return lines if len(lines) == len(base) + 1 else None
+
+    def export_merged(self, coordinates_dict):
+        """Every pair of the GCP CSV with its marked X/Y (empty when not marked) to pixel_coordinates_merged.csv"""
+        if self.merged_base is None:
+            self.merged_base = build_merged_base(self.gcp_df, self.gcp_label_col, self.filename_col, self.image_list)
+            self.merged_lines = self._merged_lines()
+        base, keys = self.merged_base
+        coords = pd.DataFrame(list(coordinates_dict.values()), columns=["X", "Y"],
+                              index=pd.MultiIndex.from_tuples(list(coordinates_dict.keys()), names=keys) if coordinates_dict
+                              else pd.MultiIndex.from_arrays([[], []], names=keys))
+        merged = base.join(coords, on=keys)
+        marked = np.flatnonzero(merged["X"].notna().to_numpy())
+        if self.merged_lines is None or len(marked) == len(merged):
+            merged.to_csv(MERGED_FILE, index=False)  # no empty X/Y: let pandas pick the number format
+        else:
+            # rows with empty X/Y make the columns float, formatted like to_csv does (repr)
+            suffixes = np.full(len(merged), ",,", dtype=object)
+            suffixes[marked] = [f",{x!r},{y!r}" for x, y in zip(merged["X"].to_numpy()[marked].tolist(), merged["Y"].to_numpy()[marked].tolist())]
+            lines = self.merged_lines
+            with open(MERGED_FILE, "w", newline="") as f:
+                f.write(lines[0] + ",X,Y" + os.linesep)
+                f.writelines(line + suffix + os.linesep for line, suffix in zip(lines[1:], suffixes))
+        print(f"Merged coordinates saved to {MERGED_FILE}")
+
+    def export_coordinates(self, coordinates_dict):
+        """Marked pairs to pixel_coordinates.csv, appending the pairs marked since the last export"""
+        written, rewrite = self.coordinates_writer.write(coordinates_dict)
+        print(f"Final coordinates saved to {COORDINATES_FILE} ({written} {'rows written' if rewrite else 'new rows appended'})")
+
+    def export_odm(self, coordinates_dict):
+        """Marked pairs with GCP coordinates to the ODM gcp_list.txt, appending the pairs marked since the last export"""
+        if self.odm_writer is None:
+            return
+        written, rewrite = self.odm_writer.write(coordinates_dict)
+        skipped = sum(self.gcp_points.get(g, (None, None, None))[2] is None for g, _ in coordinates_dict)
+        print(f"ODM GCP file saved to {ODM_GCP_FILE} ({written} {'lines written' if rewrite else 'new lines appended'}"
+              f"{f', {skipped} marks without GCP coordinates left out' if skipped else ''})")
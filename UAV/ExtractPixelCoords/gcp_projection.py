@@ -0,0 +1,237 @@
+"""
+========================================================================================
+    GCP Projection from Camera EXIF Pose for the GCP Pixel Marking Viewer (extract_img_coords.py)
+========================================================================================
+    Predicts where each ground control point appears in each drone photo, so the viewer can skip
+    (image, GCP label) pairs whose point is outside the photo and zoom straight to the predicted spot.
+
+    - The camera position (GPS latitude/longitude/altitude), focal length (35 mm equivalent) and the DJI XMP gimbal
+      yaw/pitch and relative altitude are read from the JPEG header, no EXIF library or pixel decode needed
+    - The camera position is converted to UTM (WGS84) to match the Easting/Northing of the GCP CSV
+    - Nadir pinhole model: a ground point at distance (dE, dN) from the camera, height H below it, is
+      f/H * (dE, dN) pixels from the image centre, rotated by the gimbal yaw
+    - The flying height is the relative altitude (above the take off point) when recorded, else the GPS altitude
+      minus the GCP elevation (the two are often in different vertical datums, the relative altitude is safer)
+    - Every prediction has an uncertainty radius (GPS error, yaw error, altitude error), pairs are only dropped when
+      the point is outside the photo by more than that radius
+    - Oblique photos (gimbal pitch more than MAX_OFF_NADIR from straight down) and photos without a usable pose are kept
+
+    USAGE:
+        pose = read_pose("C:/Flights/images/DJI_0104.JPG")
+        x, y, radius = predict_pixel(pose, 472946.18, 4953066.40, 243.50)
+ """
+
+import math
+import os
+import re
+import struct
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from image_cache import read_image_size
+
+POSITION_ERROR_M = 5.0  # camera GPS error (consumer drones, no RTK)
+YAW_ERROR_DEG = 3.0
+ALTITUDE_ERROR = 0.1  # fraction of the flying height (terrain relief, barometer drift)
+MAX_OFF_NADIR_DEG = 15.0
+FULL_FRAME_DIAGONAL_MM = 43.27
+
+CameraPose = namedtuple("CameraPose", ["easting", "northing", "zone", "altitude", "relative_altitude", "yaw", "pitch",
+                                       "focal_px", "width", "height"])
+
+
+# ---------------- EXIF / XMP header reading ---------------- #
+
+_TIFF_TYPES = {1: ("B", 1), 2: ("s", 1), 3: ("H", 2), 4: ("I", 4), 5: ("II", 8), 7: ("B", 1), 9: ("i", 4), 10: ("ii", 8)}
+_XMP_VALUE = re.compile(r'drone-dji:(\w+)(?:="([^"]*)"|>([^<]*)<)')
+
+
+def _jpeg_app1_segments(path):
+    """Payloads of the APP1 segments (EXIF and XMP) of a JPEG, read up to the image data"""
+    segments = []
+    with open(path, "rb") as f:
+        if f.read(2) != b"\xff\xd8":
+            return segments
+        while True:
+            marker = f.read(2)
+            if len(marker) < 2 or marker[0] != 0xFF or marker[1] in (0xDA, 0xD9): # start of scan: headers are done
+                return segments
+            length = struct.unpack(">H", f.read(2))[0]
+            if marker[1] == 0xE1:
+                segments.append(f.read(length - 2))
+            else:
+                f.seek(length - 2, 1)
+
+
+def _read_ifd(tiff, offset, endian):
+    """Tags of one TIFF image file directory as {tag: value}, rationals as floats"""
+    tags = {}
+    count = struct.unpack_from(endian + "H", tiff, offset)[0]
+    for i in range(count):
+        tag, typ, n, value_offset = struct.unpack_from(endian + "HHII", tiff, offset + 2 + 12 * i)
+        if typ not in _TIFF_TYPES:
+            continue
+        fmt, size = _TIFF_TYPES[typ]
+        start = offset + 10 + 12 * i if size * n <= 4 else value_offset
+        if start + size * n > len(tiff):
+            continue
+        if typ == 2:
+            tags[tag] = tiff[start:start + n].rstrip(b"\x00").decode("ascii", "replace")
+        elif typ in (5, 10):
+            raw = struct.unpack_from(endian + fmt[0] * (2 * n), tiff, start)
+            values = [num / den if den else 0.0 for num, den in zip(raw[::2], raw[1::2])]
+            tags[tag] = values[0] if n == 1 else values
+        else:
+            values = struct.unpack_from(endian + fmt * n, tiff, start)
+            tags[tag] = values[0] if n == 1 else values
+    return tags
+
+
+def read_metadata(path):
+    """EXIF GPS/camera tags and DJI XMP values of a JPEG
+
+    Returns:
+        dict: latitude, longitude, altitude, focal_35mm and the drone-dji XMP values (e.g. RelativeAltitude,
+            GimbalYawDegree) that are present
+    """
+    meta = {}
+    for data in _jpeg_app1_segments(path):
+        if data.startswith(b"Exif\x00\x00"):
+            tiff = data[6:]
+            endian = "<" if tiff[:2] == b"II" else ">"
+            ifd0 = _read_ifd(tiff, struct.unpack_from(endian + "I", tiff, 4)[0], endian)
+            exif = _read_ifd(tiff, ifd0[0x8769], endian) if 0x8769 in ifd0 else {}
+            gps = _read_ifd(tiff, ifd0[0x8825], endian) if 0x8825 in ifd0 else {}
+            if 2 in gps and 4 in gps:
+                lat = gps[2][0] + gps[2][1] / 60 + gps[2][2] / 3600
+                lon = gps[4][0] + gps[4][1] / 60 + gps[4][2] / 3600
+                meta["latitude"] = -lat if gps.get(1) == "S" else lat
+                meta["longitude"] = -lon if gps.get(3) == "W" else lon
+            if 6 in gps:
+                meta["altitude"] = -gps[6] if gps.get(5) in (1, b"\x01") else gps[6]
+            if 0xA405 in exif:
+                meta["focal_35mm"] = float(exif[0xA405])
+        elif b"drone-dji:" in data:
+            for name, attribute, element in _XMP_VALUE.findall(data.decode("utf-8", "replace")):
+                try:
+                    meta[name] = float(attribute or element)
+                except ValueError:
+                    pass
+    return meta
+
+
+# ---------------- Coordinates and projection ---------------- #
+
+def latlon_to_utm(lat, lon, zone=None):
+    """WGS84 latitude/longitude to UTM (easting, northing, zone), zone from the longitude unless given"""
+    if zone is None:
+        zone = int((lon + 180) // 6) + 1
+    a, f, k0 = 6378137.0, 1 / 298.257223563, 0.9996
+    e2 = f * (2 - f)
+    ep2 = e2 / (1 - e2)
+    phi = math.radians(lat)
+    lam = math.radians(lon - (zone * 6 - 183))
+    n = a / math.sqrt(1 - e2 * math.sin(phi) ** 2)
+    t = math.tan(phi) ** 2
+    c = ep2 * math.cos(phi) ** 2
+    A = lam * math.cos(phi)
+    m = a * ((1 - e2 / 4 - 3 * e2 ** 2 / 64 - 5 * e2 ** 3 / 256) * phi
+             - (3 * e2 / 8 + 3 * e2 ** 2 / 32 + 45 * e2 ** 3 / 1024) * math.sin(2 * phi)
+             + (15 * e2 ** 2 / 256 + 45 * e2 ** 3 / 1024) * math.sin(4 * phi)
+             - (35 * e2 ** 3 / 3072) * math.sin(6 * phi))
+    easting = 500000 + k0 * n * (A + (1 - t + c) * A ** 3 / 6 + (5 - 18 * t + t ** 2 + 72 * c - 58 * ep2) * A ** 5 / 120)
+    northing = k0 * (m + n * math.tan(phi) * (A ** 2 / 2 + (5 - t + 9 * c + 4 * c ** 2) * A ** 4 / 24
+                                             + (61 - 58 * t + t ** 2 + 600 * c - 330 * ep2) * A ** 6 / 720))
+    if lat < 0:
+        northing += 10000000
+    return easting, northing, zone
+
+
+def utm_projection(folder, filenames, zone=None):
+    """UTM zone of the survey as an ODM projection string ("WGS84 UTM 15N") from the first photo with GPS, None without"""
+    for filename in filenames:
+        meta = read_metadata(os.path.join(folder, filename))
+        if "latitude" in meta:
+            zone = zone or latlon_to_utm(meta["latitude"], meta["longitude"])[2]
+            return f"WGS84 UTM {zone}{'N' if meta['latitude'] >= 0 else 'S'}"
+    return None
+
+
+def read_pose(path, zone=None):
+    """Camera pose of a photo from its header, None without GPS position or focal length"""
+    meta = read_metadata(path)
+    size = read_image_size(path)
+    if "latitude" not in meta or "focal_35mm" not in meta or size is None:
+        return None
+    height, width = size
+    easting, northing, zone = latlon_to_utm(meta["latitude"], meta["longitude"], zone)
+    return CameraPose(easting, northing, zone, meta.get("altitude"), meta.get("RelativeAltitude"),
+                      meta.get("GimbalYawDegree", meta.get("FlightYawDegree")), meta.get("GimbalPitchDegree"),
+                      meta["focal_35mm"] * math.hypot(width, height) / FULL_FRAME_DIAGONAL_MM, width, height)
+
+
+def predict_pixel(pose, easting, northing, elevation=None):
+    """Approximate pixel position of a ground point in a nadir photo
+
+    Args:
+        pose (CameraPose): Camera pose from read_pose
+        easting (float): Point easting, same UTM zone as the pose
+        northing (float): Point northing
+        elevation (float, optional): Point elevation, only used without relative altitude. Defaults to None
+
+    Returns:
+        tuple: (x, y, radius) in full resolution pixels, radius is the uncertainty of the prediction.
+            None for oblique photos or when the heading or flying height is unknown
+    """
+    if pose.yaw is None or (pose.pitch is not None and abs(pose.pitch + 90) > MAX_OFF_NADIR_DEG):
+        return None
+    if pose.relative_altitude is not None and pose.relative_altitude > 0:
+        flying_height = pose.relative_altitude
+    elif pose.altitude is not None and elevation is not None and pose.altitude > elevation:
+        flying_height = pose.altitude - elevation
+    else:
+        return None
+    de, dn = easting - pose.easting, northing - pose.northing
+    scale = pose.focal_px / flying_height  # pixels per metre on the ground
+    yaw = math.radians(pose.yaw)  # heading of the top of the image, clockwise from north
+    x = pose.width / 2 + (de * math.cos(yaw) - dn * math.sin(yaw)) * scale
+    y = pose.height / 2 - (de * math.sin(yaw) + dn * math.cos(yaw)) * scale
+    error_m = POSITION_ERROR_M + math.hypot(de, dn) * (math.radians(YAW_ERROR_DEG) + ALTITUDE_ERROR)
+    return x, y, error_m * scale
+
+
+def in_frame(prediction, width, height):
+    """True when the predicted point may be in the photo, given its uncertainty radius"""
+    x, y, radius = prediction
+    return -radius <= x < width + radius and -radius <= y < height + radius
+
+
+def project_pairs(folder, pairs, gcp_points, zone=None, workers=8):
+    """Predict the pixel position of each (image, GCP label) pair and drop the pairs outside their photo
+
+    Args:
+        folder (str): Image folder
+        pairs (list): (filename, gcp_label) pairs
+        gcp_points (dict): {gcp_label: (easting, northing, elevation)}
+        zone (int, optional): UTM zone of the GCP coordinates. Defaults to the zone of each photo
+        workers (int, optional): Threads reading the photo headers. Defaults to 8
+
+    Returns:
+        tuple: (kept pairs, {(gcp_label, filename): (x, y, radius)} for the pairs with a prediction)
+    """
+    filenames = sorted({fname for fname, _ in pairs})
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        poses = dict(zip(filenames, pool.map(lambda f: read_pose(os.path.join(folder, f), zone), filenames)))
+    kept, predictions = [], {}
+    for fname, gcp in pairs:
+        pose, point = poses[fname], gcp_points.get(gcp)
+        prediction = predict_pixel(pose, *point) if pose is not None and point is not None else None
+        if prediction is None:
+            kept.append((fname, gcp))  # no usable pose, the user checks the photo
+        elif in_frame(prediction, pose.width, pose.height):
+            kept.append((fname, gcp))
+            predictions[(gcp, fname)] = prediction
+    without_pose = sum(pose is None for pose in poses.values())
+    print(f"GCP projection: {len(kept)} of {len(pairs)} image/GCP label pairs may show their GCP"
+          f"{f' ({without_pose} images without a usable GPS pose are kept)' if without_pose else ''}")
+    return kept, predictions
@@ -0,0 +1,229 @@
+"""
+========================================================================================
+    Image Cache for the GCP Pixel Marking Viewer (extract_img_coords.py)
+========================================================================================
+    Decodes each photo once and keeps downscaled pyramid levels next to it, so redraws and
+    mouse events do not read and resize the full resolution JPEG again.
+
+    - Levels are kept per image: 0.25 (display), 0.5, and 1.0 (full resolution, used by the 4x and 8x zoom)
+    - The display level is decoded directly at reduced resolution (IMREAD_REDUCED_COLOR_4, the JPEG decoder
+      skips most of the work), the full resolution image is only decoded when a zoom needs it
+    - A view of any window of the image is cut from the smallest level that still has enough pixels
+    - Image sizes are read from the file header and kept separately (never evicted), mouse events only need these
+    - Least recently used images are evicted when the decoded pixels exceed the memory budget
+    - ImagePrefetcher decodes the images the user is likely to open next in background threads
+
+    USAGE:
+        cache = ImageCache(folder_path, memory_budget_mb=1024)
+        prefetcher = ImagePrefetcher(cache, workers=2)
+        prefetcher.prefetch(["DJI_0105.JPG", "DJI_0106.JPG"])
+        h, w = cache.shape("DJI_0104.JPG")
+        frame = cache.view("DJI_0104.JPG", (0, 0, w, h), (int(w * 0.25), int(h * 0.25)))
+ """
+
+import os
+import struct
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import cv2
+
+DISPLAY_SCALE = 0.25
+PYRAMID_SCALES = (0.25, 0.5, 1.0)
+DEFAULT_MEMORY_BUDGET_MB = 1024
+REDUCED_DECODE_FLAGS = {0.5: cv2.IMREAD_REDUCED_COLOR_2, 0.25: cv2.IMREAD_REDUCED_COLOR_4, 0.125: cv2.IMREAD_REDUCED_COLOR_8}
+
+
+def read_image_size(path):
+    """(height, width) from a JPEG or PNG header without decoding the pixels, None for other files"""
+    with open(path, "rb") as f:
+        head = f.read(24)
+        if head[:8] == b"\x89PNG\r\n\x1a\n":
+            width, height = struct.unpack(">II", head[16:24])
+            return height, width
+        if head[:2] != b"\xff\xd8":
+            return None
+        f.seek(2)
+        while True:
+            marker = f.read(2)
+            if len(marker) < 2 or marker[0] != 0xFF:
+                return None
+            if marker[1] in (0xD8, 0x01) or 0xD0 <= marker[1] <= 0xD7: # markers without a length
+                continue
+            length = struct.unpack(">H", f.read(2))[0]
+            if marker[1] in (0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF): # start of frame
+                height, width = struct.unpack(">xHH", f.read(5))
+                return height, width
+            f.seek(length - 2, 1)
+
+
+class CachedImage:
+    """Pyramid levels of one decoded image, keyed by scale (1.0 is the full resolution image)"""
+    def __init__(self, path, shape, levels):
+        self.path = path
+        self.shape = shape
+        self.levels = levels
+        self.lock = threading.Lock()
+
+    def level(self, scale):
+        with self.lock: # the UI thread and a prefetch thread may ask for the same level
+            if scale not in self.levels:
+                if 1.0 not in self.levels:
+                    self.levels[1.0] = cv2.imread(self.path)
+                if scale != 1.0:
+                    h, w = self.shape
+                    self.levels[scale] = cv2.resize(self.levels[1.0], (max(1, int(w * scale)), max(1, int(h * scale))),
+                                                    interpolation=cv2.INTER_AREA)
+            return self.levels[scale]
+
+    @property
+    def nbytes(self):
+        return sum(level.nbytes for level in list(self.levels.values()))
+
+
+class ImageCache:
+    """LRU cache of decoded images and their pyramid levels, bounded by a memory budget, safe to use from several threads
+
+    Args:
+        folder (str): Folder containing the images
+        memory_budget_mb (int, optional): Maximum size of the decoded pixels kept in memory. Defaults to 1024
+        display_scale (float, optional): Level decoded first, at reduced resolution. Defaults to 0.25
+    """
+    def __init__(self, folder, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB, display_scale=DISPLAY_SCALE):
+        self.folder = folder
+        self.memory_budget = memory_budget_mb * 1024 * 1024
+        self.display_scale = display_scale
+        self.images = OrderedDict()
+        self.shapes = {}
+        self.nbytes = 0
+        self.lock = threading.Lock()
+        self.loading = {} # filename -> Future of the decode in progress
+
+    def _decode(self, filename):
+        path = os.path.join(self.folder, filename)
+        flag = REDUCED_DECODE_FLAGS.get(self.display_scale)
+        overview = cv2.imread(path, flag) if flag is not None else None
+        shape = read_image_size(path) if overview is not None else None
+        if overview is None or shape is None:
+            full = cv2.imread(path)
+            if full is None:
+                raise FileNotFoundError(f"Could not read image: {path}")
+            return CachedImage(path, full.shape[:2], {1.0: full})
+        if abs(overview.shape[0] / self.display_scale - shape[0]) > 1 / self.display_scale: # rotated by the EXIF orientation
+            shape = shape[::-1]
+        return CachedImage(path, shape, {self.display_scale: overview})
+
+    def get(self, filename):
+        """Decoded image (CachedImage), read from disk only when it is not cached or being read by another thread"""
+        with self.lock:
+            entry = self.images.get(filename)
+            if entry is not None:
+                self.images.move_to_end(filename)
+                return entry
+            pending = self.loading.get(filename)
+            owner = pending is None
+            if owner:
+                pending = self.loading[filename] = Future()
+        if not owner:
+            return pending.result()
+        try:
+            entry = self._decode(filename)
+        except Exception as e:
+            with self.lock:
+                del self.loading[filename]
+            pending.set_exception(e)
+            raise
+        with self.lock:
+            self.shapes[filename] = entry.shape
+            self.images[filename] = entry
+            self.nbytes += entry.nbytes
+            self._evict(keep=filename)
+            del self.loading[filename]
+        pending.set_result(entry)
+        return entry
+
+    def is_cached(self, filename):
+        with self.lock:
+            return filename in self.images or filename in self.loading
+
+    def shape(self, filename):
+        """(height, width) of the full resolution image"""
+        if filename not in self.shapes:
+            self.get(filename)
+        return self.shapes[filename]
+
+    def view(self, filename, window, size):
+        """Window of the image resized to the display size
+
+        Args:
+            filename (str): Image file name
+            window (tuple): (x1, y1, x2, y2) in full resolution pixels
+            size (tuple): (width, height) of the output
+
+        Returns:
+            numpy.ndarray: a new BGR image of the requested size, safe to draw on
+        """
+        entry = self.get(filename)
+        x1, y1, x2, y2 = window
+        # smallest level with at least one pixel per output pixel
+        needed = max(size[0] / max(x2 - x1, 1), size[1] / max(y2 - y1, 1))
+        scale = next((s for s in PYRAMID_SCALES if s >= needed), PYRAMID_SCALES[-1])
+        before = entry.nbytes
+        level = entry.level(scale)
+        self._grew(filename, entry.nbytes - before)
+        crop = level[int(y1 * scale):max(int(y2 * scale), int(y1 * scale) + 1), int(x1 * scale):max(int(x2 * scale), int(x1 * scale) + 1)]
+        if crop.shape[1] == size[0] and crop.shape[0] == size[1]:
+            return crop.copy()
+        return cv2.resize(crop, size, interpolation=cv2.INTER_AREA)
+
+    def _grew(self, filename, added):
+        if added:
+            with self.lock:
+                if filename in self.images:
+                    self.nbytes += added
+                    self._evict(keep=filename)
+
+    def _evict(self, keep):
+        """Drop least recently used images until the cache fits the memory budget, never the image in use (lock held)"""
+        while self.nbytes > self.memory_budget and len(self.images) > 1:
+            filename = next(iter(self.images))
+            if filename == keep:
+                self.images.move_to_end(filename)
+                continue
+            self.nbytes -= self.images.pop(filename).nbytes
+
+
+class ImagePrefetcher:
+    """Decodes images into an ImageCache in a thread pool (OpenCV releases the GIL while decoding)
+
+    Each prefetch call replaces the previous wish list: queued decodes that were not started are cancelled,
+    so jumping around in the image list does not leave a backlog of images nobody will look at
+
+    Args:
+        cache (ImageCache): Cache to fill
+        workers (int, optional): Decoding threads. Defaults to 2
+    """
+    def __init__(self, cache, workers=2):
+        self.cache = cache
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+        self.futures = {}
+
+    def _load(self, filename):
+        try:
+            self.cache.get(filename)
+        except Exception as e: # a broken file is reported when the user opens it
+            print(f"Prefetch failed for {filename}: {e}")
+
+    def prefetch(self, filenames):
+        """Decode filenames in the background, in order, skipping images already cached"""
+        wanted = [f for f in dict.fromkeys(filenames) if not self.cache.is_cached(f)]
+        for filename, future in list(self.futures.items()):
+            if future.done() or (filename not in wanted and future.cancel()):
+                del self.futures[filename]
+        for filename in wanted:
+            if filename not in self.futures:
+                self.futures[filename] = self.pool.submit(self._load, filename)
+
+    def close(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
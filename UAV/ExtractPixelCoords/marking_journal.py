@@ -0,0 +1,127 @@
+"""
+========================================================================================
+    Crash-Safe Journal of Marked GCP Coordinates for the GCP Pixel Marking Viewer (extract_img_coords.py)
+========================================================================================
+    Records every mark as it happens, so a crash, a refused export or 'q' does not lose the session.
+
+    - Append-only JSON lines file in the image folder, one line per mark, the last line of a pair wins
+    - The viewer only puts the mark on a queue, a background thread appends it, flushes and fsyncs
+    - On startup the journal is replayed to restore the marks, a line cut off by a crash is dropped
+    - When most lines are superseded (pairs marked again), the background thread compacts the journal:
+      the live marks are written to a temporary file which atomically replaces the journal
+
+    JOURNAL LINE FORMAT:
+    --------------------
+    {"label": "POINT_01", "image": "DJI_0104.JPG", "x": 1196, "y": 182, "time": "2024-05-01T14:03:12"}
+
+    USAGE:
+        journal = MarkingJournal(os.path.join(folder_path, JOURNAL_FILE))
+        coordinates_dict.update(journal.marks)
+        journal.record("POINT_01", "DJI_0104.JPG", 1196, 182)
+        journal.close()
+ """
+
+import datetime
+import json
+import os
+import queue
+import threading
+import time
+
+JOURNAL_FILE = "gcp_marks_journal.jsonl"
+COMPACT_MIN_LINES = 1000  # compact when the journal has at least this many lines...
+COMPACT_RATIO = 2  # ...and more than COMPACT_RATIO lines per marked pair
+
+
+def _line(label, image, x, y, timestamp):
+    return json.dumps({"label": label, "image": image, "x": x, "y": y,
+                       "time": datetime.datetime.fromtimestamp(timestamp).isoformat(timespec="seconds")}) + "\n"
+
+
+class MarkingJournal:
+    """Append-only journal of the marks of one image folder
+
+    Args:
+        path (str): Journal file, created if it does not exist
+
+    Attributes:
+        marks (dict): {(gcp_label, image): (x, y)} replayed from the journal when it was opened
+    """
+    def __init__(self, path):
+        self.path = path
+        self.marks, live = self._replay()
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._writer, args=(live,), name="marking-journal", daemon=True)
+        self.thread.start()
+
+    def _replay(self):
+        """Latest mark of each pair and its journal line, the torn last line of a crash is cut off"""
+        marks, live, good_size = {}, {}, 0
+        self.lines = 0
+        if not os.path.exists(self.path):
+            return marks, live
+        with open(self.path, "rb") as f:
+            for raw in f:
+                try:
+                    if not raw.endswith(b"\n"):
+                        raise ValueError("incomplete line")
+                    record = json.loads(raw)
+                    marks[(record["label"], record["image"])] = (record["x"], record["y"])
+                    live[(record["label"], record["image"])] = raw.decode("utf-8")
+                except (ValueError, KeyError):
+                    print(f"Journal {self.path}: dropped an unreadable line after {self.lines} lines")
+                    break
+                self.lines += 1
+                good_size += len(raw)
+        if good_size != os.path.getsize(self.path):
+            with open(self.path, "r+b") as f:
+                f.truncate(good_size)  # the next mark starts on a clean line
+        return marks, live
+
+    def record(self, label, image, x, y):
+        """Journal one mark (returns immediately, the write happens in the background)"""
+        self.queue.put((label, image, x, y, time.time()))
+
+    def _writer(self, live):
+        """Background thread: append queued marks, fsync each batch, compact when most lines are superseded
+
+        live ({(gcp_label, image): journal line}) is only used by this thread
+        """
+        f = open(self.path, "a", encoding="utf-8", newline="")
+        lines = self.lines
+        while True:
+            item = self.queue.get()
+            batch = [item]
+            while not self.queue.empty():  # write everything queued in one flush
+                batch.append(self.queue.get())
+            stop = None in batch
+            for record in batch:
+                if record is not None:
+                    line = _line(*record)
+                    f.write(line)
+                    live[record[:2]] = line
+                    lines += 1
+            f.flush()
+            os.fsync(f.fileno())
+            if lines >= COMPACT_MIN_LINES and lines > COMPACT_RATIO * len(live):
+                f.close()
+                lines = self._compact(live)
+                f = open(self.path, "a", encoding="utf-8", newline="")
+            if stop:
+                f.close()
+                return
+
+    def _compact(self, live):
+        """Rewrite the journal with one line per marked pair (temporary file, then atomic replace)"""
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8", newline="") as tmp:
+            tmp.writelines(live.values())
+            tmp.flush()
+            os.fsync(tmp.fileno())
+        os.replace(tmp_path, self.path)
+        return len(live)
+
+    def close(self):
+        """Write the queued marks and stop the background thread"""
+        self.queue.put(None)
+        self.thread.join()
@@ -0,0 +1,101 @@
+"""
+========================================================================================
+    Persistent ExifTool Process for Video Frame Geotagging (geotag_frames.py)
+========================================================================================
+    Drives one long-lived `exiftool -stay_open True -@ -` process instead of starting exiftool
+    (and its Perl interpreter) for every file written.
+
+    - Each command is written to the process stdin as an argument file, one argument per line,
+      followed by -execute<n>, exiftool answers with {ready<n>} on stdout when it is done
+    - -echo4 writes the same marker to stderr once the command is processed, so the warnings and errors
+      of each command are read separately
+    - Commands from several worker threads are serialized (exiftool runs one command at a time)
+    - The executable is configurable (argument, EXIFTOOL_PATH environment variable), any program speaking
+      the -stay_open protocol can stand in for exiftool
+
+    USAGE:
+        with ExifTool() as exiftool:
+            exiftool.write_gps("frame_0001.jpg", 45.1, -93.2, 120.5)
+ """
+
+import os
+import subprocess
+import threading
+
+WINDOWS_EXIFTOOL = r"C:\ExifTool\exiftool-13.25_64\exiftool.exe"
+
+
+def default_executable():
+    """EXIFTOOL_PATH environment variable, else the Windows install path when present, else exiftool on the PATH"""
+    if os.environ.get("EXIFTOOL_PATH"):
+        return os.environ["EXIFTOOL_PATH"]
+    return WINDOWS_EXIFTOOL if os.path.exists(WINDOWS_EXIFTOOL) else "exiftool"
+
+
+class ExifTool:
+    """One exiftool process kept open for many commands
+
+    Args:
+        executable (str, optional): exiftool executable. Defaults to default_executable()
+    """
+    def __init__(self, executable=None):
+        self.executable = executable or default_executable()
+        self.process = None
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def start(self):
+        self.process = subprocess.Popen([self.executable, "-stay_open", "True", "-@", "-"],
+                                        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        return self
+
+    def _read_until(self, stream, marker):
+        lines = []
+        while True:
+            line = stream.readline()
+            if not line:
+                raise RuntimeError(f"exiftool stopped unexpectedly ({self.executable})")
+            line = line.decode("utf-8", "replace").rstrip("\r\n")
+            if line == marker:
+                return "\n".join(lines)
+            lines.append(line)
+
+    def execute(self, *args):
+        """Run one exiftool command, returns (stdout, stderr) as text"""
+        if any("\n" in arg for arg in args):
+            raise ValueError("exiftool arguments cannot contain line breaks")
+        with self.lock:
+            if self.process is None:
+                self.start()
+            self.count += 1
+            marker = f"{{ready{self.count}}}"
+            command = list(args) + ["-echo4", marker, f"-execute{self.count}"]
+            self.process.stdin.write(("\n".join(command) + "\n").encode("utf-8"))
+            self.process.stdin.flush()
+            return self._read_until(self.process.stdout, marker), self._read_until(self.process.stderr, marker)
+
+    def write_gps(self, path, latitude, longitude, altitude):
+        """Write the GPS position into a file in place, raises RuntimeError when the file was not updated"""
+        stdout, stderr = self.execute(f"-GPSLatitude={latitude}", f"-GPSLongitude={longitude}",
+                                      f"-GPSAltitude={altitude}", "-overwrite_original", path)
+        if "1 image files updated" not in stdout:
+            raise RuntimeError(f"exiftool did not update {path}: {stderr.strip() or stdout.strip()}")
+
+    def close(self):
+        """Stop the exiftool process"""
+        with self.lock:
+            if self.process is None:
+                return
+            try:
+                self.process.stdin.write(b"-stay_open\nFalse\n")
+                self.process.stdin.flush()
+                self.process.wait(timeout=10)
+            except (OSError, subprocess.TimeoutExpired):
+                self.process.kill()
+            self.process = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,176 @@
+"""
+========================================================================================
+    Frame Footprint Layer and Spatial Index for Video Frame Geotagging (geotag_frames.py)
+========================================================================================
+    Writes the ground footprint of every GeoTIFF frame to one GeoJSON layer, and finds the frames covering an
+    area of interest without opening the GeoTIFFs.
+
+    - The footprint of a frame is the quadrilateral of its GeoTIFF geotransform (position, flying height, heading and
+      field of view, see geotiff_writer.frame_geotransform), so layer and rasters always agree
+    - frame_footprints.geojson (EPSG:4326) in the output folder, one polygon feature per frame with the GeoTIFF file
+      name, camera position, altitude and heading, opens in ArcGIS Pro / QGIS as an overview of the flight
+    - FootprintIndex bulk loads an STR (Sort-Tile-Recursive) packed R-tree over the footprint bounding boxes,
+      a query walks the tree to the candidate frames and only tests those exactly (polygon / polygon intersection)
+
+    USAGE:
+        index = FootprintIndex.load("C:/Flights/frames/frame_footprints.geojson")
+        index.query_bbox(-93.201, 45.100, -93.199, 45.102)             # ['frame_0012.tif', 'frame_0013.tif']
+        index.query_polygon([(-93.201, 45.100), (-93.199, 45.100), (-93.200, 45.102)])
+
+        python frame_footprints.py "C:/Flights/frames/frame_footprints.geojson" --bbox -93.201 45.100 -93.199 45.102
+ """
+
+import argparse
+import json
+import math
+import os
+
+FOOTPRINTS_FILE = "frame_footprints.geojson"
+NODE_CAPACITY = 10
+
+
+# ---------------- Footprint layer ---------------- #
+
+def footprint_polygon(geotransform, width, height):
+    """Closed ring [(lon, lat)] of the frame corners, clockwise from the top left"""
+    x0, a, b, y0, d, e = geotransform
+    corners = [(0, 0), (width, 0), (width, height), (0, height), (0, 0)]
+    return [(x0 + a * col + b * row, y0 + d * col + e * row) for col, row in corners]
+
+
+def footprint_feature(job, geotransform, width, height):
+    """GeoJSON feature of a frame (FrameJob) and its GeoTIFF geotransform"""
+    return {"type": "Feature",
+            "properties": {"frame": os.path.basename(job.geotiff_path), "latitude": job.latitude,
+                           "longitude": job.longitude, "altitude": job.altitude, "yaw": job.yaw},
+            "geometry": {"type": "Polygon", "coordinates": [[list(p) for p in footprint_polygon(geotransform, width, height)]]}}
+
+
+def write_footprints(path, features):
+    """Write the footprint features as a GeoJSON FeatureCollection (temporary file, then rename)"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"type": "FeatureCollection", "features": sorted(features, key=lambda ft: ft["properties"]["frame"])}, f)
+    os.replace(tmp_path, path)
+
+
+# ---------------- Geometry tests ---------------- #
+
+def _bbox_of(ring):
+    xs, ys = [x for x, _ in ring], [y for _, y in ring]
+    return (min(xs), min(ys), max(xs), max(ys))
+
+
+def _bboxes_intersect(a, b):
+    """True when two boxes intersect, touching included"""
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+def _point_in_ring(x, y, ring):
+    inside = False
+    for (x1, y1), (x2, y2) in zip(ring, ring[1:] + ring[:1]):
+        if (y1 > y) != (y2 > y) and x < x1 + (y - y1) * (x2 - x1) / (y2 - y1):
+            inside = not inside
+    return inside
+
+
+def _segments_cross(p1, p2, q1, q2):
+    def side(a, b, c):
+        return (b[0] - a[0]) * (c[1] - a[1]) - (b[1] - a[1]) * (c[0] - a[0])
+    d1, d2, d3, d4 = side(q1, q2, p1), side(q1, q2, p2), side(p1, p2, q1), side(p1, p2, q2)
+    if ((d1 > 0) != (d2 > 0) or d1 == 0 or d2 == 0) and ((d3 > 0) != (d4 > 0) or d3 == 0 or d4 == 0):
+        # collinear cases: the segments must also overlap in extent
+        return (min(p1[0], p2[0]) <= max(q1[0], q2[0]) and min(q1[0], q2[0]) <= max(p1[0], p2[0]) and
+                min(p1[1], p2[1]) <= max(q1[1], q2[1]) and min(q1[1], q2[1]) <= max(p1[1], p2[1]))
+    return False
+
+
+def polygons_intersect(ring_a, ring_b):
+    """True when two simple polygons share any point: an edge crossing, or one inside the other"""
+    if not _bboxes_intersect(_bbox_of(ring_a), _bbox_of(ring_b)):
+        return False
+    if _point_in_ring(*ring_a[0], ring_b) or _point_in_ring(*ring_b[0], ring_a):
+        return True
+    edges_a, edges_b = list(zip(ring_a, ring_a[1:] + ring_a[:1])), list(zip(ring_b, ring_b[1:] + ring_b[:1]))
+    return any(_segments_cross(p1, p2, q1, q2) for p1, p2 in edges_a for q1, q2 in edges_b)
+
+
+# ---------------- Spatial index ---------------- #
+
+class FootprintIndex:
+    """STR packed R-tree over the frame footprints
+
+    Args:
+        features (list): GeoJSON footprint features (see footprint_feature)
+        node_capacity (int, optional): Maximum children per node. Defaults to 10
+    """
+    def __init__(self, features, node_capacity=NODE_CAPACITY):
+        self.frames = [ft["properties"]["frame"] for ft in features]
+        self.rings = [[tuple(p) for p in ft["geometry"]["coordinates"][0]] for ft in features]
+        self.bboxes = [_bbox_of(ring) for ring in self.rings]
+        self.node_capacity = node_capacity
+        # a node is (bbox, children, is_leaf), leaf children are frame positions
+        level = self._pack([(bbox, i) for i, bbox in enumerate(self.bboxes)], leaf=True)
+        while len(level) > 1:
+            level = self._pack([(node[0], node) for node in level], leaf=False)
+        self.root = level[0] if level else None
+
+    @classmethod
+    def load(cls, path):
+        """Index of a footprint GeoJSON written by geotag_frames.py"""
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f)["features"])
+
+    def _pack(self, entries, leaf):
+        """Group entries (bbox, child) into nodes: sort by x centre, cut into vertical slices, sort each slice by y centre"""
+        capacity = self.node_capacity
+        node_count = math.ceil(len(entries) / capacity)
+        slice_size = capacity * math.ceil(math.sqrt(node_count)) if node_count else capacity
+        entries = sorted(entries, key=lambda e: e[0][0] + e[0][2])
+        nodes = []
+        for s in range(0, len(entries), slice_size):
+            vertical_slice = sorted(entries[s:s + slice_size], key=lambda e: e[0][1] + e[0][3])
+            for n in range(0, len(vertical_slice), capacity):
+                group = vertical_slice[n:n + capacity]
+                bbox = (min(e[0][0] for e in group), min(e[0][1] for e in group),
+                        max(e[0][2] for e in group), max(e[0][3] for e in group))
+                nodes.append((bbox, [e[1] for e in group], leaf))
+        return nodes
+
+    def _candidates(self, bbox):
+        """Positions of the frames whose footprint bounding box intersects bbox"""
+        if self.root is None or not _bboxes_intersect(self.root[0], bbox):
+            return []
+        found, stack = [], [self.root]
+        while stack:
+            _, children, leaf = stack.pop()
+            if leaf:
+                found.extend(i for i in children if _bboxes_intersect(self.bboxes[i], bbox))
+            else:
+                stack.extend(child for child in children if _bboxes_intersect(child[0], bbox))
+        return found
+
+    def query_polygon(self, ring):
+        """GeoTIFF file names of the frames whose footprint intersects a polygon [(lon, lat)], sorted"""
+        ring = [tuple(p) for p in ring]
+        if len(ring) > 1 and ring[0] == ring[-1]:
+            ring = ring[:-1]
+        return sorted(self.frames[i] for i in self._candidates(_bbox_of(ring)) if polygons_intersect(self.rings[i][:-1], ring))
+
+    def query_bbox(self, xmin, ymin, xmax, ymax):
+        """GeoTIFF file names of the frames whose footprint intersects a lon/lat box, sorted"""
+        return self.query_polygon([(xmin, ymin), (xmax, ymin), (xmax, ymax), (xmin, ymax)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List the frames whose footprint intersects a lon/lat box")
+    parser.add_argument("footprints", help=f"Footprint GeoJSON ({FOOTPRINTS_FILE} in the frame folder)")
+    parser.add_argument("--bbox", type=float, nargs=4, required=True, metavar=("XMIN", "YMIN", "XMAX", "YMAX"))
+    args = parser.parse_args()
+    folder = os.path.dirname(os.path.abspath(args.footprints))
+    for frame in FootprintIndex.load(args.footprints).query_bbox(*args.bbox):
+        print(os.path.join(folder, frame))
+
+
+if __name__ == "__main__":
+    main()
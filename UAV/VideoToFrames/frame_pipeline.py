@@ -0,0 +1,191 @@
+"""
+========================================================================================
+    Pipelined Per-Frame Processing for Video Frame Geotagging (geotag_frames.py)
+========================================================================================
+    Runs the per-frame stages (geotag JPEG, convert to GeoTIFF, geotag GeoTIFF) on a bounded
+    worker pool instead of one blocking process after the other.
+
+    - Frames run in parallel, the stages of one frame run in order
+    - Backpressure: at most max_pending frames are queued or running, the frame source (which may be
+      a generator) is only read when a slot is free
+    - Resumable: every finished frame is appended to a progress file in the output folder with its GPS values
+      (and heading) and the size / modification time of its outputs, a rerun skips frames whose outputs still match
+    - A failing stage stops its frame (no progress line, it is redone next run), the other frames go on
+    - Per-stage timing (count, total, mean, max) is printed at the end
+
+    PROGRESS FILE FORMAT (geotag_progress.jsonl in the output folder):
+    ------------------------------------------------------------------
+    {"name": "frame_0001.jpg", "gps": [45.1, -93.2, 120.5], "outputs": {"frame_0001.jpg": [812345, 1718000000000000000]}}
+
+    USAGE:
+        pipeline = FramePipeline([("exiftool JPEG", tag_jpeg), ("GeoTIFF", convert)], workers=8,
+                                 progress_path=os.path.join(output_folder, PROGRESS_FILE))
+        pipeline.run(jobs)
+ """
+
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+PROGRESS_FILE = "geotag_progress.jsonl"
+
+# image_path is None without JPEG output, pixels holds the decoded frame when streaming from ffmpeg
+FrameJob = namedtuple("FrameJob", ["name", "image_path", "geotiff_path", "latitude", "longitude", "altitude", "yaw", "pixels"],
+                      defaults=[None, None])
+
+
+def _file_stats(path):
+    """[size, mtime_ns] of a file, None when it is missing or empty"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns] if stat.st_size else None
+
+
+# ---------------- Progress file ---------------- #
+
+class FrameProgress:
+    """Finished frames of previous runs, appended to as frames finish
+
+    Args:
+        path (str): Progress file, created if it does not exist
+    """
+    def __init__(self, path):
+        self.path = path
+        self.done = {}
+        self.lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                        self.done[record["name"]] = record
+                    except (ValueError, KeyError):
+                        pass  # line cut off by an interrupted run
+        self.file = open(path, "a", encoding="utf-8")
+
+    @staticmethod
+    def _gps(job):
+        return [job.latitude, job.longitude, job.altitude] + ([] if job.yaw is None else [job.yaw])
+
+    @staticmethod
+    def _outputs(job):
+        return [path for path in (job.image_path, job.geotiff_path) if path]
+
+    def is_done(self, job):
+        """True when the frame finished in a previous run with the same GPS values and its outputs are unchanged"""
+        record = self.done.get(job.name)
+        if record is None or record["gps"] != self._gps(job):
+            return False
+        outputs = record["outputs"]
+        return all(_file_stats(path) == outputs.get(os.path.basename(path)) for path in self._outputs(job))
+
+    def mark_done(self, job):
+        record = {"name": job.name, "gps": self._gps(job),
+                  "outputs": {os.path.basename(path): _file_stats(path) for path in self._outputs(job)}}
+        with self.lock:
+            self.file.write(json.dumps(record) + "\n")
+            self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+# ---------------- Stage timing ---------------- #
+
+class StageTimer:
+    """Durations of each stage, summed over all worker threads"""
+    def __init__(self, stage_names):
+        self.stats = {name: [0, 0.0, 0.0] for name in stage_names}  # count, total, max
+        self.lock = threading.Lock()
+
+    def add(self, name, seconds):
+        with self.lock:
+            stat = self.stats[name]
+            stat[0] += 1
+            stat[1] += seconds
+            stat[2] = max(stat[2], seconds)
+
+    def report(self):
+        lines = [f"{'Stage':<20}{'Frames':>8}{'Total s':>10}{'Mean s':>9}{'Max s':>9}"]
+        for name, (count, total, longest) in self.stats.items():
+            lines.append(f"{name:<20}{count:>8}{total:>10.1f}{total / count if count else 0:>9.3f}{longest:>9.3f}")
+        return "\n".join(lines)
+
+
+# ---------------- Pipeline ---------------- #
+
+class FramePipeline:
+    """Bounded parallel executor of the per-frame stages
+
+    Args:
+        stages (list): [(stage name, callable(FrameJob))] run in order for each frame, a stage fails by raising
+        workers (int, optional): Frames processed at the same time. Defaults to the number of CPUs
+        max_pending (int, optional): Frames queued or running before the source is paused. Defaults to 2 x workers
+        progress_path (str, optional): Progress file for resuming. Defaults to None (no resume)
+    """
+    def __init__(self, stages, workers=None, max_pending=None, progress_path=None):
+        self.stages = stages
+        self.workers = workers or os.cpu_count() or 4
+        self.max_pending = max_pending or 2 * self.workers
+        self.progress_path = progress_path
+        self.timer = None
+
+    def _process(self, job, progress):
+        for name, stage in self.stages:
+            start = time.perf_counter()
+            try:
+                stage(job)
+            except Exception as e:
+                print(f"❌ {job.name}: {name} failed: {e}")
+                return False
+            finally:
+                self.timer.add(name, time.perf_counter() - start)
+        if progress is not None:
+            progress.mark_done(job)
+        return True
+
+    def run(self, jobs):
+        """Process the frames, returns {"done": n, "skipped": n, "failed": [frame names]}"""
+        progress = FrameProgress(self.progress_path) if self.progress_path else None
+        self.timer = StageTimer([name for name, _ in self.stages])
+        slots = threading.BoundedSemaphore(self.max_pending)
+        result = {"done": 0, "skipped": 0, "failed": []}
+        lock = threading.Lock()
+        start = time.perf_counter()
+
+        def finished(job, future):
+            slots.release()
+            with lock:
+                if future.result():
+                    result["done"] += 1
+                else:
+                    result["failed"].append(job.name)
+                count = result["done"] + len(result["failed"])
+            if count % 50 == 0:
+                print(f"🔄 {count} frames processed ({time.perf_counter() - start:.1f}s)")
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                for job in jobs:
+                    if progress is not None and progress.is_done(job):
+                        result["skipped"] += 1
+                        continue
+                    slots.acquire()  # backpressure: wait for a free slot before reading the next frame
+                    future = pool.submit(self._process, job, progress)
+                    future.add_done_callback(lambda f, job=job: finished(job, f))
+        finally:
+            if progress is not None:
+                progress.close()
+
+        elapsed = time.perf_counter() - start
+        print(f"✅ {result['done']} frames processed, {result['skipped']} already done, {len(result['failed'])} failed "
+              f"in {elapsed:.1f}s ({result['done'] / elapsed if elapsed else 0:.2f} frames/s, {self.workers} workers)")
+        print(self.timer.report())
+        if result["failed"]:
+            print(f"🛑 Failed frames (rerun to retry): {', '.join(sorted(result['failed']))}")
+        return result
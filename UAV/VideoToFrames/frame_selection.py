@@ -0,0 +1,97 @@
+"""
+========================================================================================
+    Telemetry and Scene Based Frame Selection for Video Frame Geotagging (geotag_frames.py)
+========================================================================================
+    Chooses which video frames are worth extracting, so a hovering drone does not produce hundreds of
+    near-identical frames that are then geotagged and converted one by one.
+
+    - Candidate frames are taken at the extraction rate (fps) along the SRT track, a candidate is kept when the
+      camera moved more than (1 - overlap) x the shorter side of the ground footprint since the last kept frame,
+      or turned more than (1 - overlap) x the horizontal field of view
+    - Candidates outside the telemetry (no position to geotag them with) are not extracted
+    - The kept times become one ffmpeg select expression, a balanced tree of if(lt(t, ...)) tests so each decoded
+      frame is checked in O(log n), optionally OR-ed with the scene change score (gt(scene, threshold))
+    - Frames that are not selected are never encoded, written or processed (ffmpeg still decodes the stream to
+      filter it)
+
+    USAGE:
+        times = select_frame_times(telemetry, fps=1, width=3840, height=2160, overlap=0.8)
+        expression = select_expression(times, frame_duration=1 / 29.97, scene_threshold=0.3)
+ """
+
+import math
+
+import numpy as np
+
+from geotiff_writer import DEFAULT_HFOV_DEG, metres_per_degree
+from srt_telemetry import interpolate_telemetry
+
+DEFAULT_OVERLAP = 0.8  # forward overlap between kept frames
+DEFAULT_SCENE_THRESHOLD = 0.3  # ffmpeg scene score (0 - 1) that also keeps a frame
+
+
+def select_frame_times(telemetry, fps, width, height, overlap=DEFAULT_OVERLAP, hfov_deg=DEFAULT_HFOV_DEG, ground_elevation=0.0):
+    """Times of the frames to extract, greedy along the SRT track
+
+    Args:
+        telemetry (np.ndarray): Structured array from srt_telemetry.read_srt
+        fps (float): Candidate frames per second, the highest extraction rate
+        width (int): Video width in pixels
+        height (int): Video height in pixels
+        overlap (float, optional): Overlap kept between consecutive frames (0 - 1). Defaults to 0.8
+        hfov_deg (float, optional): Horizontal field of view. Defaults to 73.7
+        ground_elevation (float, optional): Subtracted from the altitude to get the flying height. Defaults to 0
+
+    Returns:
+        np.ndarray: Kept times in seconds, ascending
+    """
+    if len(telemetry) == 0:
+        return np.empty(0)
+    candidates = interpolate_telemetry(telemetry, np.arange(0, telemetry["time"][-1] + 1e-9, 1 / fps))
+    candidates = candidates[~np.isnan(candidates["latitude"])]
+    if len(candidates) == 0:
+        return np.empty(0)
+    lon_m, lat_m = metres_per_degree(float(np.mean(candidates["latitude"])))
+    east = (candidates["longitude"] - candidates["longitude"][0]) * lon_m
+    north = (candidates["latitude"] - candidates["latitude"][0]) * lat_m
+    flying_height = candidates["altitude"] - ground_elevation
+    # shorter side of the ground footprint, a frame with unknown height is always kept
+    spacing = (1 - overlap) * 2 * flying_height * math.tan(math.radians(hfov_deg) / 2) * min(width, height) / width
+    turn = (1 - overlap) * hfov_deg
+    yaw = candidates["gimbal_yaw"]
+
+    kept = [0]
+    for i in range(1, len(candidates)):
+        last = kept[-1]
+        moved = math.hypot(east[i] - east[last], north[i] - north[last])
+        turned = abs((yaw[i] - yaw[last] + 180) % 360 - 180)  # NaN without gimbal yaw: never counts as turned
+        if not moved <= spacing[last] or turned > turn:
+            kept.append(i)
+    return candidates["time"][kept]
+
+
+def select_expression(times, frame_duration, scene_threshold=None):
+    """ffmpeg select expression keeping the frame nearest to each time (and scene changes)
+
+    Args:
+        times (array-like): Kept times in seconds, ascending
+        frame_duration (float): Duration of one video frame in seconds (1 / video frame rate)
+        scene_threshold (float, optional): Also keep frames with a scene score above this. Defaults to None
+
+    Returns:
+        str: Expression for the select filter, "0" when nothing is selected
+    """
+    half = frame_duration / 2
+    windows = [(t - half, t + half) for t in times]
+
+    def tree(lo, hi):
+        if hi - lo == 1:
+            start, end = windows[lo]
+            return f"gte(t,{start:.6f})*lt(t,{end:.6f})"
+        mid = (lo + hi) // 2
+        return f"if(lt(t,{windows[mid][0]:.6f}),{tree(lo, mid)},{tree(mid, hi)})"
+
+    expression = tree(0, len(windows)) if windows else "0"
+    if scene_threshold is not None:
+        expression = f"{expression}+gt(scene,{scene_threshold})"
+    return expression
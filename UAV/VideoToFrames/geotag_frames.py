@@ -1,95 +1,242 @@
 import argparse
 import os
-import re
 import subprocess
-from datetime import datetime
+
+import cv2
+import numpy as np
+
+from exiftool_batch import ExifTool
+from frame_footprints import FOOTPRINTS_FILE, footprint_feature, write_footprints
+from frame_selection import DEFAULT_OVERLAP, DEFAULT_SCENE_THRESHOLD, select_expression, select_frame_times
+from frame_pipeline import PROGRESS_FILE, FrameJob, FramePipeline
+from geotiff_writer import DEFAULT_HFOV_DEG, frame_geotransform, write_geotiff
+from srt_telemetry import interpolate_telemetry, load_frame_times, read_srt, write_frame_times
+from video_stream import SHOWINFO_FRAME, iter_raw_frames
+
+SELECT_FILTER_FILE = "frame_select_filter.txt"
 
 # ---------------- Step 1: Extract Frames from Video ---------------- #
-def extract_frames(video_path, output_folder, fps=1):
-    """Extract frames from video using FFmpeg."""
-    os.makedirs(output_folder, exist_ok=True)
-    frame_pattern = os.path.join(output_folder, "frame_%04d.jpg")
-    command = f'ffmpeg -i "{video_path}" -vf "fps={fps}" "{frame_pattern}"'
-    subprocess.run(command, shell=True)
-    print("✅ Frames extracted successfully!")
+def video_properties(video_path):
+    """(width, height, frame rate) of a video, read from its header."""
+    capture = cv2.VideoCapture(video_path)
+    try:
+        width, height = int(capture.get(cv2.CAP_PROP_FRAME_WIDTH)), int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        video_fps = capture.get(cv2.CAP_PROP_FPS)
+    finally:
+        capture.release()
+    if width <= 0 or height <= 0 or not video_fps > 0:
+        raise RuntimeError(f"Could not read the video size and frame rate: {video_path}")
+    return width, height, video_fps
 
-# ---------------- Step 2: Parse SRT Metadata ---------------- #
-def parse_srt(srt_file):
-    """Extract timestamps and GPS coordinates from SRT file."""
-    gps_data = []
-    with open(srt_file, "r", encoding="utf-8") as file:
-        srt_content = file.read()
+def write_select_filter(output_folder, select):
+    """Filter graph file of a select expression (too long for a command line), ffmpeg reads it with -filter_script."""
+    os.makedirs(output_folder, exist_ok=True)
+    filter_path = os.path.join(output_folder, SELECT_FILTER_FILE)
+    with open(filter_path, "w") as f:
+        f.write(f"select='{select}',showinfo")
+    return filter_path
 
-    matches = re.findall(r"(\d+:\d+:\d+,\d+).*?\[latitude: ([\d\.\-]+)] \[longitude: ([\d\.\-]+)] \[altitude: ([\d\.\-]+)]", srt_content)
+def extract_frames(video_path, output_folder, fps=1, select=None):
+    """Extract frames from video using FFmpeg (every 1/fps seconds, or the frames matching a select expression),
+    logging the presentation time of each frame."""
+    os.makedirs(output_folder, exist_ok=True)
+    frame_pattern = os.path.join(output_folder, "frame_%04d.jpg")
+    if select is None:
+        command = f'ffmpeg -i "{video_path}" -vf "fps={fps},showinfo" "{frame_pattern}"'
+    else:
+        filter_path = write_select_filter(output_folder, select)
+        command = f'ffmpeg -i "{video_path}" -filter_script:v "{filter_path}" -fps_mode vfr "{frame_pattern}"'
+    # showinfo logs "n: <output frame index> ... pts_time:<seconds>" to stderr for every frame written
+    frame_times = {}
+    process = subprocess.Popen(command, shell=True, stderr=subprocess.PIPE, text=True, errors="replace")
+    for line in process.stderr:
+        match = SHOWINFO_FRAME.search(line)
+        if match:
+            frame_times[f"frame_{int(match.group(1)) + 1:04d}.jpg"] = float(match.group(2))
+    process.wait()
+    write_frame_times(output_folder, frame_times)
+    print(f"✅ Frames extracted successfully! ({len(frame_times)} frames)")
 
-    for match in matches:
-        timestamp = datetime.strptime(match[0], "%H:%M:%S,%f")
-        latitude, longitude, altitude = map(float, match[1:])
-        gps_data.append((timestamp, latitude, longitude, altitude))
+# ---------------- Step 2: Match Frames to SRT Telemetry ---------------- #
+def select_frames(video_path, telemetry, fps=1, overlap=DEFAULT_OVERLAP, scene_threshold=DEFAULT_SCENE_THRESHOLD,
+                  hfov_deg=DEFAULT_HFOV_DEG, ground_elevation=0.0):
+    """ffmpeg select expression of the frames that move or turn enough along the SRT track (or change scene)."""
+    width, height, video_fps = video_properties(video_path)
+    times = select_frame_times(telemetry, fps, width, height, overlap, hfov_deg, ground_elevation)
+    candidates = int(telemetry["time"][-1] * fps) + 1 if len(telemetry) else 0
+    print(f"✅ {len(times)} of {candidates} frames at {fps} fps kept for {overlap:.0%} overlap"
+          f"{f', plus scene changes above {scene_threshold}' if scene_threshold is not None else ''}")
+    return select_expression(times, 1 / video_fps, scene_threshold)
 
-    return gps_data
+def match_telemetry(telemetry, output_folder, frame_files, fps=1):
+    """Telemetry of each frame, interpolated at its presentation time (NaN where the SRT does not cover it)."""
+    frames = interpolate_telemetry(telemetry, load_frame_times(output_folder, frame_files, fps))
+    unmatched = int(np.isnan(frames["latitude"]).sum())
+    print(f"✅ {len(telemetry)} SRT telemetry records, {len(frame_files) - unmatched} of {len(frame_files)} frames matched"
+          f"{f' ({unmatched} outside the telemetry are skipped)' if unmatched else ''}")
+    return frames
 
 # ---------------- Step 3: Geotag JPEGs with ExifTool ---------------- #
-def geotag_image_exiftool(image_path, latitude, longitude, altitude):
-    """Embed GPS metadata using ExifTool for Windows compatibility."""
-    command = [
-        r"C:\ExifTool\exiftool-13.25_64\exiftool.exe",
-        f"-GPSLatitude={latitude}",
-        f"-GPSLongitude={longitude}",
-        f"-GPSAltitude={altitude}",
-        "-overwrite_original",
-        image_path
-    ]
-    subprocess.run(command, shell=True)
+def geotag_image_exiftool(exiftool, image_path, latitude, longitude, altitude):
+    """Embed GPS metadata using the persistent ExifTool process."""
+    exiftool.write_gps(image_path, latitude, longitude, altitude)
     print(f"✅ Geotagged EXIF GPS Metadata: {image_path}")
 
-# ---------------- Step 4: Convert JPEGs to GeoTIFF with GDAL ---------------- #
-def convert_to_geotiff(image_path, output_path, latitude, longitude):
-    """Convert a JPEG to a properly georeferenced GeoTIFF."""
-    command = f'gdal_translate -a_srs EPSG:4326 -gcp 0 0 {latitude} {longitude} -of GTiff "{image_path}" "{output_path}"'
-    result = subprocess.run(command, shell=True, capture_output=True, text=True)
-    print(f"✅ GDAL Output: {result.stdout}")
-    print(f"🛑 GDAL Error (if any): {result.stderr}")
-
-# ---------------- Step 5: Apply GPS Metadata to GeoTIFF ---------------- #
-def geotag_geotiff_exiftool(image_path, latitude, longitude, altitude):
-    """Embed GPS metadata into the final GeoTIFF to ensure full compatibility."""
-    command = [
-        r"C:\ExifTool\exiftool-13.25_64\exiftool.exe",
-        f"-GPSLatitude={latitude}",
-        f"-GPSLongitude={longitude}",
-        f"-GPSAltitude={altitude}",
-        "-overwrite_original",
-        image_path
-    ]
-    subprocess.run(command, shell=True)
-    print(f"✅ Final Geotagging Applied to GeoTIFF: {image_path}")
+# ---------------- Step 4: Convert JPEGs to GeoTIFF ---------------- #
+def convert_to_geotiff(image_path, output_path, latitude, longitude, altitude, hfov_deg=DEFAULT_HFOV_DEG, ground_elevation=0.0,
+                       yaw=None):
+    """Write the frame as a tiled GeoTIFF with GPS tags and the footprint of a nadir camera at the GPS position (rotated by yaw)."""
+    bgr = cv2.imread(image_path, cv2.IMREAD_COLOR)
+    if bgr is None:
+        raise RuntimeError(f"Could not read frame: {image_path}")
+    write_frame_geotiff(output_path, cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB), latitude, longitude, altitude,
+                        hfov_deg, ground_elevation, yaw)
+    print(f"✅ GeoTIFF created: {output_path}")
+
+def write_frame_geotiff(output_path, rgb, latitude, longitude, altitude, hfov_deg=DEFAULT_HFOV_DEG, ground_elevation=0.0, yaw=None):
+    """Write decoded RGB pixels as a georeferenced GeoTIFF with EXIF GPS tags (no exiftool pass needed)."""
+    height, width = rgb.shape[:2]
+    geotransform = frame_geotransform(latitude, longitude, altitude - ground_elevation, width, height, hfov_deg, yaw)
+    write_geotiff(output_path, rgb, geotransform, gps=(latitude, longitude, altitude))
+
+def airborne_jobs(jobs, ground_elevation=0.0):
+    """Drop the frames with no flying height (on the ground before takeoff, or below --ground-elevation), they have no footprint."""
+    for job in jobs:
+        if job.altitude - ground_elevation > 0:
+            yield job
+        else:
+            print(f"⚠️ {job.name}: camera at {job.altitude} m, not above the ground ({ground_elevation} m), no GeoTIFF written")
+
+# ---------------- Step 5: Stream Decoded Frames to GeoTIFF (no intermediate JPEG) ---------------- #
+def write_jpeg_sidecar(image_path, rgb):
+    """Optional JPEG copy of a streamed frame."""
+    if not cv2.imwrite(image_path, cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)):
+        raise RuntimeError(f"Could not write JPEG: {image_path}")
+
+def stream_jobs(video_path, output_folder, telemetry, fps=1, select=None, jpeg_sidecar=False, frame_times=None):
+    """Pipeline jobs of the frames decoded from the ffmpeg rawvideo pipe, frames outside the telemetry are dropped."""
+    width, height, _ = video_properties(video_path)
+    if select is None:
+        frames = iter_raw_frames(video_path, width, height, filter_graph=f"fps={fps}")
+    else:
+        frames = iter_raw_frames(video_path, width, height, filter_script=write_select_filter(output_folder, select))
+    for index, pts_time, rgb in frames:
+        name = f"frame_{index + 1:04d}"
+        if frame_times is not None:
+            frame_times[name + ".tif"] = pts_time
+        frame = dict(zip(telemetry.dtype.names, interpolate_telemetry(telemetry, [pts_time]).tolist()[0]))
+        if np.isnan(frame["latitude"]):
+            continue
+        yield FrameJob(name + ".tif", os.path.join(output_folder, name + ".jpg") if jpeg_sidecar else None,
+                       os.path.join(output_folder, name + ".tif"), frame["latitude"], frame["longitude"], frame["altitude"],
+                       None if np.isnan(frame["gimbal_yaw"]) else frame["gimbal_yaw"], rgb)
+
+def stream_stages(exiftool, hfov_deg=DEFAULT_HFOV_DEG, ground_elevation=0.0):
+    """Per-frame stages of the streaming mode, the JPEG sidecar stages only run with an exiftool process."""
+    stages = [("GeoTIFF", lambda job: write_frame_geotiff(job.geotiff_path, job.pixels, job.latitude, job.longitude, job.altitude,
+                                                          hfov_deg, ground_elevation, job.yaw))]
+    if exiftool is not None:
+        stages += [("JPEG sidecar", lambda job: write_jpeg_sidecar(job.image_path, job.pixels)),
+                   ("exiftool JPEG", lambda job: exiftool.write_gps(job.image_path, job.latitude, job.longitude, job.altitude))]
+    return stages
+
+def stream_to_geotiff(video_path, output_folder, telemetry, progress_path, workers=None, exiftool_path=None,
+                      hfov_deg=DEFAULT_HFOV_DEG, ground_elevation=0.0, fps=1, select=None, jpeg_sidecar=False, footprints=None):
+    """Decode the selected frames once and write them straight to GeoTIFF on the worker pool."""
+    os.makedirs(output_folder, exist_ok=True)
+    workers = workers or os.cpu_count() or 4
+    frame_times = {}
+    jobs = airborne_jobs(stream_jobs(video_path, output_folder, telemetry, fps, select, jpeg_sidecar, frame_times), ground_elevation)
+    if footprints is not None:
+        width, height, _ = video_properties(video_path)
+        jobs = record_footprints(jobs, footprints, width, height, hfov_deg, ground_elevation)
+    exiftool = ExifTool(exiftool_path).start() if jpeg_sidecar else None
+    try:
+        # every queued frame is a full decoded frame in memory: keep the queue just deep enough to feed the workers
+        result = FramePipeline(stream_stages(exiftool, hfov_deg, ground_elevation), workers=workers,
+                               max_pending=workers + 2, progress_path=progress_path).run(jobs)
+    finally:
+        if exiftool is not None:
+            exiftool.close()
+    write_frame_times(output_folder, frame_times)
+    return result
+
+# ---------------- Step 6: Frame Footprint Layer ---------------- #
+def record_footprints(jobs, footprints, width, height, hfov_deg=DEFAULT_HFOV_DEG, ground_elevation=0.0):
+    """Pass the jobs through, keeping the footprint of each frame (the geotransform of its GeoTIFF) by frame name."""
+    for job in jobs:
+        geotransform = frame_geotransform(job.latitude, job.longitude, job.altitude - ground_elevation,
+                                          width, height, hfov_deg, job.yaw)
+        footprints[job.name] = footprint_feature(job, geotransform, width, height)
+        yield job
+
+def write_footprint_layer(output_folder, footprints, failed):
+    """Write the footprints of the finished frames (including those of earlier runs) to frame_footprints.geojson."""
+    failed = set(failed)
+    features = [feature for name, feature in footprints.items() if name not in failed]
+    write_footprints(os.path.join(output_folder, FOOTPRINTS_FILE), features)
+    print(f"🗺️ Footprints of {len(features)} frames written to {FOOTPRINTS_FILE}")
 
 # ---------------- Master Function: Extract, Geotag, Convert ---------------- #
-def main(video_path, srt_file, output_folder):
-    print("🔄 Extracting frames...")
-    extract_frames(video_path, output_folder)
+def pipeline_stages(exiftool, hfov_deg=DEFAULT_HFOV_DEG, ground_elevation=0.0):
+    """Per-frame stages: tag the JPEG through the shared exiftool process, then write the GeoTIFF with its GPS tags."""
+    return [
+        ("exiftool JPEG", lambda job: geotag_image_exiftool(exiftool, job.image_path, job.latitude, job.longitude, job.altitude)),
+        ("GeoTIFF", lambda job: convert_to_geotiff(job.image_path, job.geotiff_path, job.latitude, job.longitude,
+                                                   job.altitude, hfov_deg, ground_elevation, job.yaw)),
+    ]
+
+def frame_jobs(output_folder, frame_files, telemetry):
+    """Pipeline jobs of the frames matched to the telemetry, the top of the frame follows the gimbal yaw when recorded."""
+    for frame_file, values in zip(frame_files, telemetry.tolist()):
+        frame = dict(zip(telemetry.dtype.names, values))
+        if np.isnan(frame["latitude"]):
+            continue
+        yield FrameJob(frame_file, os.path.join(output_folder, frame_file),
+                       os.path.join(output_folder, frame_file.replace(".jpg", ".tif")),
+                       frame["latitude"], frame["longitude"], frame["altitude"],
+                       None if np.isnan(frame["gimbal_yaw"]) else frame["gimbal_yaw"])
 
+def main(video_path, srt_file, output_folder, workers=None, force=False, exiftool_path=None,
+         hfov_deg=DEFAULT_HFOV_DEG, ground_elevation=0.0, fps=1, overlap=DEFAULT_OVERLAP,
+         scene_threshold=DEFAULT_SCENE_THRESHOLD, all_frames=False, stream=False, jpeg_sidecar=False):
     print("🔄 Parsing SRT metadata...")
-    gps_data = parse_srt(srt_file)
+    telemetry = read_srt(srt_file)
 
-    print("🔄 Processing images...")
-    frame_files = sorted([f for f in os.listdir(output_folder) if f.endswith(".jpg")])
+    progress_path = os.path.join(output_folder, PROGRESS_FILE)
+    if force and os.path.exists(progress_path):
+        os.remove(progress_path)
+    resume = os.path.exists(progress_path)
+    select = None
+    if not all_frames and (stream or not resume):  # resumed extractions keep their frames
+        select = select_frames(video_path, telemetry, fps, overlap, scene_threshold, hfov_deg, ground_elevation)
 
-    for frame_file, (timestamp, lat, lon, alt) in zip(frame_files, gps_data):
-        frame_path = os.path.join(output_folder, frame_file)
-        
-        # Geotag JPEGs with GPS metadata
-        geotag_image_exiftool(frame_path, lat, lon, alt)
+    footprints = {}
+    if stream:
+        print("🔄 Streaming frames to GeoTIFF..." + (" (resuming, finished frames are skipped)" if resume else ""))
+        result = stream_to_geotiff(video_path, output_folder, telemetry, progress_path, workers, exiftool_path,
+                                   hfov_deg, ground_elevation, fps, select, jpeg_sidecar, footprints)
+    else:
+        if resume:
+            # re-extracting would overwrite the geotagged JPEGs of the frames already done
+            print("🔄 Resuming: frames already extracted, skipping finished frames (use --force to start over)")
+        else:
+            print("🔄 Extracting frames...")
+            extract_frames(video_path, output_folder, fps, select)
 
-        # Convert to GeoTIFF for GeoDeep processing
-        geotiff_path = os.path.join(output_folder, frame_file.replace(".jpg", ".tif"))
-        convert_to_geotiff(frame_path, geotiff_path, lat, lon)
+        frame_files = sorted([f for f in os.listdir(output_folder) if f.endswith(".jpg")])
+        telemetry = match_telemetry(telemetry, output_folder, frame_files, fps)
 
-        # Apply final GPS metadata fix to GeoTIFF
-        geotag_geotiff_exiftool(geotiff_path, lat, lon, alt)
+        print("🔄 Processing images...")
+        width, height, _ = video_properties(video_path)
+        jobs = airborne_jobs(frame_jobs(output_folder, frame_files, telemetry), ground_elevation)
+        jobs = record_footprints(jobs, footprints, width, height, hfov_deg, ground_elevation)
+        with ExifTool(exiftool_path) as exiftool:
+            result = FramePipeline(pipeline_stages(exiftool, hfov_deg, ground_elevation), workers=workers, progress_path=progress_path).run(jobs)
 
-    print(" Process complete! GeoTIFFs are fully ready for GeoDeep.")
+    write_footprint_layer(output_folder, footprints, result["failed"])
+    if not result["failed"]:
+        print(" Process complete! GeoTIFFs are fully ready for GeoDeep.")
 
 # ---------------- Main Execution ---------------- #
 if __name__ == "__main__":
@@ -97,6 +244,21 @@ if __name__ == "__main__":
     parser.add_argument("video_path", help="Path to the video file")
     parser.add_argument("srt_file", help="Path to the SRT file")
     parser.add_argument("output_folder", help="Path to save extracted frames and GeoTIFFs")
+    parser.add_argument("--fps", type=float, default=1, help="Frames extracted per second of video (the highest rate with frame selection)")
+    parser.add_argument("--overlap", type=float, default=DEFAULT_OVERLAP,
+                        help="Overlap kept between consecutive frames, frames moving or turning less are skipped")
+    parser.add_argument("--scene", type=float, default=DEFAULT_SCENE_THRESHOLD, help="ffmpeg scene score that also keeps a frame (0 - 1)")
+    parser.add_argument("--all-frames", action="store_true", help="Extract every frame at --fps without frame selection")
+    parser.add_argument("--stream", action="store_true",
+                        help="Decode frames through an ffmpeg pipe straight to GeoTIFF, without intermediate JPEGs")
+    parser.add_argument("--jpeg", action="store_true", help="With --stream, also write geotagged JPEG copies of the frames")
+    parser.add_argument("--workers", type=int, help="Frames processed in parallel (default: number of CPUs)")
+    parser.add_argument("--force", action="store_true", help="Ignore the progress of a previous run and start over")
+    parser.add_argument("--exiftool", help="ExifTool executable (default: EXIFTOOL_PATH, the Windows install path or exiftool on the PATH)")
+    parser.add_argument("--hfov", type=float, default=DEFAULT_HFOV_DEG, help="Horizontal field of view of the camera in degrees")
+    parser.add_argument("--ground-elevation", type=float, default=0.0,
+                        help="Ground elevation subtracted from the SRT altitude to get the flying height (default: 0, altitude above ground)")
 
     args = parser.parse_args()
-    main(args.video_path, args.srt_file, args.output_folder)
\ No newline at end of file
+    main(args.video_path, args.srt_file, args.output_folder, args.workers, args.force, args.exiftool,
+         args.hfov, args.ground_elevation, args.fps, args.overlap, args.scene, args.all_frames, args.stream, args.jpeg)
\ No newline at end of file
@@ -0,0 +1,193 @@
+"""
+========================================================================================
+    In-Process GeoTIFF Writer for Video Frame Geotagging (geotag_frames.py)
+========================================================================================
+    Writes a decoded frame straight to a georeferenced GeoTIFF with NumPy and zlib, instead of
+    starting gdal_translate (and decoding the JPEG again) for every frame.
+
+    - Tiled TIFF (256 x 256 tiles), Deflate compression with horizontal differencing (predictor 2),
+      zlib releases the GIL so frames written from several threads compress in parallel
+    - Georeferencing is a full affine geotransform (EPSG:4326) computed from the camera position, the flying
+      height and the horizontal field of view, assuming a nadir camera: ground sample distance =
+      2 * height * tan(FOV / 2) / image width, rotated by the heading when it is known
+    - GeoTIFF tags: ModelPixelScale + ModelTiepoint for north-up frames, ModelTransformation when rotated,
+      GeoKeyDirectory (geographic WGS84, pixel is area)
+    - Optional EXIF GPS tags (GPS IFD: latitude, longitude, altitude), so no exiftool pass is needed afterwards
+    - The file is written under a temporary name and renamed, a frame is never left half written
+
+    USAGE:
+        geotransform = frame_geotransform(45.1, -93.2, 120.0, 3840, 2160, hfov_deg=73.7)
+        write_geotiff("frame_0001.tif", rgb_pixels, geotransform)
+ """
+
+import math
+import os
+import struct
+import zlib
+
+import numpy as np
+
+TILE_SIZE = 256
+DEFLATE_LEVEL = 1  # most of the size reduction comes from the predictor, higher levels are much slower
+DEFAULT_HFOV_DEG = 73.7  # horizontal field of view of a 24 mm (35 mm equivalent) lens, most DJI cameras
+
+# TIFF field types: struct format of one value (a rational is two LONGs, ASCII is packed as bytes)
+_BYTE, _ASCII, _SHORT, _LONG, _RATIONAL, _DOUBLE = 1, 2, 3, 4, 5, 12
+_TYPE_FORMAT = {_BYTE: "B", _ASCII: "B", _SHORT: "H", _LONG: "I", _RATIONAL: "II", _DOUBLE: "d"}
+
+
+# ---------------- Georeferencing ---------------- #
+
+def metres_per_degree(latitude):
+    """(metres per degree of longitude, metres per degree of latitude) on the WGS84 ellipsoid at a latitude"""
+    phi = math.radians(latitude)
+    lat_m = 111132.92 - 559.82 * math.cos(2 * phi) + 1.175 * math.cos(4 * phi)
+    lon_m = 111412.84 * math.cos(phi) - 93.5 * math.cos(3 * phi)
+    return lon_m, lat_m
+
+
+def frame_geotransform(latitude, longitude, flying_height, width, height, hfov_deg=DEFAULT_HFOV_DEG, yaw_deg=None):
+    """Affine geotransform of a nadir frame centred on the camera position
+
+    Args:
+        latitude (float): Camera latitude
+        longitude (float): Camera longitude
+        flying_height (float): Camera height above the ground in metres
+        width (int): Frame width in pixels
+        height (int): Frame height in pixels
+        hfov_deg (float, optional): Horizontal field of view. Defaults to 73.7
+        yaw_deg (float, optional): Heading of the top of the frame, clockwise from north. Defaults to None (north up)
+
+    Returns:
+        tuple: GDAL order (x0, a, b, y0, d, e): lon = x0 + a * col + b * row, lat = y0 + d * col + e * row,
+            (x0, y0) is the outer corner of the top left pixel
+    """
+    if not flying_height > 0:
+        raise ValueError(f"flying height must be positive, got {flying_height}")
+    gsd = 2 * flying_height * math.tan(math.radians(hfov_deg) / 2) / width  # metres per pixel
+    lon_m, lat_m = metres_per_degree(latitude)
+    yaw = math.radians(yaw_deg or 0.0)
+    # ground step (east, north) of one pixel along the columns and along the rows
+    a, d = gsd * math.cos(yaw) / lon_m, -gsd * math.sin(yaw) / lat_m
+    b, e = -gsd * math.sin(yaw) / lon_m, -gsd * math.cos(yaw) / lat_m
+    x0 = longitude - width / 2 * a - height / 2 * b
+    y0 = latitude - width / 2 * d - height / 2 * e
+    return x0, a, b, y0, d, e
+
+
+def _geotiff_tags(geotransform, epsg):
+    x0, a, b, y0, d, e = geotransform
+    tags = {}
+    if b == 0 and d == 0:
+        tags[33550] = (_DOUBLE, [a, -e, 0.0])  # ModelPixelScale
+        tags[33922] = (_DOUBLE, [0.0, 0.0, 0.0, x0, y0, 0.0])  # ModelTiepoint
+    else:
+        tags[34264] = (_DOUBLE, [a, b, 0.0, x0, d, e, 0.0, y0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 1.0])  # ModelTransformation
+    geographic = epsg == 4326 or 4000 <= epsg < 5000
+    keys = [(1024, 0, 1, 2 if geographic else 1),  # GTModelType: geographic / projected
+            (1025, 0, 1, 1),  # GTRasterType: pixel is area
+            (2048 if geographic else 3072, 0, 1, epsg)]  # GeographicType / ProjectedCSType
+    tags[34735] = (_SHORT, [1, 1, 0, len(keys)] + [v for key in keys for v in key])  # GeoKeyDirectory
+    return tags
+
+
+def _gps_tags(latitude, longitude, altitude):
+    def dms(value):
+        value = abs(value)
+        degrees, minutes = int(value), int(value * 60) % 60
+        return [degrees, 1, minutes, 1, round((value * 3600 - degrees * 3600 - minutes * 60) * 10000), 10000]
+
+    tags = {0: (_BYTE, [2, 3, 0, 0]),  # GPSVersionID
+            1: (_ASCII, b"N\x00" if latitude >= 0 else b"S\x00"), 2: (_RATIONAL, dms(latitude)),
+            3: (_ASCII, b"E\x00" if longitude >= 0 else b"W\x00"), 4: (_RATIONAL, dms(longitude))}
+    if altitude is not None and altitude == altitude:
+        tags[5] = (_BYTE, [0 if altitude >= 0 else 1])  # above / below sea level
+        tags[6] = (_RATIONAL, [round(abs(altitude) * 1000), 1000])
+    return tags
+
+
+# ---------------- TIFF writing ---------------- #
+
+def _ifd(tags, offset):
+    """One image file directory at offset, its values that do not fit in an entry follow it"""
+    values_offset = offset + 2 + 12 * len(tags) + 4
+    entries, values = [], b""
+    for tag in sorted(tags):
+        typ, data = tags[tag]
+        fmt = _TYPE_FORMAT[typ]
+        count = len(data) // len(fmt)
+        packed = bytes(data) if typ == _ASCII else struct.pack("<" + fmt * count, *data)
+        if len(packed) <= 4:
+            entries.append(struct.pack("<HHI", tag, typ, count) + packed.ljust(4, b"\x00"))
+        else:
+            entries.append(struct.pack("<HHII", tag, typ, count, values_offset + len(values)))
+            values += packed + b"\x00" * (len(packed) % 2)
+    return struct.pack("<H", len(tags)) + b"".join(entries) + b"\x00\x00\x00\x00" + values
+
+def _encode_tiles(pixels, tile_size, compress):
+    """Tiles of the image in row-major order as bytes, edge tiles padded to the full tile size"""
+    rows, cols = pixels.shape[:2]
+    pad_rows, pad_cols = -rows % tile_size, -cols % tile_size
+    if pad_rows or pad_cols:
+        pixels = np.pad(pixels, [(0, pad_rows), (0, pad_cols)] + [(0, 0)] * (pixels.ndim - 2), mode="edge")
+    if compress:
+        # predictor 2: each sample minus its left neighbour, restarting at every tile column
+        diff = pixels.copy()
+        diff[:, 1:] -= pixels[:, :-1]
+        diff[:, ::tile_size] = pixels[:, ::tile_size]
+        pixels = diff
+    tiles = []
+    for r in range(0, pixels.shape[0], tile_size):
+        for c in range(0, pixels.shape[1], tile_size):
+            tile = np.ascontiguousarray(pixels[r:r + tile_size, c:c + tile_size])
+            tiles.append(zlib.compress(tile, DEFLATE_LEVEL) if compress else tile.tobytes())
+    return tiles
+
+
+def write_geotiff(path, pixels, geotransform, epsg=4326, tile_size=TILE_SIZE, compress=True, gps=None):
+    """Write an 8-bit RGB or grayscale image as a tiled GeoTIFF
+
+    Args:
+        path (str): Output GeoTIFF
+        pixels (np.ndarray): (rows, cols, 3) RGB or (rows, cols) grayscale uint8 image
+        geotransform (tuple): GDAL order (x0, a, b, y0, d, e), see frame_geotransform
+        epsg (int, optional): EPSG code of the geotransform coordinates. Defaults to 4326
+        tile_size (int, optional): Tile width and height, a multiple of 16. Defaults to 256
+        compress (bool, optional): Deflate with predictor, else uncompressed. Defaults to True
+        gps (tuple, optional): (latitude, longitude, altitude) written as EXIF GPS tags. Defaults to None
+    """
+    if pixels.dtype != np.uint8 or pixels.ndim not in (2, 3) or (pixels.ndim == 3 and pixels.shape[2] != 3):
+        raise ValueError(f"expected an 8-bit RGB or grayscale image, got {pixels.dtype} {pixels.shape}")
+    rows, cols = pixels.shape[:2]
+    samples = 1 if pixels.ndim == 2 else 3
+    tiles = _encode_tiles(pixels, tile_size, compress)
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(b"II*\x00\x00\x00\x00\x00")  # little endian, IFD offset written at the end
+        offsets = []
+        for tile in tiles:
+            offsets.append(f.tell())
+            f.write(tile)
+        tags = {256: (_LONG, [cols]), 257: (_LONG, [rows]),
+                258: (_SHORT, [8] * samples),  # BitsPerSample
+                259: (_SHORT, [8 if compress else 1]),  # Compression: Adobe Deflate / none
+                262: (_SHORT, [2 if samples == 3 else 1]),  # Photometric: RGB / black is zero
+                277: (_SHORT, [samples]), 284: (_SHORT, [1]),  # SamplesPerPixel, PlanarConfiguration: chunky
+                322: (_LONG, [tile_size]), 323: (_LONG, [tile_size]),
+                324: (_LONG, offsets), 325: (_LONG, [len(t) for t in tiles])}
+        if compress:
+            tags[317] = (_SHORT, [2])  # Predictor: horizontal differencing
+        tags.update(_geotiff_tags(geotransform, epsg))
+
+        ifd_offset = f.tell() + f.tell() % 2  # IFDs start on a word boundary
+        if gps is not None:
+            tags[34853] = (_LONG, [0])  # GPSInfo: offset of the GPS IFD, right after the main IFD
+            tags[34853] = (_LONG, [ifd_offset + len(_ifd(tags, ifd_offset))])
+        f.write(b"\x00" * (ifd_offset - f.tell()))
+        f.write(_ifd(tags, ifd_offset))
+        if gps is not None:
+            f.write(_ifd(_gps_tags(*gps), f.tell()))
+        f.seek(4)
+        f.write(struct.pack("<I", ifd_offset))
+    os.replace(tmp_path, path)
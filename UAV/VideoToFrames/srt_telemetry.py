@@ -0,0 +1,174 @@
+"""
+========================================================================================
+    Streaming DJI SRT Telemetry Parser and Frame Time Matching for Video Frame Geotagging (geotag_frames.py)
+========================================================================================
+    Reads the flight telemetry of a DJI SRT subtitle file one cue at a time and interpolates it at the
+    exact presentation time (PTS) of each extracted frame, instead of pairing frames with SRT rows in order.
+
+    - The SRT is read line by line, each cue becomes one record of a NumPy structured array (TELEMETRY_DTYPE),
+      built in chunks, so multi-hour flight logs never sit in memory as text or Python objects
+    - Bracketed DJI fields are recognised in any order: latitude / longitude (also the "longtitude" spelling of
+      some firmware), altitude, rel_alt, abs_alt, gimbal yaw / pitch / roll (gb_yaw, gb_pitch, gb_roll) and focal_len,
+      missing fields are NaN
+    - The record time is the start of its cue, in seconds from the start of the video
+    - Frames are matched with one vectorized searchsorted over the telemetry times, every field is interpolated
+      linearly between the two surrounding records (gimbal yaw along the shorter way round the circle)
+    - Frames more than MAX_GAP_S from the telemetry (before / after the log, or in a dropout) get NaN values
+
+    SRT CUE FORMAT (DJI):
+    ---------------------
+    12
+    00:00:00,367 --> 00:00:00,400
+    <font size="28">FrameCnt: 12, DiffTime: 33ms
+    [focal_len: 24.00] [latitude: 45.123456] [longitude: -93.234567] [rel_alt: 120.500 abs_alt: 300.200]
+    [gb_yaw: 12.3 gb_pitch: -90.0 gb_roll: 0.0] </font>
+
+    USAGE:
+        telemetry = read_srt("DJI_0001.SRT")
+        frames = interpolate_telemetry(telemetry, [0.0, 1.0, 2.0])
+        frames["latitude"], frames["gimbal_yaw"]
+ """
+
+import csv
+import itertools
+import os
+import re
+
+import numpy as np
+
+FRAME_TIMES_FILE = "frame_times.csv"
+MAX_GAP_S = 2.0
+CHUNK_RECORDS = 65536
+
+TELEMETRY_DTYPE = np.dtype([("time", "f8"), ("latitude", "f8"), ("longitude", "f8"), ("altitude", "f8"),
+                            ("rel_alt", "f8"), ("abs_alt", "f8"), ("gimbal_yaw", "f8"), ("gimbal_pitch", "f8"),
+                            ("gimbal_roll", "f8"), ("focal_length", "f8")])
+
+# record field: SRT keys, first one present wins
+_FIELD_KEYS = {"latitude": ("latitude", "lat"), "longitude": ("longitude", "longtitude", "lon"),
+               "altitude": ("altitude", "rel_alt", "abs_alt"), "rel_alt": ("rel_alt",), "abs_alt": ("abs_alt",),
+               "gimbal_yaw": ("gb_yaw",), "gimbal_pitch": ("gb_pitch",), "gimbal_roll": ("gb_roll",),
+               "focal_length": ("focal_len",)}
+_FIELD_KEYS_ORDERED = [_FIELD_KEYS[name] for name in TELEMETRY_DTYPE.names[1:]]
+_TIMING = re.compile(r"(\d+):(\d+):(\d+)[,.](\d+)\s*-->")
+_VALUE = re.compile(r"\b(%s)\s*:\s*(-?\d+(?:\.\d+)?(?:[eE]-?\d+)?)"
+                    % "|".join(sorted({key for keys in _FIELD_KEYS.values() for key in keys}, key=len, reverse=True)))
+
+
+# ---------------- SRT parsing ---------------- #
+
+def _record(start, text):
+    values = dict(reversed(_VALUE.findall(text)))  # first occurrence of a key wins
+    record = [start]
+    for keys in _FIELD_KEYS_ORDERED:
+        for key in keys:
+            if key in values:
+                record.append(float(values[key]))
+                break
+        else:
+            record.append(np.nan)
+    return tuple(record)
+
+
+def _iter_cues(srt_file):
+    """(start in seconds, text) of each SRT cue, read line by line"""
+    start, text = None, []
+    with open(srt_file, "r", encoding="utf-8-sig", errors="replace") as file:
+        for line in file:
+            timing = _TIMING.match(line.strip())
+            if timing:
+                if start is not None:
+                    yield start, " ".join(text)
+                h, m, s, frac = timing.groups()
+                start, text = int(h) * 3600 + int(m) * 60 + int(s) + int(frac) / 10 ** len(frac), []
+            elif start is not None:
+                text.append(line)
+    if start is not None:
+        yield start, " ".join(text)
+
+
+def iter_srt(srt_file):
+    """Telemetry records of an SRT file as tuples in TELEMETRY_DTYPE order, one per cue with a position"""
+    for start, text in _iter_cues(srt_file):
+        record = _record(start, text)
+        if record[1] == record[1] and record[2] == record[2]:  # has a position (NaN != NaN)
+            yield record
+
+
+def read_srt(srt_file, chunk_records=CHUNK_RECORDS):
+    """Telemetry of an SRT file as a structured array (TELEMETRY_DTYPE) sorted by time"""
+    records = iter_srt(srt_file)
+    chunks = []
+    while True:
+        chunk = np.fromiter(itertools.islice(records, chunk_records), dtype=TELEMETRY_DTYPE)
+        if len(chunk) == 0:
+            break
+        chunks.append(chunk)
+    telemetry = np.concatenate(chunks) if chunks else np.empty(0, dtype=TELEMETRY_DTYPE)
+    if np.any(np.diff(telemetry["time"]) < 0):
+        telemetry = telemetry[np.argsort(telemetry["time"], kind="stable")]
+    return telemetry
+
+
+# ---------------- Frame time matching ---------------- #
+
+def interpolate_telemetry(telemetry, times, max_gap=MAX_GAP_S):
+    """Telemetry interpolated at the given frame times
+
+    Args:
+        telemetry (np.ndarray): Structured array from read_srt, sorted by time
+        times (array-like): Frame presentation times in seconds
+        max_gap (float, optional): Largest gap in seconds bridged by interpolation. Defaults to 2.0
+
+    Returns:
+        np.ndarray: TELEMETRY_DTYPE array, one record per frame, NaN values where the telemetry does not cover the frame
+    """
+    times = np.asarray(times, dtype=float)
+    frames = np.full(len(times), np.nan, dtype=TELEMETRY_DTYPE)
+    frames["time"] = times
+    t = telemetry["time"]
+    if len(t) == 0 or len(times) == 0:
+        return frames
+    after = np.searchsorted(t, times, side="right")  # t[after - 1] <= time < t[after]
+    lo, hi = np.clip(after - 1, 0, len(t) - 1), np.clip(after, 0, len(t) - 1)
+    span = t[hi] - t[lo]
+    weight = np.clip(np.divide(times - t[lo], span, out=np.zeros_like(times), where=span > 0), 0, 1)
+    # a frame exactly on a record is covered even when the next record is past a dropout
+    covered = (times >= t[0] - max_gap) & (times <= t[-1] + max_gap) & ((span <= max_gap) | (times == t[lo]))
+    for name in TELEMETRY_DTYPE.names[1:]:
+        a, b = telemetry[name][lo], telemetry[name][hi]
+        if name == "gimbal_yaw":
+            values = a + weight * ((b - a + 180) % 360 - 180)  # shorter way round
+        else:
+            values = a + weight * (b - a)
+        # a frame on a record takes that record's values, a field missing from the other record does not make it NaN
+        values = np.where(weight == 0, a, np.where(weight == 1, b, values))
+        if name == "gimbal_yaw":
+            values = (values + 180) % 360 - 180
+        frames[name] = np.where(covered, values, np.nan)
+    return frames
+
+
+def write_frame_times(output_folder, frame_times):
+    """Save {frame file: presentation time in seconds} next to the frames"""
+    with open(os.path.join(output_folder, FRAME_TIMES_FILE), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Filename", "Time"])
+        writer.writerows(sorted(frame_times.items()))
+
+
+def load_frame_times(output_folder, frame_files, fps):
+    """Presentation time of each frame file, from the extraction log or frame number / fps when it is missing"""
+    path = os.path.join(output_folder, FRAME_TIMES_FILE)
+    logged = {}
+    if os.path.exists(path):
+        with open(path, "r", newline="") as f:
+            logged = {row["Filename"]: float(row["Time"]) for row in csv.DictReader(f)}
+    times = []
+    for frame_file in frame_files:
+        if frame_file in logged:
+            times.append(logged[frame_file])
+        else:
+            number = re.search(r"(\d+)\D*$", frame_file)
+            times.append((int(number.group(1)) - 1) / fps if number else np.nan)  # frame_0001 is the frame at 0 s
+    return np.array(times, dtype=float)
@@ -0,0 +1,98 @@
+"""
+========================================================================================
+    Raw Video Frame Streaming from FFmpeg for Video Frame Geotagging (geotag_frames.py)
+========================================================================================
+    Reads decoded frames straight from an ffmpeg rawvideo pipe into NumPy arrays, so frames go from the
+    video to GeoTIFF without an intermediate JPEG (no lossy re-encode, no extra disk passes).
+
+    - ffmpeg decodes, applies the frame filter (fps or select) and writes rgb24 frames to stdout,
+      each frame is exactly width x height x 3 bytes
+    - The showinfo filter logs the presentation time of every frame it passes to stderr, a reader thread
+      drains stderr (ffmpeg blocks on a full pipe) and queues the times, which are paired with the frames in order
+    - The frames are yielded lazily: when the consumer stops pulling (bounded queue downstream is full),
+      the pipe fills up and ffmpeg pauses decoding
+
+    USAGE:
+        for index, pts_time, rgb in iter_raw_frames("DJI_0001.MP4", 3840, 2160, "fps=1"):
+            ...
+ """
+
+import queue
+import re
+import subprocess
+import threading
+from collections import deque
+
+import numpy as np
+
+SHOWINFO_FRAME = re.compile(r"\bn:\s*(\d+)\s+pts:\s*-?\d+\s+pts_time:\s*(-?[\d.]+)")
+
+
+def _drain_stderr(stream, times, tail):
+    for line in stream:
+        match = SHOWINFO_FRAME.search(line)
+        if match:
+            times.put((int(match.group(1)), float(match.group(2))))
+        else:
+            tail.append(line.rstrip())
+    times.put(None)
+
+
+def _read_exactly(stream, buffer):
+    """Fill buffer from the pipe, False at the end of the stream"""
+    view, filled = memoryview(buffer).cast("B"), 0
+    while filled < len(view):
+        n = stream.readinto(view[filled:])
+        if not n:
+            if filled:
+                raise RuntimeError(f"ffmpeg stopped in the middle of a frame ({filled} of {len(view)} bytes)")
+            return False
+        filled += n
+    return True
+
+
+def iter_raw_frames(video_path, width, height, filter_graph=None, filter_script=None):
+    """Decoded RGB frames of a video with their presentation times
+
+    Args:
+        video_path (str): Video file
+        width (int): Frame width in pixels
+        height (int): Frame height in pixels
+        filter_graph (str, optional): ffmpeg video filters run before showinfo, e.g. "fps=1". Defaults to None
+        filter_script (str, optional): File with the complete filter graph (ending in showinfo), used instead of
+            filter_graph for long expressions. Defaults to None
+
+    Yields:
+        tuple: (output frame index from 0, presentation time in seconds, (height, width, 3) uint8 RGB array)
+    """
+    if filter_script:
+        filters = ["-filter_script:v", filter_script]
+    else:
+        filters = ["-vf", (filter_graph + "," if filter_graph else "") + "showinfo"]
+    # no shell: kill() must stop ffmpeg itself, not a shell left waiting on it
+    command = ["ffmpeg", "-nostdin", "-nostats", "-i", video_path] + filters + \
+              ["-fps_mode", "vfr", "-f", "rawvideo", "-pix_fmt", "rgb24", "pipe:1"]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=False, bufsize=0)
+    times, tail = queue.Queue(), deque(maxlen=20)
+    stderr = threading.Thread(target=_drain_stderr, daemon=True,
+                              args=(iter(lambda: process.stderr.readline().decode("utf-8", "replace"), ""), times, tail))
+    stderr.start()
+    finished = False
+    try:
+        while True:
+            frame = np.empty((height, width, 3), dtype=np.uint8)  # new array per frame, the consumer keeps it
+            if not _read_exactly(process.stdout, frame):
+                break
+            timing = times.get()
+            if timing is None:
+                raise RuntimeError("ffmpeg did not log the presentation time of a frame (showinfo)")
+            yield timing[0], timing[1], frame
+        finished = True
+    finally:
+        process.stdout.close()  # ffmpeg blocked on a full pipe gets a broken pipe instead of waiting forever
+        if not finished:  # stopped early or failed: do not wait for the rest of the video
+            process.kill()
+        process.wait()
+        stderr.join()
+    if process.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed ({process.returncode}): " + "\n".join(tail))